@@ -0,0 +1,158 @@
+"""
+会话准入控制
+
+每个设备连接在打开云端会话前先取得准入:
+    - 同时进行的会话数不超过 max_sessions
+    - 新建云端会话的速率受令牌桶限制 (每秒 rate 个，最多积累 burst 个)，重连风暴不会瞬间打满上游配额
+    - 暂时无法准入的连接按先后顺序排队，最多 queue_size 个，最长等待 queue_timeout 秒
+    - 队列已满或等待超时则拒绝，并给出建议的重连等待时间 (设备端在此基础上加随机抖动)
+    - 已准入的会话重连云端时不再占用名额，但同样需要令牌 (acquire_token)，云端故障时的集中重连也受速率限制
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+
+class AdmissionController:
+    def __init__(self, max_sessions: int = 8, rate: float = 2.0, burst: int = 4, queue_size: int = 16,
+                 queue_timeout: float = 10.0, retry_min: float = 2.0, retry_max: float = 30.0):
+        """
+        Args:
+            max_sessions: 最大同时会话数，0 表示不限制
+            rate: 每秒可新建的云端会话数，0 表示不限制
+            burst: 令牌桶容量
+            queue_size: 等待队列长度
+            queue_timeout: 队列中的最长等待时间 (秒)
+            retry_min / retry_max: 建议重连等待时间的范围 (秒)
+        """
+        self.max_sessions = max_sessions
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.retry_min = retry_min
+        self.retry_max = retry_max
+        self.active = 0
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._waiters: deque = deque()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.reconnect_tokens = 0
+        self.wait_max = 0.0
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any]) -> "AdmissionController":
+        return cls(cfg.get("max_sessions", 8), cfg.get("rate", 2.0), cfg.get("burst", 4),
+                   cfg.get("queue_size", 16), cfg.get("queue_timeout", 10.0),
+                   cfg.get("retry_min", 2.0), cfg.get("retry_max", 30.0))
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.rate:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def _try_admit(self) -> bool:
+        if self.max_sessions and self.active >= self.max_sessions:
+            return False
+        if self.rate:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+        self.active += 1
+        self.admitted += 1
+        return True
+
+    def _pump(self) -> None:
+        """按顺序为排队的连接分配名额；只缺令牌时在下一个令牌产生时再试"""
+        self._timer = None
+        while self._waiters:
+            future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if not self._try_admit():
+                break
+            self._waiters.popleft()
+            future.set_result(True)
+        if self._waiters and self.rate and self._tokens < 1 and self._timer is None:
+            if not self.max_sessions or self.active < self.max_sessions:
+                delay = (1 - self._tokens) / self.rate
+                self._timer = asyncio.get_event_loop().call_later(delay, self._pump)
+
+    def waiting(self) -> int:
+        return sum(1 for future in self._waiters if not future.done())
+
+    def retry_after(self) -> float:
+        """建议的重连等待时间: 按令牌产生速度估算排在前面的连接所需的时间"""
+        wait = (self.waiting() + 1) / self.rate if self.rate else self.retry_min
+        return min(max(wait, self.retry_min), self.retry_max)
+
+    async def acquire(self) -> Optional[float]:
+        """
+        取得一个会话名额
+
+        Returns:
+            None 表示已准入 (结束时调用 release)，否则为建议的重连等待时间 (秒)
+        """
+        if not self._waiters and self._try_admit():
+            return None
+        if self.waiting() >= self.queue_size:
+            self.rejected += 1
+            return self.retry_after()
+        future = asyncio.get_event_loop().create_future()
+        self._waiters.append(future)
+        self.queued += 1
+        self._pump()
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not future.done():
+                future.cancel()
+                self.timeouts += 1
+                self.rejected += 1
+                return self.retry_after()
+        except asyncio.CancelledError:
+            # 等待期间连接断开: 已分配的名额归还
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                future.cancel()
+            raise
+        self.wait_max = max(self.wait_max, time.monotonic() - start)
+        return None
+
+    async def acquire_token(self) -> None:
+        """取得一个新建云端会话的令牌 (已占有名额的会话重连时使用)，没有令牌时等待下一个令牌"""
+        while self.rate:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.reconnect_tokens += 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def release(self) -> None:
+        self.active -= 1
+        self._pump()
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill()
+        return {
+            "active": self.active,
+            "waiting": self.waiting(),
+            "tokens": round(self._tokens, 2),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "reconnect_tokens": self.reconnect_tokens,
+            "wait_max_s": round(self.wait_max, 2),
+        }
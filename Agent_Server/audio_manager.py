@@ -4,7 +4,6 @@ import random
 import signal
 import sys
 import threading
-import time
 import uuid
 import wave
 from dataclasses import dataclass
@@ -13,6 +12,8 @@ from typing import Optional, Dict, Any
 import pyaudio
 
 import config
+from audio_player import AudioPlayer
+from audio_recorder import AudioRecorder, TrackFormat
 from realtime_dialog_client import RealtimeDialogClient
 
 
@@ -26,6 +27,13 @@ class AudioConfig:
     chunk: int
 
 
+def track_format(audio_config: Dict[str, Any]) -> TrackFormat:
+    """input_audio_config / output_audio_config 转换为录音音轨格式"""
+    return TrackFormat(channels=audio_config["channels"], sample_rate=audio_config["sample_rate"],
+                       sample_width=pyaudio.get_sample_size(audio_config["bit_size"]),
+                       is_float=audio_config["bit_size"] == pyaudio.paFloat32)
+
+
 class AudioDeviceManager:
     """音频设备管理类，处理音频输入输出"""
 
@@ -48,14 +56,15 @@ class AudioDeviceManager:
         )
         return self.input_stream
 
-    def open_output_stream(self) -> pyaudio.Stream:
-        """打开音频输出流"""
+    def open_output_stream(self, stream_callback=None) -> pyaudio.Stream:
+        """打开音频输出流，指定 stream_callback 时为回调模式"""
         self.output_stream = self.pyaudio.open(
             format=self.output_config.bit_size,
             channels=self.output_config.channels,
             rate=self.output_config.sample_rate,
             output=True,
-            frames_per_buffer=self.output_config.chunk
+            frames_per_buffer=self.output_config.chunk,
+            stream_callback=stream_callback
         )
         return self.output_stream
 
@@ -87,46 +96,30 @@ class DialogSession:
         self.session_id = str(uuid.uuid4())
         self.client = RealtimeDialogClient(config=ws_config, session_id=self.session_id,
                                            output_audio_format=output_audio_format, mod=mod, recv_timeout=recv_timeout)
+        self.output_audio_config = dict(config.output_audio_config)
         if output_audio_format == "pcm_s16le":
-            config.output_audio_config["format"] = "pcm_s16le"
-            config.output_audio_config["bit_size"] = pyaudio.paInt16
+            self.output_audio_config.update(format="pcm_s16le", bit_size=pyaudio.paInt16)
 
         self.is_running = True
         self.is_session_finished = False
         self.is_user_querying = False
         self.is_sending_chat_tts_text = False
-        self.audio_buffer = b''
+        # 上行 / 下行音频由后台线程写入 WAV 文件
+        self.recorder = AudioRecorder.from_config(config.recording_config, f"dialog_{self.session_id[:8]}", {
+            "input": track_format(config.input_audio_config),
+            "output": track_format(self.output_audio_config),
+        })
 
         signal.signal(signal.SIGINT, self._keyboard_signal)
-        self.audio_queue = queue.Queue()
+        self.player: Optional[AudioPlayer] = None
         if not self.is_audio_file_input:
-            self.audio_device = AudioDeviceManager(
-                AudioConfig(**config.input_audio_config),
-                AudioConfig(**config.output_audio_config)
-            )
-            # 初始化音频队列和输出流
-            self.output_stream = self.audio_device.open_output_stream()
-            # 启动播放线程
+            output_config = AudioConfig(**self.output_audio_config)
+            self.audio_device = AudioDeviceManager(AudioConfig(**config.input_audio_config), output_config)
+            # 回调模式输出流，由 PortAudio 从播放器的环形缓冲区取数据
+            self.player = AudioPlayer(output_config)
+            self.output_stream = self.audio_device.open_output_stream(self.player.callback)
+            self.player.attach(self.output_stream)
             self.is_recording = True
-            self.is_playing = True
-            self.player_thread = threading.Thread(target=self._audio_player_thread)
-            self.player_thread.daemon = True
-            self.player_thread.start()
-
-    def _audio_player_thread(self):
-        """音频播放线程"""
-        while self.is_playing:
-            try:
-                # 从队列获取音频数据
-                audio_data = self.audio_queue.get(timeout=1.0)
-                if audio_data is not None:
-                    self.output_stream.write(audio_data)
-            except queue.Empty:
-                # 队列为空时等待一小段时间
-                time.sleep(0.1)
-            except Exception as e:
-                print(f"音频播放错误: {e}")
-                time.sleep(0.1)
 
     def handle_server_response(self, response: Dict[str, Any]) -> None:
         if response == {}:
@@ -137,9 +130,10 @@ class DialogSession:
             if self.is_sending_chat_tts_text:
                 return
             audio_data = response['payload_msg']
-            if not self.is_audio_file_input:
-                self.audio_queue.put(audio_data)
-            self.audio_buffer += audio_data
+            if self.player:
+                self.player.write(audio_data)
+            if self.recorder:
+                self.recorder.write("output", audio_data)
         elif response['message_type'] == 'SERVER_FULL_RESPONSE':
             print(f"服务器响应: {response}")
             event = response.get('event')
@@ -147,21 +141,18 @@ class DialogSession:
 
             if event == 450:
                 print(f"清空缓存音频: {response['session_id']}")
-                while not self.audio_queue.empty():
-                    try:
-                        self.audio_queue.get_nowait()
-                    except queue.Empty:
-                        continue
+                if self.player:
+                    self.player.flush()
                 self.is_user_querying = True
 
             if event == 350 and self.is_sending_chat_tts_text and payload_msg.get("tts_type") in ["chat_tts_text", "external_rag"]:
-                while not self.audio_queue.empty():
-                    try:
-                        self.audio_queue.get_nowait()
-                    except queue.Empty:
-                        continue
+                if self.player:
+                    self.player.flush()
                 self.is_sending_chat_tts_text = False
 
+            if event == 359 and self.player:
+                self.player.end()
+
             if event == 459:
                 self.is_user_querying = False
                 if random.randint(0, 100000)%1000 == 0:
@@ -199,7 +190,6 @@ class DialogSession:
 
     def stop(self):
         self.is_recording = False
-        self.is_playing = False
         self.is_running = False
 
     async def receive_loop(self):
@@ -298,6 +288,8 @@ class DialogSession:
                 if not audio_data:
                     break  # 文件读取完毕
 
+                if self.recorder:
+                    self.recorder.write("input", audio_data)
                 await self.client.task_request(audio_data)
                 # sleep与chunk对应的音频时长一致，模拟实时输入
                 await asyncio.sleep(sleep_seconds)
@@ -322,7 +314,8 @@ class DialogSession:
             try:
                 # 添加exception_on_overflow=False参数来忽略溢出错误
                 audio_data = stream.read(config.input_audio_config["chunk"], exception_on_overflow=False)
-                save_input_pcm_to_wav(audio_data, "input.pcm")
+                if self.recorder:
+                    self.recorder.write("input", audio_data)
                 await self.client.task_request(audio_data)
                 await asyncio.sleep(0.01)  # 避免CPU过度使用
             except Exception as e:
@@ -356,30 +349,13 @@ class DialogSession:
             await asyncio.sleep(0.1)
             await self.client.close()
             print(f"dialog request logid: {self.client.logid}, chat mod: {self.mod}")
-            save_output_to_file(self.audio_buffer, "output.pcm")
         except Exception as e:
             print(f"会话错误: {e}")
         finally:
+            if self.recorder:
+                self.recorder.close()
+                print(f"录音文件: {self.recorder.paths()}, 丢弃 {self.recorder.dropped_bytes} 字节")
             if not self.is_audio_file_input:
+                print(f"播放统计: {self.player.stats()}")
                 self.audio_device.cleanup()
 
-
-def save_input_pcm_to_wav(pcm_data: bytes, filename: str) -> None:
-    """保存PCM数据为WAV文件"""
-    with wave.open(filename, 'wb') as wf:
-        wf.setnchannels(config.input_audio_config["channels"])
-        wf.setsampwidth(2)  # paInt16 = 2 bytes
-        wf.setframerate(config.input_audio_config["sample_rate"])
-        wf.writeframes(pcm_data)
-
-
-def save_output_to_file(audio_data: bytes, filename: str) -> None:
-    """保存原始PCM音频数据到文件"""
-    if not audio_data:
-        print("No audio data to save.")
-        return
-    try:
-        with open(filename, 'wb') as f:
-            f.write(audio_data)
-    except IOError as e:
-        print(f"Failed to save pcm file: {e}")
@@ -0,0 +1,176 @@
+"""
+音频播放
+
+使用 PyAudio 回调模式播放下行音频: 接收线程把音频写入预分配的环形缓冲区，PortAudio 在每个设备缓冲周期调用
+callback 取出一个周期的数据，不足的部分补静音:
+    - 没有播放线程，不需要 queue.get 超时或空闲 sleep
+    - flush() 在锁内把读位置移动到写位置，打断 (barge-in) 后下一个周期即为静音，最长延迟一个设备缓冲周期
+    - 播放过程中缓冲区被取空计为一次欠载 (underrun)，end() 标记一句话结束后的取空不计入
+    - 下行音频块不一定按采样帧对齐，不足一帧的尾部留到下一块之前，缓冲区满时只丢弃整帧
+"""
+import threading
+from typing import Dict, Optional
+
+import pyaudio
+
+
+class PcmRing:
+    """预分配的 PCM 环形缓冲区，读写位置为累计字节数，按帧对齐，不足一帧的尾部暂存到下一次写入"""
+
+    def __init__(self, capacity: int, frame_bytes: int):
+        self.frame_bytes = frame_bytes
+        self.capacity = capacity - capacity % frame_bytes
+        self._buf = bytearray(self.capacity)
+        self._lock = threading.Lock()
+        self._read = 0
+        self._write = 0
+        # 上一次写入不足一帧的尾部
+        self._partial = b""
+        self.overflow_bytes = 0
+
+    def __len__(self) -> int:
+        return self._write - self._read
+
+    def write(self, data: bytes) -> int:
+        """写入数据 (接在上一次的尾部之后)，缓冲区满时丢弃放不下的整帧，返回写入缓冲区的字节数"""
+        with self._lock:
+            if self._partial:
+                data = self._partial + bytes(data)
+            tail = len(data) % self.frame_bytes
+            self._partial = bytes(data[len(data) - tail:]) if tail else b""
+            free = self.capacity - (self._write - self._read)
+            n = min(len(data) - tail, free)
+            pos = self._write % self.capacity
+            first = min(n, self.capacity - pos)
+            self._buf[pos:pos + first] = data[:first]
+            if n > first:
+                self._buf[:n - first] = data[first:n]
+            self._write += n
+        self.overflow_bytes += len(data) - tail - n
+        return n
+
+    def read_into(self, out: bytearray) -> int:
+        """读取最多 len(out) 字节到 out，返回读取的字节数"""
+        with self._lock:
+            n = min(len(out), self._write - self._read)
+            pos = self._read % self.capacity
+            first = min(n, self.capacity - pos)
+            out[:first] = self._buf[pos:pos + first]
+            if n > first:
+                out[first:n] = self._buf[:n - first]
+            self._read += n
+        return n
+
+    def flush(self) -> int:
+        """丢弃所有未播放的数据 (包括不足一帧的尾部)，返回丢弃的字节数"""
+        with self._lock:
+            n = self._write - self._read + len(self._partial)
+            self._read = self._write
+            self._partial = b""
+        return n
+
+
+class AudioPlayer:
+    """PyAudio 回调模式播放器"""
+
+    def __init__(self, output_config, buffer_seconds: float = 60.0):
+        """
+        Args:
+            output_config: 输出音频配置 (AudioConfig)
+            buffer_seconds: 环形缓冲区可容纳的音频时长
+        """
+        self.sample_rate = output_config.sample_rate
+        self.frame_bytes = output_config.channels * pyaudio.get_sample_size(output_config.bit_size)
+        self.bytes_per_ms = self.sample_rate * self.frame_bytes / 1000
+        self.ring = PcmRing(int(self.sample_rate * buffer_seconds) * self.frame_bytes, self.frame_bytes)
+        self._out = bytearray(output_config.chunk * self.frame_bytes)
+        self.stream: Optional[pyaudio.Stream] = None
+        # 有待播放的音频 / 已收到一句话的全部音频
+        self.active = False
+        self.ending = False
+        self.played_bytes = 0
+        self.underruns = 0
+        self.underrun_ms = 0.0
+        self.device_underflows = 0
+        self.flushes = 0
+        self.flushed_bytes = 0
+        self.buffered_max_ms = 0.0
+        self.period_ms = output_config.chunk / self.sample_rate * 1000
+        self.device_latency_ms = 0.0
+
+    def attach(self, stream: pyaudio.Stream) -> None:
+        """绑定以 callback 打开的输出流 (AudioDeviceManager.open_output_stream)"""
+        self.stream = stream
+        self.device_latency_ms = stream.get_output_latency() * 1000
+
+    def write(self, data: bytes) -> bool:
+        """放入待播放的音频，不阻塞；缓冲区已满时丢弃放不下的部分并返回 False"""
+        overflow = self.ring.overflow_bytes
+        n = self.ring.write(data)
+        if n:
+            self.active = True
+            self.ending = False
+            buffered = len(self.ring) / self.bytes_per_ms
+            if buffered > self.buffered_max_ms:
+                self.buffered_max_ms = buffered
+        return self.ring.overflow_bytes == overflow
+
+    def end(self) -> None:
+        """一句话的音频已全部写入，之后播放完毕的取空不计为欠载"""
+        self.ending = True
+
+    def flush(self) -> int:
+        """打断: 丢弃未播放的音频，下一个设备缓冲周期开始输出静音"""
+        n = self.ring.flush()
+        self.active = False
+        self.ending = False
+        self.flushes += 1
+        self.flushed_bytes += n
+        return n
+
+    def callback(self, in_data, frame_count, time_info, status):
+        """PortAudio 线程调用，取出一个周期的音频，不足部分补静音"""
+        want = frame_count * self.frame_bytes
+        out = self._out
+        if len(out) != want:
+            out = self._out = bytearray(want)
+        n = self.ring.read_into(out)
+        if n < want:
+            out[n:] = bytes(want - n)
+            if self.active:
+                if self.ending and not len(self.ring):
+                    self.active = self.ending = False
+                else:
+                    self.underruns += 1
+                    self.underrun_ms += (want - n) / self.bytes_per_ms
+        self.played_bytes += n
+        if status & pyaudio.paOutputUnderflow:
+            self.device_underflows += 1
+        if time_info:
+            latency = time_info.get("output_buffer_dac_time", 0) - time_info.get("current_time", 0)
+            if latency > 0:
+                self.device_latency_ms = latency * 1000
+        return bytes(out), pyaudio.paContinue
+
+    def buffered_ms(self) -> float:
+        return len(self.ring) / self.bytes_per_ms
+
+    def latency_ms(self) -> float:
+        """新写入的音频到达扬声器的预计延迟: 缓冲区中的音频 + 设备输出延迟"""
+        return self.buffered_ms() + self.device_latency_ms
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "played_ms": round(self.played_bytes / self.bytes_per_ms),
+            "buffered_ms": round(self.buffered_ms()),
+            "buffered_max_ms": round(self.buffered_max_ms),
+            "latency_ms": round(self.latency_ms(), 1),
+            "device_latency_ms": round(self.device_latency_ms, 1),
+            "period_ms": round(self.period_ms, 1),
+            "underruns": self.underruns,
+            "underrun_ms": round(self.underrun_ms),
+            "device_underflows": self.device_underflows,
+            "overflow_bytes": self.ring.overflow_bytes,
+            "flushes": self.flushes,
+            "flushed_ms": round(self.flushed_bytes / self.bytes_per_ms),
+        }
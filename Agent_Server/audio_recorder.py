@@ -0,0 +1,171 @@
+"""
+会话录音
+
+调用方只把音频块放入有界队列，由后台线程按音轨 (如上行 input / 下行 output) 追加写入 WAV 文件:
+    - 文件头按固定间隔回填长度，录音过程中文件始终是可播放的 WAV
+    - 队列满时丢弃新数据并计数，内存占用有上限，不会阻塞音频链路
+    - 单个文件超过 max_file_seconds 后自动切换到下一个文件
+"""
+import os
+import queue
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+_HEADER_SIZE = 44
+
+
+@dataclass(frozen=True)
+class TrackFormat:
+    """音轨格式"""
+    channels: int
+    sample_rate: int
+    sample_width: int
+    is_float: bool = False
+
+    @property
+    def bytes_per_second(self) -> int:
+        return self.channels * self.sample_rate * self.sample_width
+
+
+class WavFile:
+    """追加写入的 WAV 文件，patch() 回填 RIFF / data 长度"""
+
+    def __init__(self, path: str, fmt: TrackFormat):
+        self.path = path
+        self.fmt = fmt
+        self.data_bytes = 0
+        self._patched = -1
+        self._file = open(path, "wb")
+        self._file.write(self._header())
+
+    def _header(self) -> bytes:
+        fmt = self.fmt
+        block_align = fmt.channels * fmt.sample_width
+        return struct.pack(
+            "<4sI4s4sIHHIIHH4sI",
+            b"RIFF", 36 + self.data_bytes, b"WAVE",
+            b"fmt ", 16, WAVE_FORMAT_IEEE_FLOAT if fmt.is_float else WAVE_FORMAT_PCM,
+            fmt.channels, fmt.sample_rate, fmt.sample_rate * block_align, block_align, fmt.sample_width * 8,
+            b"data", self.data_bytes)
+
+    def write(self, data: bytes) -> None:
+        self._file.write(data)
+        self.data_bytes += len(data)
+
+    def patch(self) -> None:
+        if self._patched == self.data_bytes:
+            return
+        pos = self._file.tell()
+        self._file.seek(0)
+        self._file.write(self._header())
+        self._file.seek(pos)
+        self._file.flush()
+        self._patched = self.data_bytes
+
+    def close(self) -> None:
+        self.patch()
+        self._file.close()
+
+
+class AudioRecorder:
+    """后台线程录音"""
+
+    def __init__(self, directory: str, prefix: str, tracks: Dict[str, TrackFormat],
+                 max_file_seconds: int = 300, max_queue: int = 512, patch_interval: float = 1.0):
+        """
+        Args:
+            directory: 录音目录
+            prefix: 文件名前缀，文件名为 {prefix}_{音轨}_{序号}.wav
+            tracks: 音轨名称 -> 格式
+            max_file_seconds: 单个文件的最大时长，超过后切换文件
+            max_queue: 队列中最多缓存的音频块数量
+            patch_interval: 回填文件头的间隔 (秒)
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.tracks = tracks
+        self.max_file_seconds = max_file_seconds
+        self.patch_interval = patch_interval
+        self.files: Dict[str, WavFile] = {}
+        self._index = {name: 0 for name in tracks}
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.written_bytes = {name: 0 for name in tracks}
+        self.dropped_bytes = 0
+        self.closed = False
+        self._thread = threading.Thread(target=self._run, name=f"recorder-{prefix}", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_config(cls, cfg: Dict, prefix: str, tracks: Dict[str, TrackFormat]) -> Optional["AudioRecorder"]:
+        """根据 config.recording_config 创建，未启用时返回 None"""
+        if not cfg.get("enabled"):
+            return None
+        return cls(cfg.get("dir", "recordings"), prefix, tracks,
+                   max_file_seconds=cfg.get("max_file_seconds", 300),
+                   max_queue=cfg.get("max_queue", 512))
+
+    def write(self, track: str, data: bytes) -> bool:
+        """放入写入队列，不阻塞；队列已满时丢弃并返回 False"""
+        if self.closed or not data:
+            return False
+        try:
+            self._queue.put_nowait((track, bytes(data)))
+            return True
+        except queue.Full:
+            self.dropped_bytes += len(data)
+            return False
+
+    def _open(self, track: str) -> WavFile:
+        self._index[track] += 1
+        path = os.path.join(self.directory, f"{self.prefix}_{track}_{self._index[track]:03d}.wav")
+        wav = self.files[track] = WavFile(path, self.tracks[track])
+        return wav
+
+    def _write(self, track: str, data: bytes) -> None:
+        fmt = self.tracks[track]
+        wav = self.files.get(track)
+        if wav is None:
+            wav = self._open(track)
+        elif wav.data_bytes + len(data) > self.max_file_seconds * fmt.bytes_per_second:
+            wav.close()
+            wav = self._open(track)
+        wav.write(data)
+        self.written_bytes[track] += len(data)
+
+    def _run(self) -> None:
+        last_patch = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.patch_interval)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if item:
+                try:
+                    self._write(*item)
+                except Exception as e:
+                    print(f"Recorder write error: {e}")
+            if time.monotonic() - last_patch >= self.patch_interval:
+                for wav in self.files.values():
+                    wav.patch()
+                last_patch = time.monotonic()
+        for wav in self.files.values():
+            wav.close()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """写完队列中剩余的数据并关闭文件"""
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def paths(self):
+        return [wav.path for wav in self.files.values()]
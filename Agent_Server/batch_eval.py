@@ -0,0 +1,253 @@
+"""
+批量评测
+
+以 audio_file 模式并发处理一个目录下的 WAV 文件 (16kHz 单声道 16bit)，按文件记录 ASR 文本、回复文本、
+TTS 音频和每轮对话的延迟，结果逐行写入 JSONL 文件:
+    - 发送节奏: realtime (与录音时长一致)、Nx (N 倍速，如 4x)、max (不等待，受 WebSocket 写缓冲背压限制)
+    - 延迟从 ASR 结束 (459) 开始计时，到第一条回复文本 (550) / 第一块 TTS 音频 (352)
+
+    python batch_eval.py --dir samples/ [--concurrency 4] [--pace 4x] [--out results.jsonl] [--tts-dir tts/]
+
+    # 离线运行，不需要 API 密钥
+    python fake_cloud.py &
+    python batch_eval.py --dir samples/ --pace max --url ws://127.0.0.1:8770
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import time
+import uuid
+import wave
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+import config
+from audio_recorder import TrackFormat, WavFile
+from realtime_dialog_client import RealtimeDialogClient
+from stats import parse_pace, percentile
+
+CHUNK_SECONDS = 0.02
+# 回复结束后没有新事件多长时间视为文件处理完毕
+SETTLE_SECONDS = 1.0
+INPUT_FORMAT = TrackFormat(channels=1, sample_rate=16000, sample_width=2)
+
+
+@dataclass
+class Turn:
+    """一轮对话"""
+    asr_text: str = ""
+    reply_text: str = ""
+    asr_end_ms: Optional[float] = None  # 相对会话开始
+    first_text_ms: Optional[float] = None
+    first_audio_ms: Optional[float] = None
+    tts_end_ms: Optional[float] = None
+    tts_bytes: int = 0
+
+
+@dataclass
+class FileResult:
+    file: str
+    audio_s: float = 0.0
+    wall_s: float = 0.0
+    send_s: float = 0.0
+    turns: List[Turn] = field(default_factory=list)
+    tts_file: str = ""
+    error: str = ""
+
+
+class FileSession:
+    """一个文件对应一个会话 (独立的 WebSocket 连接)"""
+
+    def __init__(self, ws_config: Dict[str, Any], path: str, speed: float, output_audio_format: str,
+                 tts_dir: str = "", timeout: float = 30.0):
+        self.path = path
+        self.speed = speed
+        self.timeout = timeout
+        self.tts_dir = tts_dir
+        int16 = output_audio_format == "pcm_s16le"
+        self.output_format = TrackFormat(channels=1, sample_rate=24000, sample_width=2 if int16 else 4, is_float=not int16)
+        self.session_id = str(uuid.uuid4())
+        self.client = RealtimeDialogClient(config=ws_config, session_id=self.session_id,
+                                           output_audio_format=output_audio_format, mod="audio_file")
+        self.result = FileResult(file=os.path.basename(path))
+        self.turn: Optional[Turn] = None
+        self.tts: Optional[WavFile] = None
+        self.t0 = 0.0
+        self.last_event = 0.0
+
+    def now_ms(self) -> float:
+        return (time.monotonic() - self.t0) * 1000
+
+    async def run(self) -> FileResult:
+        self.t0 = time.monotonic()
+        try:
+            await self.client.connect()
+            receiver = asyncio.ensure_future(self.receive_loop())
+            try:
+                await self.send_audio()
+                await self.wait_done(receiver)
+                await self.client.finish_session()
+                await asyncio.wait_for(receiver, self.timeout)
+            finally:
+                receiver.cancel()
+                await self.client.finish_connection()
+                await self.client.close()
+        except Exception as e:
+            self.result.error = f"{type(e).__name__}: {e}"
+        finally:
+            if self.tts:
+                self.tts.close()
+        self.result.wall_s = round(time.monotonic() - self.t0, 3)
+        return self.result
+
+    async def send_audio(self):
+        with wave.open(self.path, "rb") as wf:
+            fmt = TrackFormat(wf.getnchannels(), wf.getframerate(), wf.getsampwidth())
+            if fmt != INPUT_FORMAT:
+                raise ValueError(f"unsupported wav format {fmt}, expected {INPUT_FORMAT}")
+            frames = int(fmt.sample_rate * CHUNK_SECONDS)
+            self.result.audio_s = round(wf.getnframes() / fmt.sample_rate, 3)
+            start = time.monotonic()
+            sent = 0
+            while True:
+                data = wf.readframes(frames)
+                if not data:
+                    break
+                await self.client.task_request(data)
+                sent += len(data) // fmt.sample_width
+                if self.speed:
+                    # 按累计音频时长计算发送时刻，sleep 误差不会累积
+                    delay = start + sent / fmt.sample_rate / self.speed - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+            self.result.send_s = round(time.monotonic() - start, 3)
+
+    async def wait_done(self, receiver):
+        """发送完毕后等待回复: 没有进行中的轮次且 SETTLE_SECONDS 内没有新事件时结束，timeout 秒内没有任何事件时放弃"""
+        self.last_event = time.monotonic()
+        while not receiver.done():
+            idle = time.monotonic() - self.last_event
+            if self.turn is None and self.result.turns and idle >= SETTLE_SECONDS:
+                break
+            if idle >= self.timeout:
+                break
+            await asyncio.sleep(0.1)
+
+    def open_turn(self) -> Turn:
+        if self.turn is None:
+            self.turn = Turn()
+            self.result.turns.append(self.turn)
+        return self.turn
+
+    def on_response(self, response: Dict[str, Any]):
+        self.last_event = time.monotonic()
+        event = response.get("event")
+        payload = response.get("payload_msg")
+        if event == 450:
+            # 新的一句话开始，上一轮未结束的回复被打断
+            self.turn = None
+            self.open_turn()
+        elif event == 451:
+            results = (payload.get("results") or [{}]) if isinstance(payload, dict) else [{}]
+            text = results[0].get("text", "")
+            if text:
+                self.open_turn().asr_text = text
+        elif event == 459:
+            self.open_turn().asr_end_ms = round(self.now_ms(), 1)
+        elif event == 550:
+            turn = self.open_turn()
+            if turn.first_text_ms is None and turn.asr_end_ms is not None:
+                turn.first_text_ms = round(self.now_ms() - turn.asr_end_ms, 1)
+            turn.reply_text += payload.get("content", "") if isinstance(payload, dict) else ""
+        elif event == 352 and isinstance(payload, bytes):
+            turn = self.open_turn()
+            if turn.first_audio_ms is None and turn.asr_end_ms is not None:
+                turn.first_audio_ms = round(self.now_ms() - turn.asr_end_ms, 1)
+            turn.tts_bytes += len(payload)
+            if self.tts_dir:
+                if self.tts is None:
+                    name = os.path.splitext(self.result.file)[0] + "_tts.wav"
+                    self.tts = WavFile(os.path.join(self.tts_dir, name), self.output_format)
+                    self.result.tts_file = self.tts.path
+                self.tts.write(payload)
+        elif event == 359:
+            if self.turn is not None:
+                if self.turn.asr_end_ms is not None:
+                    self.turn.tts_end_ms = round(self.now_ms() - self.turn.asr_end_ms, 1)
+                self.turn = None
+
+    async def receive_loop(self):
+        while True:
+            response = await self.client.receive_server_response()
+            if not response:
+                continue
+            self.on_response(response)
+            if response.get("event") in (152, 153):
+                break
+
+
+async def run_batch(files: List[str], ws_config: Dict[str, Any], concurrency: int, speed: float,
+                    out: str, output_audio_format: str, tts_dir: str = "", timeout: float = 30.0) -> List[FileResult]:
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+
+    async def run_one(path, f):
+        async with semaphore:
+            result = await FileSession(ws_config, path, speed, output_audio_format, tts_dir, timeout).run()
+        # 每完成一个文件写一行，中途退出也能保留已完成的结果
+        f.write(json.dumps(asdict(result), ensure_ascii=False) + "\n")
+        f.flush()
+        results.append(result)
+        status = result.error or f"{len(result.turns)} turns"
+        print(f"[{len(results)}/{len(files)}] {result.file}: {result.audio_s}s audio in {result.wall_s}s, {status}")
+
+    with open(out, "w", encoding="utf-8") as f:
+        await asyncio.gather(*(run_one(path, f) for path in files))
+    return results
+
+
+def summarize(results: List[FileResult], wall_s: float) -> str:
+    turns = [turn for result in results for turn in result.turns]
+    audio_s = sum(result.audio_s for result in results)
+    lines = [f"files={len(results)} errors={sum(1 for r in results if r.error)} turns={len(turns)} "
+             f"audio={audio_s:.1f}s wall={wall_s:.1f}s speedup={audio_s / wall_s if wall_s else 0:.1f}x"]
+    for name in ("first_text_ms", "first_audio_ms", "tts_end_ms"):
+        values = [getattr(turn, name) for turn in turns if getattr(turn, name) is not None]
+        if values:
+            lines.append(f"{name}: p50={percentile(values, 0.5):.0f} p95={percentile(values, 0.95):.0f} "
+                         f"max={max(values):.0f}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="batch evaluation over a directory of wav files")
+    parser.add_argument("--dir", required=True, help="directory of 16kHz mono 16-bit wav files")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--pace", type=parse_pace, default=1.0, help="realtime, Nx (e.g. 4x) or max")
+    parser.add_argument("--out", default="results.jsonl")
+    parser.add_argument("--tts-dir", default="", help="save the TTS audio of each file")
+    parser.add_argument("--format", default="pcm", choices=("pcm", "pcm_s16le"), help="TTS output format")
+    parser.add_argument("--url", default="", help="override ws_connect_config base_url, e.g. the fake cloud")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for a reply")
+    args = parser.parse_args()
+
+    files = sorted(os.path.join(args.dir, name) for name in os.listdir(args.dir) if name.lower().endswith(".wav"))
+    if not files:
+        parser.error(f"no wav files in {args.dir}")
+    if args.tts_dir:
+        os.makedirs(args.tts_dir, exist_ok=True)
+    ws_config = copy.deepcopy(config.ws_connect_config)
+    if args.url:
+        ws_config["base_url"] = args.url
+
+    start = time.monotonic()
+    results = asyncio.run(run_batch(files, ws_config, max(args.concurrency, 1), args.pace, args.out,
+                                    args.format, args.tts_dir, args.timeout))
+    print(summarize(results, time.monotonic() - start))
+    print(f"results: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+事件循环对比基准
+
+在同一进程中启动本地模拟云端 (fake_cloud.py) 与中转服务器，模拟多台设备通过二进制协议上传音频
+(每帧 1024 字节 / 32ms，说话与静音交替，模拟云端会回复 TTS 音频)，统计:
+    - 吞吐量: 模拟云端每秒收到的上行音频帧
+    - 帧转发延迟: 设备发送到模拟云端收到的耗时 (帧内携带发送时间) p50 / p99
+    - 事件循环调度延迟直方图
+    - 中转服务器各连接的消息数与 socket 写入次数 (write_batch_config)
+
+    python bench_loop.py [--devices 20] [--frames 300] [--pace max|realtime|4x]
+    python bench_loop.py --loop uvloop      # 只运行一种事件循环
+
+不指定 --loop 时依次在子进程中运行 asyncio 与 uvloop (已安装时) 并对比。
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import io
+import json
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+import websockets
+
+import config
+import device_protocol
+from esp32_server import ESP32WebSocketServer
+from event_loop import LoopLagSampler, install
+from fake_cloud import FakeCloud
+from stats import parse_pace, percentile
+
+FRAME_BYTES = 1024
+FRAME_MS = 32
+MAGIC = b"BNCH"
+_STAMP = struct.Struct("<4sd")
+# 每轮说话 / 静音的帧数 (静音超过模拟云端的 end_ms，每轮都会触发一次回复)
+SPEECH_FRAMES = 40
+SILENCE_FRAMES = 30
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_frame(loud: bool) -> bytearray:
+    n = FRAME_BYTES // 2
+    samples = [3000 if i & 1 else -3000 for i in range(n)] if loud else [0] * n
+    frame = bytearray(struct.pack(f"<{n}h", *samples))
+    _STAMP.pack_into(frame, 0, MAGIC, 0.0)
+    return frame
+
+
+class Bench:
+    def __init__(self, devices: int, frames: int, speed: float):
+        self.devices = devices
+        self.frames = frames
+        self.speed = speed
+        self.latencies = []
+        self.forwarded = 0
+        self.down_bytes = 0
+        self.errors = 0
+
+    def on_cloud_audio(self, session_id, pcm):
+        if pcm[:4] == MAGIC:
+            self.latencies.append((time.perf_counter() - _STAMP.unpack_from(pcm)[1]) * 1000)
+            self.forwarded += 1
+
+    async def drain(self, ws):
+        async for message in ws:
+            self.down_bytes += len(message)
+
+    async def device(self, url: str, index: int):
+        frames = (make_frame(True), make_frame(False))
+        try:
+            async with websockets.connect(f"{url}/device/bench-{index}", max_size=None,
+                                          subprotocols=[device_protocol.SUBPROTOCOL]) as ws:
+                # 收到 CONFIG 表示已准入并建立了云端会话
+                while True:
+                    message = await asyncio.wait_for(ws.recv(), 30)
+                    if isinstance(message, bytes) and device_protocol.decode(message)[0] == device_protocol.TYPE_CONFIG:
+                        break
+                drain = asyncio.ensure_future(self.drain(ws))
+                start = time.perf_counter()
+                for i in range(self.frames):
+                    frame = frames[0] if i % (SPEECH_FRAMES + SILENCE_FRAMES) < SPEECH_FRAMES else frames[1]
+                    struct.pack_into("<d", frame, 4, time.perf_counter())
+                    await ws.send(device_protocol.encode(device_protocol.TYPE_AUDIO, bytes(frame)))
+                    if self.speed:
+                        delay = start + (i + 1) * FRAME_MS / 1000 / self.speed - time.perf_counter()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                # 等待最后几帧到达模拟云端
+                await asyncio.sleep(0.5)
+                drain.cancel()
+        except Exception as e:
+            self.errors += 1
+            print(f"device {index}: {type(e).__name__}: {e}", file=sys.stderr)
+
+    async def run(self) -> dict:
+        # 中转服务器连接模拟云端，不限制准入，不录音
+        cloud_port, relay_port = free_port(), free_port()
+        config.ws_connect_config["base_url"] = f"ws://127.0.0.1:{cloud_port}"
+        config.admission_config.update(max_sessions=0, rate=0)
+        config.recording_config["relay"] = False
+
+        cloud = FakeCloud(port=cloud_port, think_ms=50)
+        cloud.audio_hook = self.on_cloud_audio
+        relay = ESP32WebSocketServer("127.0.0.1", relay_port)
+        tasks = [asyncio.ensure_future(cloud.serve()), asyncio.ensure_future(relay.start())]
+        await asyncio.sleep(0.5)
+        sampler = LoopLagSampler(interval=0.01)
+        sampler.start()
+        start = time.perf_counter()
+        await asyncio.gather(*(self.device(f"ws://127.0.0.1:{relay_port}", i) for i in range(self.devices)))
+        elapsed = time.perf_counter() - start
+        sampler.stop()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # 各连接合并写出的汇总: 消息数 / socket 写入次数
+        writes = {}
+        for metrics in relay.devices.values():
+            for leg, stats in metrics.writes.items():
+                total = writes.setdefault(leg, {"messages": 0, "writes": 0})
+                total["messages"] += stats["messages"]
+                total["writes"] += stats["writes"]
+        return {
+            "devices": self.devices,
+            "frames": self.devices * self.frames,
+            "forwarded": self.forwarded,
+            "errors": self.errors,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_fps": round(self.forwarded / elapsed, 1) if elapsed else 0,
+            "down_kb": self.down_bytes // 1024,
+            "latency_p50_ms": round(percentile(self.latencies, 0.5) or 0, 2),
+            "latency_p99_ms": round(percentile(self.latencies, 0.99) or 0, 2),
+            "latency_max_ms": round(max(self.latencies, default=0), 2),
+            "loop_lag": sampler.snapshot(),
+            "writes": writes,
+        }
+
+
+def run_one(args) -> dict:
+    loop = install(args.loop)
+    bench = Bench(args.devices, args.frames, args.pace)
+    # 中转服务器与模拟云端的日志不计入结果
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = asyncio.run(bench.run())
+    result["loop"] = loop
+    return result
+
+
+def compare(args):
+    loops = ["asyncio"]
+    if importlib.util.find_spec("uvloop"):
+        loops.append("uvloop")
+    else:
+        print("uvloop is not installed (pip install uvloop), running asyncio only")
+    results = []
+    for loop in loops:
+        cmd = [sys.executable, __file__, "--loop", loop, "--devices", str(args.devices),
+               "--frames", str(args.frames), "--pace", args.pace_text, "--json"]
+        output = subprocess.run(cmd, stdout=subprocess.PIPE, check=True).stdout.decode()
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    print(f"{'loop':8s} {'frames/s':>10s} {'p50 ms':>8s} {'p99 ms':>8s} {'max ms':>8s} {'lag p99':>8s} {'errors':>6s}")
+    for r in results:
+        print(f"{r['loop']:8s} {r['throughput_fps']:10.1f} {r['latency_p50_ms']:8.2f} {r['latency_p99_ms']:8.2f} "
+              f"{r['latency_max_ms']:8.2f} {r['loop_lag']['p99_ms']:8g} {r['errors']:6d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="compare relay throughput and latency across event loops")
+    parser.add_argument("--loop", choices=("asyncio", "uvloop"), default=None, help="run a single loop")
+    parser.add_argument("--devices", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=300, help="frames per device (32 ms each)")
+    parser.add_argument("--pace", default="max", help="realtime, Nx or max")
+    parser.add_argument("--json", action="store_true", help="print the result as one JSON line")
+    args = parser.parse_args()
+    args.pace_text = args.pace
+    args.pace = parse_pace(args.pace)
+    if args.loop is None:
+        compare(args)
+        return
+    result = run_one(args)
+    print(json.dumps(result) if args.json else json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
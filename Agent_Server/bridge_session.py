@@ -1,90 +1,239 @@
 import asyncio
 import json
+import random
 import uuid
-from typing import Dict, Any, Optional
+from collections import deque
+from typing import Awaitable, Callable, Dict, Any, List, Optional, Tuple
 
 import config
 from realtime_dialog_client import RealtimeDialogClient
+from session_profile import SessionProfile
+
+# 上行音频 16kHz 16bit 单声道，每秒字节数
+UP_BYTES_PER_SECOND = 16000 * 2
+# 用户一句话结束 (ASREnded)，此前的上行音频云端已完整收到，重连后无需重放
+ASR_ENDED_EVENT = 459
+
+
+class UpstreamRing:
+    """最近一段上行 PCM，按块保存并编号，云端重连后按顺序重放"""
+    def __init__(self, capacity_bytes: int):
+        self.capacity = capacity_bytes
+        self.chunks: deque = deque()
+        self.bytes = 0
+        self.next_seq = 0
+        self.dropped_bytes = 0
+
+    def append(self, pcm: bytes) -> None:
+        if not self.capacity:
+            return
+        self.chunks.append((self.next_seq, bytes(pcm)))
+        self.next_seq += 1
+        self.bytes += len(pcm)
+        while self.bytes > self.capacity:
+            _, old = self.chunks.popleft()
+            self.bytes -= len(old)
+            self.dropped_bytes += len(old)
+
+    def since(self, seq: int) -> List[Tuple[int, bytes]]:
+        """编号不小于 seq 的块"""
+        return [item for item in self.chunks if item[0] >= seq]
+
+    def clear(self) -> None:
+        self.chunks.clear()
+        self.bytes = 0
+
 
 class BridgeDialogSession:
     """
     中转对话会话类，将 RealtimeDialogClient 与外部网络流（如 ESP32）解耦。
     不再直接操作 PyAudio 或本地文件，而是通过回调或队列处理音频输入输出。
+    云端连接意外断开时按指数退避重连并建立新会话，最近几秒的上行音频保存在 UpstreamRing 中，
+    重连后先重放再继续转发，设备连接不受影响。
+    每次重连前调用 acquire_token (AdmissionController.acquire_token) 取得令牌，避免云端故障时集中重连。
     """
-    def __init__(self, ws_config: Dict[str, Any], output_audio_format: str = "pcm", 
-                 mod: str = "audio", recv_timeout: int = 10):
+    def __init__(self, ws_config: Dict[str, Any], output_audio_format: str = "pcm",
+                 mod: str = "audio", recv_timeout: int = 10, profile: Optional[SessionProfile] = None,
+                 write_batch: Optional[Dict[str, Any]] = None, reconnect: Optional[Dict[str, Any]] = None,
+                 acquire_token: Optional[Callable[[], Awaitable[None]]] = None):
+        self._client_args = dict(config=ws_config, output_audio_format=output_audio_format, mod=mod,
+                                 recv_timeout=recv_timeout, profile=profile, write_batch=write_batch)
+        self.reconnect = reconnect or {}
+        self.acquire_token = acquire_token
         self.session_id = str(uuid.uuid4())
-        self.client = RealtimeDialogClient(
-            config=ws_config, 
-            session_id=self.session_id,
-            output_audio_format=output_audio_format, 
-            mod=mod, 
-            recv_timeout=recv_timeout
-        )
+        self.client = RealtimeDialogClient(session_id=self.session_id, **self._client_args)
+        self.ring = UpstreamRing(int(self.reconnect.get("replay_seconds", 0) * UP_BYTES_PER_SECOND)
+                                 if self.reconnect.get("enabled") else 0)
         self.is_running = False
         self.is_session_finished = False
+        # 云端连接可用 (重连期间上行音频只写入 ring)
+        self.connected = asyncio.Event()
+        self._reconnect_task = None
+        self.reconnects = 0
+        self.replayed_bytes = 0
         self.on_audio_received = None  # 回调函数: func(audio_data: bytes)
         self.on_event_received = None  # 回调函数: func(event_id: int, payload: dict)
+        self.on_closed = None          # 回调函数: func()，云端会话结束且不再重连时调用
 
     async def start(self):
         """建立云端连接"""
         await self.client.connect()
         self.is_running = True
+        self.connected.set()
         # 启动接收循环
-        asyncio.create_task(self._receive_loop())
+        asyncio.create_task(self._receive_loop(self.client))
+
+    async def ping(self):
+        """向当前云端连接发送 ping (见 liveness.py)"""
+        return await self.client.ping()
 
     async def send_audio(self, pcm_data: bytes):
-        """转发音频到云端"""
-        if self.is_running:
+        """转发音频到云端，重连期间只保存"""
+        if not self.is_running:
+            return
+        self.ring.append(pcm_data)
+        if not self.connected.is_set():
+            return
+        try:
             await self.client.task_request(pcm_data)
+        except Exception as e:
+            if not self._connection_lost(self.client, e):
+                raise
 
     async def send_text(self, text: str):
         """转发文本到云端"""
-        if self.is_running:
+        if self.is_running and self.connected.is_set():
             await self.client.chat_text_query(text)
 
     async def stop(self):
         """停止会话"""
         self.is_running = False
-        await self.client.finish_session()
-        # 等待云端确认结束（简单处理，实际可增加 Event 监听）
-        await asyncio.sleep(0.5)
-        await self.client.finish_connection()
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+        try:
+            await self.client.finish_session()
+            # 等待云端确认结束（简单处理，实际可增加 Event 监听）
+            await asyncio.sleep(0.5)
+            await self.client.finish_connection()
+        except Exception as e:
+            # 云端连接已断开 (例如心跳判定停滞)
+            print(f"Bridge stop error: {e}")
         await self.client.close()
 
-    async def _receive_loop(self):
+    def _connection_lost(self, client: RealtimeDialogClient, error: Exception) -> bool:
+        """当前云端连接断开，启用重连时开始重连并返回 True"""
+        if not self.is_running or client is not self.client or not self.reconnect.get("enabled"):
+            return False
+        if self._reconnect_task is None or self._reconnect_task.done():
+            print(f"Cloud connection lost ({error}), reconnecting")
+            self.connected.clear()
+            self._reconnect_task = asyncio.ensure_future(self._reconnect())
+        return True
+
+    def _closed(self):
+        self.is_running = False
+        self.is_session_finished = True
+        self.connected.clear()
+        if self.on_closed:
+            self.on_closed()
+
+    async def _reconnect(self):
+        """按指数退避重连，成功后重放 ring 中的上行音频"""
+        try:
+            await asyncio.wait_for(self.client.close(), 1.0)
+        except Exception:
+            pass
+        base = self.reconnect.get("base_delay", 0.5)
+        max_delay = self.reconnect.get("max_delay", 8.0)
+        for attempt in range(self.reconnect.get("max_attempts", 6)):
+            # 退避时间的 50%~100%
+            delay = min(base * (2 ** attempt), max_delay)
+            await asyncio.sleep(delay * (0.5 + random.random() / 2))
+            if self.acquire_token:
+                await self.acquire_token()
+            if not self.is_running:
+                return
+            self.session_id = str(uuid.uuid4())
+            client = RealtimeDialogClient(session_id=self.session_id, **self._client_args)
+            try:
+                await asyncio.wait_for(client.connect(), self.reconnect.get("connect_timeout", 10.0))
+            except Exception as e:
+                print(f"Cloud reconnect attempt {attempt + 1} failed: {e}")
+                try:
+                    await client.close()
+                except Exception:
+                    pass
+                continue
+            try:
+                await self._replay(client)
+            except Exception as e:
+                # 重放期间再次断开，关闭这个连接并继续下一次重连
+                print(f"Cloud replay failed: {e}")
+                try:
+                    await client.close()
+                except Exception:
+                    pass
+                continue
+            # 重放完成后才切换到新连接并恢复直接转发
+            # (与 _replay 最后一次检查 ring 之间没有 await，不会漏掉新到达的音频)
+            self.client = client
+            self.reconnects += 1
+            asyncio.create_task(self._receive_loop(client))
+            self.connected.set()
+            print(f"Cloud reconnected (session {self.session_id}), replayed {self.replayed_bytes // 1024} KB")
+            return
+        print("Cloud reconnect gave up")
+        self._closed()
+
+    async def _replay(self, client: RealtimeDialogClient):
+        """按顺序发送 ring 中的音频，期间新到达的音频继续追加，直到全部发送"""
+        seq = 0
+        while True:
+            chunks = self.ring.since(seq)
+            if not chunks:
+                break
+            for seq, chunk in chunks:
+                await client.task_request(chunk)
+                self.replayed_bytes += len(chunk)
+            seq += 1
+
+    async def _receive_loop(self, client: RealtimeDialogClient):
         """持续接收云端响应并触发回调"""
+        reconnecting = False
         try:
-            while self.is_running:
-                response = await self.client.receive_server_response()
+            while self.is_running and client is self.client:
+                response = await client.receive_server_response()
                 if not response:
                     continue
 
                 msg_type = response.get('message_type')
-                
+
                 # 1. 处理音频数据 (SERVER_ACK 携带音频)
                 if msg_type == 'SERVER_ACK' and isinstance(response.get('payload_msg'), bytes):
                     if self.on_audio_received:
                         await self.on_audio_received(response['payload_msg'])
-                
+
                 # 2. 处理业务事件 (SERVER_FULL_RESPONSE)
                 elif msg_type == 'SERVER_FULL_RESPONSE':
                     event = response.get('event')
                     payload = response.get('payload_msg', {})
+                    if event == ASR_ENDED_EVENT:
+                        self.ring.clear()
                     if self.on_event_received:
                         await self.on_event_received(event, payload)
-                    
+
                     # 检查会话是否结束
                     if event in [152, 153]:
                         self.is_session_finished = True
                         break
-                
+
                 elif msg_type == 'SERVER_ERROR':
                     print(f"Cloud Server Error: {response.get('payload_msg')}")
                     break
 
         except Exception as e:
             print(f"Bridge receive loop error: {e}")
+            reconnecting = self._connection_lost(client, e)
         finally:
-            self.is_running = False
-            self.is_session_finished = True
+            if not reconnecting and self.is_running and client is self.client:
+                self._closed()
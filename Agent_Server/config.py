@@ -1,4 +1,4 @@
-import uuid
+import os
 import pyaudio
 
 # 配置信息
@@ -9,7 +9,7 @@ ws_connect_config = {
         "X-Api-Access-Key": "xxx",
         "X-Api-Resource-Id": "volc.speech.dialog",  # 固定值
         "X-Api-App-Key": "PlgvMymc7f3tQnJ6",  # 固定值
-        "X-Api-Connect-Id": str(uuid.uuid4()),
+        # X-Api-Connect-Id 由 RealtimeDialogClient 为每个连接单独生成
     }
 }
 
@@ -56,9 +56,82 @@ input_audio_config = {
 }
 
 output_audio_config = {
-    "chunk": 3200,
+    # 回调模式下每个设备缓冲周期的帧数 (40ms)，打断后最长一个周期恢复静音
+    "chunk": 960,
     "format": "pcm",
     "channels": 1,
     "sample_rate": 24000,
     "bit_size": pyaudio.paFloat32
 }
+
+# 字幕字形包：随字幕下发所需字形点阵，设备渲染时不再查找 flash 字库 (仅二进制协议)
+glyph_pack_config = {
+    "enabled": True,
+    # 与设备端同格式的 BMF 字库，可替换为更完整的字库
+    "bmf_font": os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "text_lite_16px_2312.v3.bmf"),
+    # 可选：TTF/OTF 字体，用于渲染 BMF 字库以外的字符 (需要 Pillow)
+    "ttf_font": "",
+    "font_size": 16,
+}
+
+# 设备端 VAD：连接建立后通过 TYPE_CONFIG 下发给设备，设备静音时不上传音频
+device_vad_config = {
+    "enabled": False,
+    "threshold": 400,      # 语音帧的最小平均幅度 (16bit)
+    "zcr_max": 0,          # 语音帧每帧 (32ms) 最大过零次数，0 表示不限制
+    "hangover_ms": 640,    # 语音结束后继续发送的时长
+    "preroll_ms": 320,     # 语音开始前补发的时长 (设备端上限 640)
+    "start_frames": 2,     # 连续多少帧语音才进入语音状态
+    # 设备进入静音后，中转服务器继续向云端发送的静音时长，保证云端能判断一句话结束
+    "silence_fill_ms": 2000,
+}
+
+# 会话录音：后台线程把上行 / 下行音频追加写入 WAV 文件
+recording_config = {
+    "enabled": True,
+    "dir": "recordings",
+    "max_file_seconds": 300,   # 单个文件最大时长，超过后切换到新文件
+    "max_queue": 512,          # 写入队列最多缓存的音频块，写入跟不上时丢弃
+    "relay": False,            # 中转服务器也按设备会话录音
+}
+
+# 设备注册表：按设备设置发音人、人设、音频格式与限速，文件修改后自动重新加载 (格式见 device_registry.py)
+device_registry_config = {
+    "path": "devices.json",    # 相对路径基于 Agent_Server 目录，文件不存在时所有设备使用默认参数
+    "check_interval": 2.0,     # 检查文件修改的最小间隔 (秒)
+}
+
+# 会话准入：限制同时会话数与新建云端会话的速率，超出时排队，排队失败则通知设备稍后重连
+admission_config = {
+    "max_sessions": 8,         # 最大同时会话数，0 表示不限制
+    "rate": 2.0,               # 每秒可新建的云端会话数，0 表示不限制
+    "burst": 4,                # 令牌桶容量 (允许的瞬时突发)
+    "queue_size": 16,          # 等待队列长度
+    "queue_timeout": 10.0,     # 最长排队时间 (秒)
+    "retry_min": 2.0,          # 建议设备重连等待时间的范围 (秒)
+    "retry_max": 30.0,
+}
+
+# 合并写出：链路空闲时消息立即写出，drain 期间到达的消息合并为一次 socket 写入 (中转服务器的设备与云端连接)
+write_batch_config = {
+    "enabled": True,
+    "max_bytes": 32768,        # 排队达到该字节数时立即写出并等待 drain
+}
+
+# 链路心跳：中转服务器定时向设备与云端发送 WebSocket ping，记录往返时间，超时且无任何数据到达则主动断开
+heartbeat_config = {
+    "device_interval": 5.0,    # 设备连接的心跳间隔 (秒)，0 表示不发送
+    "device_timeout": 15.0,    # 设备连接停滞判定时间 (秒)，同时下发给设备用于检测服务器失联
+    "cloud_interval": 5.0,     # 云端连接的心跳间隔 (秒)
+    "cloud_timeout": 10.0,     # 云端连接停滞判定时间 (秒)
+}
+
+# 云端重连：会话中云端连接断开时按指数退避重连，最近几秒的上行音频在新会话中重放，设备保持连接
+cloud_reconnect_config = {
+    "enabled": True,
+    "base_delay": 0.5,         # 首次重连前的等待时间 (秒)，之后每次翻倍 (取 50%~100% 的随机值)
+    "max_delay": 8.0,          # 单次等待上限 (秒)
+    "max_attempts": 6,         # 连续失败该次数后结束会话，设备连接随之关闭
+    "connect_timeout": 10.0,   # 单次建立连接与会话的超时 (秒)
+    "replay_seconds": 3.0,     # 重放的上行音频时长 (断开前的最后几秒与重连期间的音频)
+}
@@ -0,0 +1,80 @@
+"""
+设备指标
+
+按设备汇总中转服务器侧的计数 (连接次数、上下行字节、最近一次连接时间) 与设备通过
+TYPE_STATS 上报的遥测数据，供日志和外部查询使用 (ESP32WebSocketServer.device_metrics)。
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class DeviceMetrics:
+    device_id: str
+    connections: int = 0
+    connected: bool = False
+    connected_at: float = 0.0
+    last_seen: float = 0.0
+    # 服务器侧计数，跨连接累计
+    up_bytes: int = 0
+    down_bytes: int = 0
+    stats_reports: int = 0
+    stats_at: Optional[float] = None
+    # 设备最近一次上报的遥测 {name: value}
+    stats: Dict[str, int] = field(default_factory=dict)
+    # 最近一次连接的合并写出统计 {"device": {...}, "cloud": {...}}
+    writes: Dict[str, Dict] = field(default_factory=dict)
+    # 当前 (或最近一次) 连接的链路心跳 {"device": LinkMonitor, "cloud": LinkMonitor}
+    links: Dict[str, Any] = field(default_factory=dict)
+
+    def on_connect(self):
+        self.connections += 1
+        self.connected = True
+        self.connected_at = self.last_seen = time.time()
+
+    def on_disconnect(self):
+        self.connected = False
+        self.last_seen = time.time()
+
+    def add_up(self, n: int):
+        self.up_bytes += n
+        self.last_seen = time.time()
+
+    def add_down(self, n: int):
+        self.down_bytes += n
+
+    def set_writes(self, leg: str, stats: Dict):
+        self.writes[leg] = stats
+
+    def update_stats(self, stats: Dict[str, int]):
+        self.stats = stats
+        self.stats_reports += 1
+        self.stats_at = self.last_seen = time.time()
+
+    def snapshot(self) -> Dict:
+        now = time.time()
+        return {
+            "device_id": self.device_id,
+            "connected": self.connected,
+            "connections": self.connections,
+            "session_s": round(now - self.connected_at, 1) if self.connected else 0,
+            "last_seen_s": round(now - self.last_seen, 1),
+            "server": {"up_bytes": self.up_bytes, "down_bytes": self.down_bytes},
+            "device": dict(self.stats),
+            "writes": dict(self.writes),
+            "links": {leg: link.snapshot() for leg, link in self.links.items()},
+            "stats_reports": self.stats_reports,
+            "stats_age_s": round(now - self.stats_at, 1) if self.stats_at else None,
+        }
+
+    def summary(self) -> str:
+        """一行摘要，用于日志"""
+        s = self.stats
+        return (f"heap={s.get('free_heap', 0) // 1024}KB(min {s.get('free_heap_min', 0) // 1024}KB) "
+                f"gc={s.get('gc_count', 0)} rssi={s.get('rssi_dbm', 0)}dBm "
+                f"up={s.get('up_rate_bps', 0) // 1024}KB/s down={s.get('down_rate_bps', 0) // 1024}KB/s "
+                f"queue<={s.get('audio_queue_max', 0)} underruns={s.get('underruns', 0)} "
+                f"mic_lost={s.get('mic_lost_samples', 0)} backlog<={s.get('up_backlog_max', 0)} "
+                f"vad_skipped={s.get('vad_skipped_bytes', 0) // 1024}KB "
+                f"lag={s.get('loop_lag_avg_us', 0) // 1000}/{s.get('loop_lag_max_us', 0) // 1000}ms")
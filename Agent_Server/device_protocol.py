@@ -0,0 +1,145 @@
+"""
+ESP32 <-> 中转服务器 二进制消息格式 (服务器端)
+与设备端 device_protocol.py 保持一致
+
+每条消息占一个 WebSocket 二进制帧，4 字节头 + 负载:
+    version(4 bits) + type(4 bits)
+    flags(8 bits)
+    payload length(16 bits, big endian)
+    payload
+握手时通过 Sec-WebSocket-Protocol 协商，未协商的设备继续使用 原始 PCM + JSON 文本帧
+"""
+import struct
+from typing import Dict, Iterator, Tuple
+
+SUBPROTOCOL = "s2s.bin.v1"
+VERSION = 0b0001
+HEADER_SIZE = 4
+MAX_PAYLOAD = 0xFFFF
+
+# Message Type
+TYPE_AUDIO = 0x1   # PCM 音频 (双向)
+TYPE_STOP = 0x2    # 打断，立即停止播放 (服务器 -> 设备)
+TYPE_ASR = 0x3     # 用户语音识别文本 UTF-8 (服务器 -> 设备)
+TYPE_LLM = 0x4     # 大模型回复文本 UTF-8 (服务器 -> 设备)
+TYPE_STATS = 0x5   # 设备统计 key/value (设备 -> 服务器)
+TYPE_CONFIG = 0x6  # 运行时配置 key/value (服务器 -> 设备)
+TYPE_QUERY = 0x7   # 文本提问 UTF-8 (设备 -> 服务器)
+TYPE_GLYPHS = 0x8  # 字形包: 1 字节点阵大小 + N * (2 字节码位 + 点阵) (服务器 -> 设备)
+TYPE_VAD = 0x9     # 设备端 VAD 状态: 1 字节，1 进入语音 / 0 进入静音 (设备 -> 服务器)
+TYPE_BUSY = 0xA    # 服务器繁忙，4 字节建议重连等待时间 ms，随后关闭连接 (服务器 -> 设备)
+
+# Flags
+FLAG_PRIORITY = 0x01  # 控制消息，收到后立即处理
+
+# Stats Key (TYPE_STATS)
+STAT_FREE_HEAP = 0x01
+STAT_UP_BYTES = 0x02
+STAT_DOWN_BYTES = 0x03
+STAT_AUDIO_QUEUE = 0x04
+STAT_STOP_LATENCY = 0x05
+STAT_FREE_HEAP_MIN = 0x06
+STAT_GC_COUNT = 0x07
+STAT_GC_TIME = 0x08
+STAT_QUEUE_MAX = 0x09
+STAT_UNDERRUNS = 0x0A
+STAT_RSSI = 0x0B
+STAT_UP_RATE = 0x0C
+STAT_DOWN_RATE = 0x0D
+STAT_LOOP_LAG_MAX = 0x0E
+STAT_LOOP_LAG_AVG = 0x0F
+STAT_UPTIME = 0x10
+STAT_INTERVAL = 0x11
+STAT_MIC_LOST = 0x12
+STAT_UP_BACKLOG_MAX = 0x13
+STAT_VAD_SKIPPED = 0x14
+
+STAT_NAMES = {
+    STAT_FREE_HEAP: "free_heap",
+    STAT_UP_BYTES: "up_bytes",
+    STAT_DOWN_BYTES: "down_bytes",
+    STAT_AUDIO_QUEUE: "audio_queue",
+    STAT_STOP_LATENCY: "stop_latency_us",
+    STAT_FREE_HEAP_MIN: "free_heap_min",
+    STAT_GC_COUNT: "gc_count",
+    STAT_GC_TIME: "gc_time_us",
+    STAT_QUEUE_MAX: "audio_queue_max",
+    STAT_UNDERRUNS: "underruns",
+    STAT_RSSI: "rssi_dbm",
+    STAT_UP_RATE: "up_rate_bps",
+    STAT_DOWN_RATE: "down_rate_bps",
+    STAT_LOOP_LAG_MAX: "loop_lag_max_us",
+    STAT_LOOP_LAG_AVG: "loop_lag_avg_us",
+    STAT_UPTIME: "uptime_s",
+    STAT_INTERVAL: "interval_ms",
+    STAT_MIC_LOST: "mic_lost_samples",
+    STAT_UP_BACKLOG_MAX: "up_backlog_max",
+    STAT_VAD_SKIPPED: "vad_skipped_bytes",
+}
+
+# Config Key (TYPE_CONFIG)
+CFG_VAD_ENABLED = 0x01
+CFG_VAD_THRESHOLD = 0x02
+CFG_VAD_ZCR_MAX = 0x03
+CFG_VAD_HANGOVER = 0x04
+CFG_VAD_PREROLL = 0x05
+CFG_VAD_START = 0x06
+CFG_LINK_TIMEOUT = 0x07
+
+# key/value 负载: 每项 1 字节 key + 4 字节有符号整数
+_HEADER = struct.Struct(">BBH")
+_KV = struct.Struct(">Bi")
+_BUSY = struct.Struct(">I")
+
+
+def encode(msg_type: int, payload: bytes = b"", flags: int = 0) -> bytes:
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"payload too large: {len(payload)}")
+    return _HEADER.pack((VERSION << 4) | msg_type, flags, len(payload)) + payload
+
+
+def decode(data: bytes) -> Tuple[int, int, bytes]:
+    """解析一帧消息，返回 (type, flags, payload)"""
+    if len(data) < HEADER_SIZE:
+        raise ValueError(f"short frame: {len(data)} bytes")
+    b0, flags, length = _HEADER.unpack_from(data)
+    if b0 >> 4 != VERSION:
+        raise ValueError(f"unsupported version: {b0 >> 4}")
+    return b0 & 0x0F, flags, data[HEADER_SIZE:HEADER_SIZE + length]
+
+
+def encode_audio(pcm: bytes) -> Iterator[bytes]:
+    """音频超过单帧上限时按偶数字节切分，保证每帧都是完整采样"""
+    step = MAX_PAYLOAD & ~1
+    for offset in range(0, len(pcm), step):
+        yield encode(TYPE_AUDIO, pcm[offset:offset + step])
+
+
+def encode_stop() -> bytes:
+    return encode(TYPE_STOP, flags=FLAG_PRIORITY)
+
+
+def encode_busy(retry_after_ms: int) -> bytes:
+    return encode(TYPE_BUSY, _BUSY.pack(retry_after_ms), flags=FLAG_PRIORITY)
+
+
+def encode_text(msg_type: int, text: str) -> bytes:
+    payload = text.encode("utf-8")
+    if len(payload) > MAX_PAYLOAD:
+        # 按字符截断，避免切断 UTF-8 多字节序列
+        payload = payload[:MAX_PAYLOAD].decode("utf-8", "ignore").encode("utf-8")
+    return encode(msg_type, payload)
+
+
+def encode_kv(msg_type: int, items: Dict[int, int]) -> bytes:
+    return encode(msg_type, b"".join(_KV.pack(k, v) for k, v in items.items()),
+                  flags=FLAG_PRIORITY if msg_type == TYPE_CONFIG else 0)
+
+
+def decode_kv(payload: bytes) -> Dict[int, int]:
+    return {k: v for k, v in _KV.iter_unpack(payload[:len(payload) - len(payload) % _KV.size])}
+
+
+def decode_stats(payload: bytes) -> Dict[str, int]:
+    """将 TYPE_STATS 负载转换为可读的 {name: value}"""
+    return {STAT_NAMES.get(k, f"stat_{k}"): v for k, v in decode_kv(payload).items()}
@@ -0,0 +1,154 @@
+"""
+设备注册表
+
+从本地 JSON 文件读取每台设备的会话参数 (发音人、人设、音频格式、采样率、编码、限速)，文件修改后自动重新加载:
+
+    {
+        "default": {"speaker": "zh_female_xiaohe_jupiter_bigtts"},
+        "devices": {
+            "kitchen": {"speaker": "zh_male_yunzhou_jupiter_bigtts", "system_role": "你是厨房助手。"},
+            "192.168.1.20": {"max_up_bps": 64000, "max_connections": 1}
+        }
+    }
+
+设备标识依次取自握手路径 (/device/<id> 或 ?device=<id>)、X-Device-Id 请求头、设备 IP。
+同一份参数的设备共用同一个 SessionProfile，StartSession payload 只序列化压缩一次 (见 session_profile.py)。
+"""
+import json
+import os
+import time
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from session_profile import SessionProfile
+
+# 设备链路目前只支持原始 PCM；设备播放 I2S 固定为 16bit 24kHz (esp32_client.py init_speaker)，
+# 中转服务器原样转发 TTS 音频，其他格式与采样率在设备上会播放成杂音
+CODECS = ("pcm",)
+OUTPUT_FORMATS = ("pcm_s16le",)
+SAMPLE_RATES = (24000,)
+
+
+@dataclass(frozen=True)
+class DeviceProfile:
+    """一台设备的会话参数，空字符串表示沿用 config.start_session_req"""
+    speaker: str = ""
+    system_role: str = ""
+    output_audio_format: str = "pcm_s16le"
+    sample_rate: int = 24000
+    codec: str = "pcm"
+    recv_timeout: int = 10
+    # 上行音频限速 (字节/秒) 与同时连接数，0 表示不限制
+    max_up_bps: int = 0
+    max_connections: int = 0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DeviceProfile":
+        names = {f.name for f in fields(cls)}
+        unknown = set(data) - names
+        if unknown:
+            raise ValueError(f"unknown device settings: {', '.join(sorted(unknown))}")
+        profile = cls(**data)
+        if profile.codec not in CODECS:
+            raise ValueError(f"unsupported codec {profile.codec!r}, expected one of {CODECS}")
+        if profile.output_audio_format not in OUTPUT_FORMATS:
+            raise ValueError(f"unsupported output_audio_format {profile.output_audio_format!r}, "
+                             f"expected one of {OUTPUT_FORMATS}")
+        if profile.sample_rate not in SAMPLE_RATES:
+            raise ValueError(f"unsupported sample_rate {profile.sample_rate}, expected one of {SAMPLE_RATES}")
+        return profile
+
+    def session_profile(self) -> SessionProfile:
+        """对应的云端会话参数"""
+        profile = SessionProfile(input_mod="audio", recv_timeout=self.recv_timeout,
+                                 output_audio_format=self.output_audio_format)
+        profile = profile.override("tts.audio_config.sample_rate", self.sample_rate)
+        if self.speaker:
+            profile = profile.override("tts.speaker", self.speaker)
+        if self.system_role:
+            profile = profile.override("dialog.system_role", self.system_role)
+        return profile
+
+
+def device_identity(path: Optional[str], headers=None, remote_address=None) -> str:
+    """从握手路径、请求头或远端地址得到设备标识"""
+    if path:
+        parts = urlsplit(path)
+        segments = [s for s in parts.path.split("/") if s]
+        if len(segments) >= 2 and segments[-2] == "device":
+            return segments[-1]
+        device = parse_qs(parts.query).get("device")
+        if device and device[0]:
+            return device[0]
+    if headers is not None and headers.get("X-Device-Id"):
+        return headers.get("X-Device-Id")
+    return str(remote_address[0]) if remote_address else "unknown"
+
+
+class DeviceRegistry:
+    def __init__(self, path: str, check_interval: float = 2.0):
+        """
+        Args:
+            path: 注册表 JSON 文件，不存在时所有设备使用默认参数
+            check_interval: 检查文件是否修改的最小间隔 (秒)
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self.default = DeviceProfile()
+        self.devices: Dict[str, DeviceProfile] = {}
+        self.loaded_mtime = None
+        self.reloads = 0
+        self._checked = 0.0
+        self.reload()
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any]) -> "DeviceRegistry":
+        path = cfg.get("path", "devices.json")
+        if not os.path.isabs(path):
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+        return cls(path, cfg.get("check_interval", 2.0))
+
+    def _mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def reload(self) -> bool:
+        """读取注册表文件；文件有误时保留当前设置并返回 False"""
+        mtime = self._mtime()
+        if mtime is None:
+            self.default, self.devices, self.loaded_mtime = DeviceProfile(), {}, None
+            return True
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            base = data.get("default", {})
+            default = DeviceProfile.from_dict(base)
+            devices = {str(device_id): DeviceProfile.from_dict(dict(base, **entry))
+                       for device_id, entry in data.get("devices", {}).items()}
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            print(f"Device registry {self.path} not loaded: {e}")
+            self.loaded_mtime = mtime
+            return False
+        self.default, self.devices, self.loaded_mtime = default, devices, mtime
+        self.reloads += 1
+        # 预先生成各设备的 StartSession payload，连接时直接使用缓存
+        for profile in {default, *devices.values()}:
+            profile.session_profile().payload()
+        print(f"Device registry loaded: {len(devices)} devices from {self.path}")
+        return True
+
+    def check(self) -> None:
+        """距离上次检查超过 check_interval 且文件已修改时重新加载"""
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return
+        self._checked = now
+        if self._mtime() != self.loaded_mtime:
+            self.reload()
+
+    def lookup(self, device_id: str) -> DeviceProfile:
+        self.check()
+        return self.devices.get(device_id, self.default)
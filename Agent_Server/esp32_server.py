@@ -1,9 +1,35 @@
+import argparse
 import asyncio
 import json
 import time
 import websockets
 import config
+import device_protocol
+from admission import AdmissionController
+from audio_recorder import AudioRecorder, TrackFormat
 from bridge_session import BridgeDialogSession
+from device_metrics import DeviceMetrics
+from device_registry import DeviceRegistry, device_identity
+from event_loop import LoopLagSampler, add_loop_argument, install
+from glyph_pack import GlyphPacker
+from liveness import LinkMonitor, drop
+from write_batch import BatchWriter
+
+
+# 打断控制帧 (JSON 回退模式)：单字节二进制帧，ESP32 无需解析 JSON 即可识别 (16bit PCM 帧长度必为偶数)
+STOP_FRAME = b"\x01"
+# 触发打断的云端事件
+INTERRUPT_EVENTS = (150, 450, 3001)
+# 设备会话录音的音轨格式 (上行 16kHz / 下行 24kHz，16bit 单声道)
+RELAY_TRACKS = {
+    "up": TrackFormat(channels=1, sample_rate=16000, sample_width=2),
+    "down": TrackFormat(channels=1, sample_rate=24000, sample_width=2),
+}
+# 设备静音期间向云端补发的静音帧: 16kHz 16bit 20ms
+SILENCE_FRAME_MS = 20
+SILENCE_FRAME = bytes(16000 * 2 * SILENCE_FRAME_MS // 1000)
+# 事件循环调度延迟的日志间隔 (秒)
+LOOP_LAG_LOG_INTERVAL = 60
 
 
 def log(msg):
@@ -19,38 +45,213 @@ class ESP32WebSocketServer:
     def __init__(self, host="0.0.0.0", port=8765):
         self.host = host
         self.port = port
+        self.glyph_packer = GlyphPacker.from_config(config.glyph_pack_config)
+        self.registry = DeviceRegistry.from_config(config.device_registry_config)
+        self.admission = AdmissionController.from_config(config.admission_config)
+        self.loop_lag = LoopLagSampler()
+        # 设备标识 -> 指标 / 当前连接数
+        self.devices = {}
+        self.active = {}
+
+    def device_metrics(self):
+        """所有设备的服务器侧计数与最近一次遥测"""
+        return {device_id: metrics.snapshot() for device_id, metrics in self.devices.items()}
+
+    @staticmethod
+    def device_config_items():
+        """config.device_vad_config 与心跳超时转换为 TYPE_CONFIG 的 {key: int}"""
+        cfg = config.device_vad_config
+        heartbeat = config.heartbeat_config
+        return {
+            device_protocol.CFG_VAD_ENABLED: int(bool(cfg.get("enabled"))),
+            device_protocol.CFG_VAD_THRESHOLD: int(cfg.get("threshold", 400)),
+            device_protocol.CFG_VAD_ZCR_MAX: int(cfg.get("zcr_max", 0)),
+            device_protocol.CFG_VAD_HANGOVER: int(cfg.get("hangover_ms", 640)),
+            device_protocol.CFG_VAD_PREROLL: int(cfg.get("preroll_ms", 320)),
+            device_protocol.CFG_VAD_START: int(cfg.get("start_frames", 2)),
+            # 服务器不发送心跳时设备也不检测
+            device_protocol.CFG_LINK_TIMEOUT: int(heartbeat.get("device_timeout", 15.0) * 1000)
+            if heartbeat.get("device_interval") else 0,
+        }
+
+    @staticmethod
+    async def send_busy(websocket, binary, retry_after):
+        """通知设备服务器繁忙，retry_after 秒后再重连，然后关闭连接"""
+        retry_ms = int(retry_after * 1000)
+        try:
+            await websocket.send(device_protocol.encode_busy(retry_ms) if binary
+                                 else json.dumps({"type": "busy", "retry_after_ms": retry_ms}))
+            await websocket.close(1013, "busy")
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    def _device(self, device_id: str) -> DeviceMetrics:
+        metrics = self.devices.get(device_id)
+        if metrics is None:
+            metrics = self.devices[device_id] = DeviceMetrics(device_id)
+        return metrics
 
     async def handle_esp32_connection(self, websocket, path=None):
         """处理来自 ESP32 的连接"""
-        log(f"[Server] New connection: {websocket.remote_address}")
+        # 握手时协商了二进制协议则使用紧凑消息格式，否则回退到 原始 PCM + JSON
+        binary = websocket.subprotocol == device_protocol.SUBPROTOCOL
+        device_id = device_identity(path or getattr(websocket, "path", None),
+                                    getattr(websocket, "request_headers", None), websocket.remote_address)
+        profile = self.registry.lookup(device_id)
+        log(f"[Server] New connection: {websocket.remote_address}, device={device_id}, "
+            f"protocol={'binary' if binary else 'json'}")
+        if profile.max_connections and self.active.get(device_id, 0) >= profile.max_connections:
+            log(f"[Server] ESP32 {device_id} rejected: {profile.max_connections} connections already open")
+            await websocket.close(1013, "too many connections")
+            return
+        # 在排队等待准入之前占用连接数，排队中的连接同样计入 max_connections
+        self.active[device_id] = self.active.get(device_id, 0) + 1
+        try:
+            retry_after = await self.admission.acquire()
+            if retry_after is not None:
+                log(f"[Server] ESP32 {device_id} busy, retry after {retry_after:.1f}s: {self.admission.stats()}")
+                await self.send_busy(websocket, binary, retry_after)
+                return
+            if hasattr(websocket, 'open') and not websocket.open:
+                # 排队期间设备已断开
+                self.admission.release()
+                return
+            # 准入之后的任何异常 (包括建立录音、云端会话之前) 都要归还名额
+            try:
+                await self._run_session(websocket, binary, device_id, profile)
+            finally:
+                self._device(device_id).on_disconnect()
+                self.admission.release()
+        finally:
+            self._release_device(device_id)
+
+    def _release_device(self, device_id: str) -> None:
+        """归还设备的连接数，计数归零时删除，避免 active 随设备数增长"""
+        count = self.active.get(device_id, 0) - 1
+        if count > 0:
+            self.active[device_id] = count
+        else:
+            self.active.pop(device_id, None)
+
+    async def _run_session(self, websocket, binary, device_id, profile):
+        """已准入的设备连接: 建立云端会话并双向转发，直到任一端断开"""
         up_bytes = 0
         down_bytes = 0
         last_up_log = 0
         last_down_log = 0
-    
-        # 初始化云端会话，显式指定 PCM 格式以匹配 ESP32
+        metrics = self._device(device_id)
+        metrics.on_connect()
+        # 两条连接的心跳与往返时间
+        device_link = LinkMonitor.from_config("device", config.heartbeat_config)
+        cloud_link = LinkMonitor.from_config("cloud", config.heartbeat_config)
+        metrics.links = {"device": device_link, "cloud": cloud_link}
+        heartbeats = []
+        # 下行消息合并写出: 同一时刻到达的多帧音频、打断与字幕一次写入
+        device_out = BatchWriter.from_config(websocket, config.write_batch_config)
+
+        async def send_to_esp32(message, urgent=False):
+            if device_out:
+                await device_out.send(message, urgent)
+            else:
+                await websocket.send(message)
+        recorder = None
+        if config.recording_config.get("relay"):
+            int16 = profile.output_audio_format == "pcm_s16le"
+            tracks = dict(RELAY_TRACKS, down=TrackFormat(channels=1, sample_rate=profile.sample_rate,
+                                                         sample_width=2 if int16 else 4, is_float=not int16))
+            recorder = AudioRecorder.from_config(
+                config.recording_config,
+                f"{metrics.device_id.replace(':', '-')}_{time.strftime('%Y%m%d-%H%M%S')}", tracks)
+
+        # 上行限速: 每秒最多 max_up_bps 字节，超出的音频丢弃
+        up_window = [time.monotonic(), 0]
+        up_dropped = 0
+
+        def within_up_limit(n):
+            nonlocal up_dropped
+            if not profile.max_up_bps:
+                return True
+            now = time.monotonic()
+            if now - up_window[0] >= 1.0:
+                up_window[0], up_window[1] = now, 0
+            if up_window[1] + n > profile.max_up_bps:
+                if not up_dropped:
+                    log(f"[Server] ESP32 {device_id} exceeds {profile.max_up_bps} B/s, dropping audio")
+                up_dropped += n
+                return False
+            up_window[1] += n
+            return True
+
+        silence_task = None
+
+        async def fill_silence():
+            """设备进入静音后按实时节奏向云端发送静音，持续 silence_fill_ms"""
+            frames = config.device_vad_config.get("silence_fill_ms", 0) // SILENCE_FRAME_MS
+            start = time.monotonic()
+            for i in range(frames):
+                await bridge.send_audio(SILENCE_FRAME)
+                delay = start + (i + 1) * SILENCE_FRAME_MS / 1000 - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+        def on_vad(speech):
+            nonlocal silence_task
+            log(f"[Server] ESP32 {metrics.device_id} VAD: {'speech' if speech else 'silence'}")
+            if silence_task:
+                silence_task.cancel()
+                silence_task = None
+            if not speech:
+                silence_task = asyncio.create_task(fill_silence())
+
+        def ingest_stats(stats):
+            metrics.update_stats(stats)
+            log(f"[Server] ESP32 {metrics.device_id} stats: {metrics.summary()}")
+        # 初始化云端会话，会话参数 (音频格式、发音人等) 来自设备注册表
         bridge = BridgeDialogSession(
             ws_config=config.ws_connect_config,
-            output_audio_format="pcm_s16le"
+            output_audio_format=profile.output_audio_format,
+            profile=profile.session_profile(),
+            write_batch=config.write_batch_config,
+            reconnect=config.cloud_reconnect_config,
+            acquire_token=self.admission.acquire_token
         )
 
         async def forward_to_esp32(audio_data):
             """将云端音频全速下发给 ESP32 (依靠 WebSocket 背压)"""
             nonlocal down_bytes, last_down_log
+            cloud_link.seen()
             try:
                 if hasattr(websocket, 'open') and not websocket.open:
                     return
                 down_bytes += len(audio_data)
+                metrics.add_down(len(audio_data))
+                if recorder:
+                    recorder.write("down", audio_data)
                 if down_bytes - last_down_log >= 24000:
                     log(f"[Server] To ESP32 {down_bytes // 1024} KB")
                     last_down_log = down_bytes
-                await websocket.send(audio_data)
+                if binary:
+                    for frame in device_protocol.encode_audio(audio_data):
+                        await send_to_esp32(frame)
+                else:
+                    await send_to_esp32(audio_data)
             except websockets.exceptions.ConnectionClosed as e:
                 log(f"[Server] Audio forward closed: code={e.code}, reason={e.reason}, down={down_bytes // 1024} KB")
             except Exception as e:
                 log(f"[Server] Audio forward error: {e}, down={down_bytes // 1024} KB")
 
         async def forward_event_to_esp32(event_id, payload):
+            cloud_link.seen()
+            # 打断指令优先于字幕下发，让设备尽快静音
+            if event_id in INTERRUPT_EVENTS:
+                log(f"[Server] Interruption detected (Event {event_id}). Sending stop frame.")
+                try:
+                    if hasattr(websocket, 'open') and not websocket.open:
+                        return
+                    await send_to_esp32(device_protocol.encode_stop() if binary else STOP_FRAME, urgent=True)
+                except Exception as e:
+                    log(f"[Server] Stop command error: {e}")
+
             asr_text = None
             llm_text = None
             try:
@@ -88,14 +289,21 @@ class ESP32WebSocketServer:
                 log(f"[LLM] {llm_text}")
                 any_text = True
             try:
+                # 字形包先于字幕下发，设备绘制字幕时即可直接使用
+                if binary and self.glyph_packer and (asr_text or llm_text):
+                    glyphs = self.glyph_packer.pack((asr_text or "") + (llm_text or ""))
+                    if glyphs and not (hasattr(websocket, 'open') and not websocket.open):
+                        await send_to_esp32(glyphs)
                 if asr_text:
                     if hasattr(websocket, 'open') and not websocket.open:
                         return
-                    await websocket.send(json.dumps({"type": "asr", "text": asr_text}))
+                    await send_to_esp32(device_protocol.encode_text(device_protocol.TYPE_ASR, asr_text) if binary
+                                        else json.dumps({"type": "asr", "text": asr_text}))
                 if llm_text:
                     if hasattr(websocket, 'open') and not websocket.open:
                         return
-                    await websocket.send(json.dumps({"type": "llm", "text": llm_text}))
+                    await send_to_esp32(device_protocol.encode_text(device_protocol.TYPE_LLM, llm_text) if binary
+                                        else json.dumps({"type": "llm", "text": llm_text}))
             except Exception as e:
                 log(f"[Server] Text forward error: {e}")
             if not any_text:
@@ -104,28 +312,83 @@ class ESP32WebSocketServer:
                 except Exception:
                     log(f"[Server] Event {event_id} payload={payload}")
 
-            if event_id in [3001, 150]:
-                log(f"[Server] Interruption detected (Event {event_id}). Sending stop command.")
-                try:
-                    if hasattr(websocket, 'open') and not websocket.open:
-                        return
-                    await websocket.send(json.dumps({"command": "stop"}))
-                except Exception as e:
-                    log(f"[Server] Stop command error: {e}")
-
         bridge.on_audio_received = forward_to_esp32
         bridge.on_event_received = forward_event_to_esp32
 
+        async def on_device_stall():
+            log(f"[Server] ESP32 {device_id} link stalled, closing: {device_link.summary()}")
+            drop(websocket)
+
+        async def on_cloud_stall():
+            # 云端连接停滞: 断开云端，由 bridge 重连 (未启用重连时会话结束，见 on_cloud_closed)
+            log(f"[Server] Cloud link for {device_id} stalled, closing: {cloud_link.summary()}")
+            drop(bridge.client.ws)
+
+        async def watch_cloud():
+            # 每次重连成功后继续监测新的云端连接
+            while bridge.is_running:
+                await cloud_link.run(bridge.ping, on_cloud_stall)
+                await bridge.connected.wait()
+
+        def on_cloud_closed():
+            # 云端会话已结束且不再重连: 关闭设备连接，设备重连后建立新会话
+            log(f"[Server] Cloud session for {device_id} ended, closing device connection")
+            asyncio.ensure_future(websocket.close(1011, "cloud session ended"))
+
+        bridge.on_closed = on_cloud_closed
+
         try:
             # 1. 建立云端连接
             await bridge.start()
             log("[Server] Cloud bridge session started.")
+
+            # 下发设备端 VAD 配置
+            config_items = self.device_config_items()
+            await send_to_esp32(device_protocol.encode_kv(device_protocol.TYPE_CONFIG, config_items) if binary
+                                else json.dumps({"type": "config", "items": config_items}), urgent=True)
+            heartbeats = [asyncio.ensure_future(device_link.run(websocket.ping, on_device_stall))]
+            if cloud_link.interval:
+                heartbeats.append(asyncio.ensure_future(watch_cloud()))
             
             # 2. 接收来自 ESP32 的音频数据流
             async for message in websocket:
-                if isinstance(message, bytes):
+                device_link.seen()
+                if isinstance(message, bytes) and binary:
+                    try:
+                        msg_type, _, payload = device_protocol.decode(message)
+                    except ValueError as e:
+                        log(f"[Server] Bad frame from ESP32: {e}")
+                        continue
+                    if msg_type == device_protocol.TYPE_AUDIO:
+                        if not within_up_limit(len(payload)):
+                            continue
+                        up_bytes += len(payload)
+                        metrics.add_up(len(payload))
+                        if recorder:
+                            recorder.write("up", payload)
+                        if up_bytes - last_up_log >= 10240:
+                            log(f"[Server] From ESP32 {up_bytes // 1024} KB")
+                            last_up_log = up_bytes
+                        await bridge.send_audio(payload)
+                    elif msg_type == device_protocol.TYPE_STATS:
+                        ingest_stats(device_protocol.decode_stats(payload))
+                    elif msg_type == device_protocol.TYPE_QUERY:
+                        try:
+                            text = str(payload, "utf-8")
+                        except UnicodeDecodeError as e:
+                            log(f"[Server] Bad query from ESP32: {e}")
+                            continue
+                        await bridge.send_text(text)
+                    elif msg_type == device_protocol.TYPE_VAD:
+                        on_vad(payload[:1] == b"\x01")
+                elif isinstance(message, bytes):
                     # 收到 ESP32 的原始音频 (16k, 16bit, Mono)
+                    if not within_up_limit(len(message)):
+                        continue
                     up_bytes += len(message)
+                    metrics.add_up(len(message))
+                    if recorder:
+                        recorder.write("up", message)
                     if up_bytes - last_up_log >= 10240:
                         log(f"[Server] From ESP32 {up_bytes // 1024} KB")
                         last_up_log = up_bytes
@@ -136,6 +399,11 @@ class ESP32WebSocketServer:
                         data = json.loads(message)
                         if data.get("type") == "text":
                             await bridge.send_text(data.get("content"))
+                        elif data.get("type") == "vad":
+                            on_vad(bool(data.get("speech")))
+                        elif data.get("type") == "stats":
+                            ingest_stats({device_protocol.STAT_NAMES.get(int(k), f"stat_{k}"): v
+                                          for k, v in data.get("items", {}).items()})
                     except:
                         pass
 
@@ -144,16 +412,54 @@ class ESP32WebSocketServer:
         except Exception as e:
             log(f"[Server] Main loop error: {e}, up={up_bytes // 1024} KB, down={down_bytes // 1024} KB")
         finally:
+            for task in heartbeats:
+                task.cancel()
+            if silence_task:
+                silence_task.cancel()
+            if recorder:
+                # close 会等待写入线程写完队列 (最长 5 秒)，放到线程池中执行，不阻塞其他连接
+                await asyncio.get_running_loop().run_in_executor(None, recorder.close)
             await bridge.stop()
+            if device_out:
+                await device_out.close()
+                metrics.set_writes("device", device_out.stats())
+                log(f"[Server] ESP32 {device_id} writes: {device_out.stats()}")
+            if bridge.client.writer:
+                metrics.set_writes("cloud", bridge.client.writer.stats())
+                log(f"[Server] Cloud {device_id} writes: {bridge.client.writer.stats()}")
+            log(f"[Server] ESP32 {device_id} links: {device_link.summary()}; {cloud_link.summary()}")
+            if bridge.reconnects:
+                log(f"[Server] Cloud {device_id} reconnects={bridge.reconnects}, "
+                    f"replayed={bridge.replayed_bytes // 1024} KB, replay dropped={bridge.ring.dropped_bytes // 1024} KB")
+            if up_dropped:
+                log(f"[Server] ESP32 {device_id} rate limit dropped {up_dropped // 1024} KB")
             log(f"[Server] Session closed for {websocket.remote_address}")
 
+    async def log_loop_lag(self):
+        """定期输出调度延迟直方图摘要"""
+        while True:
+            await asyncio.sleep(LOOP_LAG_LOG_INTERVAL)
+            if self.loop_lag.samples:
+                log(f"[Server] {self.loop_lag.summary()}, sessions={self.admission.active}")
+                self.loop_lag.reset()
+
     async def start(self):
         log(f"[Server] Running on ws://{self.host}:{self.port}")
-        async with websockets.serve(self.handle_esp32_connection, self.host, self.port):
+        self.loop_lag.start()
+        asyncio.ensure_future(self.log_loop_lag())
+        # 心跳由 LinkMonitor 负责 (heartbeat_config)，关闭 websockets 自带的 ping
+        async with websockets.serve(self.handle_esp32_connection, self.host, self.port,
+                                    subprotocols=[device_protocol.SUBPROTOCOL], ping_interval=None):
             await asyncio.Future()
 
 if __name__ == "__main__":
-    server = ESP32WebSocketServer()
+    parser = argparse.ArgumentParser(description="ESP32 relay server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8765)
+    add_loop_argument(parser)
+    args = parser.parse_args()
+    log(f"[Server] Event loop: {install(args.loop)}")
+    server = ESP32WebSocketServer(args.host, args.port)
     try:
         asyncio.run(server.start())
     except KeyboardInterrupt:
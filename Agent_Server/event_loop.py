@@ -0,0 +1,111 @@
+"""
+事件循环选择与调度延迟采样
+
+    - install("uvloop") 在 asyncio.run 之前调用，使用 uvloop (pip install uvloop，不支持 Windows)；
+      未安装时回退到默认的 asyncio 事件循环
+    - LoopLagSampler 每隔 interval 秒请求一次唤醒，记录实际唤醒时间比预期晚了多少 (调度延迟) 的直方图，
+      某个回调或协程长时间占用事件循环时，所有连接的音频转发都会被推迟同样的时间
+"""
+import asyncio
+import bisect
+from typing import Dict, List, Optional, Sequence
+
+LOOP_MODES = ("asyncio", "uvloop", "auto")
+# 直方图桶上限 (ms)，最后一个桶收集更长的延迟
+LAG_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def add_loop_argument(parser) -> None:
+    parser.add_argument("--loop", choices=LOOP_MODES, default="asyncio",
+                        help="event loop: asyncio, uvloop, or auto (uvloop when installed)")
+
+
+def install(mode: str = "asyncio") -> str:
+    """设置事件循环策略，返回实际使用的事件循环名称"""
+    if mode == "asyncio":
+        return "asyncio"
+    try:
+        import uvloop
+    except ImportError:
+        if mode == "uvloop":
+            print("uvloop is not installed (pip install uvloop), using asyncio")
+        return "asyncio"
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return "uvloop"
+
+
+class LoopLagSampler:
+    def __init__(self, interval: float = 0.05, buckets_ms: Sequence[float] = LAG_BUCKETS_MS):
+        """
+        Args:
+            interval: 采样间隔 (秒)
+            buckets_ms: 直方图桶上限 (毫秒)，升序
+        """
+        self.interval = interval
+        self.buckets_ms = tuple(buckets_ms)
+        self.counts: List[int] = [0] * (len(self.buckets_ms) + 1)
+        self.samples = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, lag_ms: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets_ms, lag_ms)] += 1
+        self.samples += 1
+        self.total_ms += lag_ms
+        if lag_ms > self.max_ms:
+            self.max_ms = lag_ms
+
+    async def run(self) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            due = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(loop.time() - due, 0.0) * 1000)
+
+    def start(self) -> "asyncio.Task":
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+        return self._task
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def reset(self) -> None:
+        self.counts = [0] * len(self.counts)
+        self.samples = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def percentile(self, p: float) -> float:
+        """按直方图估算的分位数 (取所在桶的上限，最后一个桶取最大值)"""
+        if not self.samples:
+            return 0.0
+        target = p * self.samples
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                return self.buckets_ms[i] if i < len(self.buckets_ms) else self.max_ms
+        return self.max_ms
+
+    def histogram(self) -> Dict[str, int]:
+        labels = [f"<={b:g}ms" for b in self.buckets_ms] + [f">{self.buckets_ms[-1]:g}ms"]
+        return dict(zip(labels, self.counts))
+
+    def snapshot(self) -> Dict:
+        return {
+            "samples": self.samples,
+            "avg_ms": round(self.total_ms / self.samples, 3) if self.samples else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max_ms, 3),
+            "histogram": self.histogram(),
+        }
+
+    def summary(self) -> str:
+        """一行摘要，用于日志"""
+        s = self.snapshot()
+        return f"loop lag avg={s['avg_ms']}ms p50<={s['p50_ms']:g}ms p99<={s['p99_ms']:g}ms max={s['max_ms']}ms"
@@ -0,0 +1,298 @@
+"""
+本地模拟云端
+
+实现端到端实时语音对话接口的最小子集 (与 protocol.py / realtime_dialog_client.py 使用的二进制格式一致)，
+用于离线运行 batch_eval.py、中转服务器和基准测试，不需要 API 密钥:
+    - StartConnection / StartSession / FinishSession / FinishConnection
+    - 音频输入: 按音频时长 (而不是墙钟时间) 做能量 VAD，快于实时发送也能正确断句；
+      语音后停止发送超过 idle_ms 也视为一句话结束
+    - 文本输入 (ChatTextQuery) 与 SayHello
+    - 回复: ASR 事件 (450 / 451 / 459)、文本 (550 / 559)、TTS 音频 (350 / 352 / 351 / 359)
+
+    python fake_cloud.py [--port 8770] [--think-ms 300] [--tts-pace 0]
+
+    # 在 config.py 中把 base_url 指向 ws://127.0.0.1:8770 即可
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import math
+import struct
+import time
+
+import websockets
+
+import protocol
+
+# 客户端事件
+EVENT_START_CONNECTION = 1
+EVENT_FINISH_CONNECTION = 2
+EVENT_START_SESSION = 100
+EVENT_FINISH_SESSION = 102
+EVENT_TASK_REQUEST = 200
+EVENT_SAY_HELLO = 300
+EVENT_CHAT_TEXT_QUERY = 501
+
+# 服务端事件
+EVENT_CONNECTION_STARTED = 50
+EVENT_CONNECTION_FINISHED = 52
+EVENT_SESSION_STARTED = 150
+EVENT_SESSION_FINISHED = 152
+EVENT_TTS_SENTENCE_START = 350
+EVENT_TTS_SENTENCE_END = 351
+EVENT_TTS_RESPONSE = 352
+EVENT_TTS_ENDED = 359
+EVENT_ASR_INFO = 450
+EVENT_ASR_RESPONSE = 451
+EVENT_ASR_ENDED = 459
+EVENT_CHAT_RESPONSE = 550
+EVENT_CHAT_ENDED = 559
+
+INPUT_RATE = 16000
+OUTPUT_RATE = 24000
+
+
+def log(msg):
+    ts = time.strftime("%H:%M:%S")
+    print(f"[{ts}] [FakeCloud] {msg}")
+
+
+def parse_request(data: bytes):
+    """解析客户端消息，返回 (event, session_id, payload)"""
+    header_size = data[0] & 0x0F
+    message_type = data[1] >> 4
+    flags = data[1] & 0x0F
+    serialization = data[2] >> 4
+    compression = data[2] & 0x0F
+    pos = header_size * 4
+    event = None
+    if flags & protocol.MSG_WITH_EVENT:
+        event = int.from_bytes(data[pos:pos + 4], "big")
+        pos += 4
+    session_id = ""
+    if event not in (EVENT_START_CONNECTION, EVENT_FINISH_CONNECTION):
+        size = int.from_bytes(data[pos:pos + 4], "big")
+        session_id = data[pos + 4:pos + 4 + size].decode()
+        pos += 4 + size
+    size = int.from_bytes(data[pos:pos + 4], "big")
+    payload = data[pos + 4:pos + 4 + size]
+    if compression == protocol.GZIP:
+        payload = gzip.decompress(payload)
+    if message_type != protocol.CLIENT_AUDIO_ONLY_REQUEST and serialization == protocol.JSON:
+        payload = json.loads(payload or b"{}")
+    return event, session_id, payload
+
+
+def build_response(event: int, session_id: str, payload, audio: bool = False) -> bytes:
+    """生成 protocol.parse_response 可解析的服务端消息"""
+    if audio:
+        header = protocol.generate_header(message_type=protocol.SERVER_ACK, serial_method=protocol.NO_SERIALIZATION,
+                                          compression_type=protocol.NO_COMPRESSION)
+        body = payload
+    else:
+        header = protocol.generate_header(message_type=protocol.SERVER_FULL_RESPONSE)
+        body = gzip.compress(json.dumps(payload, ensure_ascii=False).encode())
+    sid = session_id.encode()
+    return (bytes(header) + struct.pack(">II", event, len(sid)) + sid +
+            struct.pack(">I", len(body)) + body)
+
+
+class FakeSession:
+    """一个对话会话的状态"""
+
+    def __init__(self, server: "FakeCloud", ws, session_id: str, request: dict):
+        self.server = server
+        self.ws = ws
+        self.session_id = session_id
+        tts_format = request.get("tts", {}).get("audio_config", {}).get("format", "pcm")
+        self.int16 = tts_format == "pcm_s16le"
+        self.in_speech = False
+        self.speech_ms = 0.0
+        self.silence_ms = 0.0
+        self.turns = 0
+        self.last_audio = 0.0
+        self.reply_task = None
+        self.idle_task = None
+
+    async def send(self, event, payload, audio=False):
+        await self.ws.send(build_response(event, self.session_id, payload, audio))
+
+    async def on_audio(self, pcm: bytes):
+        n = len(pcm) // 2
+        if not n:
+            return
+        samples = struct.unpack(f"<{n}h", pcm[:n * 2])
+        energy = sum(abs(s) for s in samples) / n
+        ms = n * 1000 / INPUT_RATE
+        self.last_audio = time.monotonic()
+        if energy >= self.server.threshold:
+            self.silence_ms = 0.0
+            if not self.in_speech:
+                self.in_speech = True
+                self.speech_ms = 0.0
+                # 新的一句话打断正在进行的回复
+                if self.reply_task and not self.reply_task.done():
+                    self.reply_task.cancel()
+                await self.send(EVENT_ASR_INFO, {"question_id": f"q{self.turns + 1}"})
+            self.speech_ms += ms
+        elif self.in_speech:
+            self.silence_ms += ms
+            self.speech_ms += ms
+            if self.silence_ms >= self.server.end_ms:
+                await self.end_turn()
+        if self.in_speech and (self.idle_task is None or self.idle_task.done()):
+            self.idle_task = asyncio.ensure_future(self.watch_idle())
+
+    async def watch_idle(self):
+        """语音过程中停止发送音频 (文件结束) 也结束这句话"""
+        while self.in_speech:
+            wait = self.last_audio + self.server.idle_ms / 1000 - time.monotonic()
+            if wait <= 0:
+                await self.end_turn()
+                return
+            await asyncio.sleep(wait)
+
+    async def end_turn(self):
+        if not self.in_speech:
+            return
+        self.in_speech = False
+        self.turns += 1
+        duration = (self.speech_ms - self.silence_ms) / 1000
+        text = f"第{self.turns}句话，时长{duration:.2f}秒"
+        await self.send(EVENT_ASR_RESPONSE, {"results": [{"text": text, "is_interim": False}]})
+        await self.send(EVENT_ASR_ENDED, {})
+        self.start_reply(f"收到：{text}")
+
+    def start_reply(self, text):
+        if self.reply_task and not self.reply_task.done():
+            self.reply_task.cancel()
+        self.reply_task = asyncio.ensure_future(self.reply(text))
+
+    async def reply(self, text, chat=True):
+        try:
+            await asyncio.sleep(self.server.think_ms / 1000)
+            if chat:
+                for i in range(0, len(text), 4):
+                    await self.send(EVENT_CHAT_RESPONSE, {"content": text[i:i + 4]})
+                await self.send(EVENT_CHAT_ENDED, {})
+            await self.send(EVENT_TTS_SENTENCE_START, {"tts_type": "default", "text": text})
+            await self.stream_tts(len(text) * self.server.ms_per_char)
+            await self.send(EVENT_TTS_SENTENCE_END, {})
+            await self.send(EVENT_TTS_ENDED, {})
+        except asyncio.CancelledError:
+            pass
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    async def stream_tts(self, duration_ms):
+        """发送正弦波 TTS 音频，每块 40ms，tts_pace > 0 时按实时倍速发送"""
+        chunk = OUTPUT_RATE * 40 // 1000
+        total = OUTPUT_RATE * duration_ms // 1000
+        start = time.monotonic()
+        for offset in range(0, total, chunk):
+            n = min(chunk, total - offset)
+            wave = [0.3 * math.sin(2 * math.pi * 440 * (offset + i) / OUTPUT_RATE) for i in range(n)]
+            if self.int16:
+                data = struct.pack(f"<{n}h", *(int(v * 32767) for v in wave))
+            else:
+                data = struct.pack(f"<{n}f", *wave)
+            await self.send(EVENT_TTS_RESPONSE, data, audio=True)
+            if self.server.tts_pace > 0:
+                due = start + (offset + n) / OUTPUT_RATE / self.server.tts_pace
+                delay = due - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                await asyncio.sleep(0)
+
+    def close(self):
+        for task in (self.reply_task, self.idle_task):
+            if task and not task.done():
+                task.cancel()
+
+
+class FakeCloud:
+    def __init__(self, host="127.0.0.1", port=8770, think_ms=300, tts_pace=0.0, ms_per_char=120,
+                 threshold=500, end_ms=800, idle_ms=500):
+        """
+        Args:
+            think_ms: ASR 结束到开始回复的模拟处理时间
+            tts_pace: TTS 音频发送速度 (实时倍数)，0 表示不限速
+            ms_per_char: 回复每个字对应的 TTS 时长
+            threshold: 语音帧的最小平均幅度
+            end_ms: 语音后持续多长的静音 (音频时长) 结束一句话
+            idle_ms: 语音后多长时间没有收到音频 (墙钟时间) 结束一句话
+        """
+        self.host = host
+        self.port = port
+        self.think_ms = think_ms
+        self.tts_pace = tts_pace
+        self.ms_per_char = ms_per_char
+        self.threshold = threshold
+        self.end_ms = end_ms
+        self.idle_ms = idle_ms
+        self.connections = 0
+        # 每收到一块上行音频时调用 audio_hook(session_id, pcm)，用于基准测试
+        self.audio_hook = None
+
+    async def handle(self, ws, path=None):
+        self.connections += 1
+        sessions = {}
+        try:
+            async for message in ws:
+                if isinstance(message, str):
+                    continue
+                event, session_id, payload = parse_request(message)
+                if event == EVENT_START_CONNECTION:
+                    await ws.send(build_response(EVENT_CONNECTION_STARTED, "", {}))
+                elif event == EVENT_START_SESSION:
+                    sessions[session_id] = FakeSession(self, ws, session_id, payload)
+                    await ws.send(build_response(EVENT_SESSION_STARTED, session_id, {"dialog_id": session_id}))
+                elif event == EVENT_TASK_REQUEST and session_id in sessions:
+                    if self.audio_hook:
+                        self.audio_hook(session_id, payload)
+                    await sessions[session_id].on_audio(payload)
+                elif event == EVENT_CHAT_TEXT_QUERY and session_id in sessions:
+                    sessions[session_id].start_reply(f"收到：{payload.get('content', '')}")
+                elif event == EVENT_SAY_HELLO and session_id in sessions:
+                    session = sessions[session_id]
+                    session.reply_task = asyncio.ensure_future(session.reply(payload.get("content", ""), chat=False))
+                elif event == EVENT_FINISH_SESSION:
+                    session = sessions.pop(session_id, None)
+                    if session:
+                        await session.end_turn()
+                        if session.reply_task:
+                            await asyncio.gather(session.reply_task, return_exceptions=True)
+                        session.close()
+                    await ws.send(build_response(EVENT_SESSION_FINISHED, session_id, {}))
+                elif event == EVENT_FINISH_CONNECTION:
+                    await ws.send(build_response(EVENT_CONNECTION_FINISHED, "", {}))
+                    break
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            for session in sessions.values():
+                session.close()
+
+    async def serve(self):
+        log(f"Running on ws://{self.host}:{self.port}")
+        async with websockets.serve(self.handle, self.host, self.port, max_size=None):
+            await asyncio.Future()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="local fake realtime dialog cloud")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8770)
+    parser.add_argument("--think-ms", type=int, default=300)
+    parser.add_argument("--tts-pace", type=float, default=0.0, help="TTS send speed relative to real time, 0 = unlimited")
+    args = parser.parse_args()
+    try:
+        asyncio.run(FakeCloud(args.host, args.port, args.think_ms, args.tts_pace).serve())
+    except KeyboardInterrupt:
+        log("Stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+字幕字形包
+
+中转服务器在下发字幕前，先把字幕用到的字形点阵 (MONO_HLSB) 打包发给设备，
+设备将其作为第一级字形来源，渲染时无需在 flash 字库中查找，也能显示字库以外的字符。
+
+字形来源按顺序查找:
+    1. BMF 字库 (与设备端同格式，可以使用比设备端更完整的字库)
+    2. TTF/OTF 字体 (可选，需要安装 Pillow)
+"""
+import struct
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import device_protocol
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:  # Pillow 为可选依赖
+    Image = ImageDraw = ImageFont = None
+
+
+class BMFGlyphSource:
+    """从 .bmf 字库读取点阵"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[0:2] != b"BM" or data[2] != 3:
+            raise TypeError(f"Incorrect font file: {path}")
+        start_bitmap = struct.unpack(">I", b"\x00" + data[4:7])[0]
+        self.font_size = data[7]
+        self.bitmap_size = data[8]
+        codes = struct.unpack(f">{(start_bitmap - 16) // 2}H", data[16:start_bitmap])
+        self._offsets = {code: start_bitmap + i * self.bitmap_size for i, code in enumerate(codes)}
+        self._data = data
+
+    def get(self, code: int) -> Optional[bytes]:
+        offset = self._offsets.get(code)
+        if offset is None:
+            return None
+        return self._data[offset:offset + self.bitmap_size]
+
+
+class TTFGlyphSource:
+    """使用 Pillow 将 TTF/OTF 字体渲染为 MONO_HLSB 点阵"""
+
+    def __init__(self, path: str, font_size: int = 16):
+        if ImageFont is None:
+            raise ImportError("TTF glyph source requires Pillow: pip install pillow")
+        self.font_size = font_size
+        self.bitmap_size = ((font_size + 7) // 8) * font_size
+        self._font = ImageFont.truetype(path, font_size)
+
+    def get(self, code: int) -> Optional[bytes]:
+        char = chr(code)
+        if self._font.getmask(char).getbbox() is None and not char.isspace():
+            return None
+        image = Image.new("1", (self.font_size, self.font_size), 0)
+        ImageDraw.Draw(image).text((0, 0), char, font=self._font, fill=1)
+        # Pillow 的 "1" 模式按行打包、高位在前，与 MONO_HLSB 一致
+        return image.tobytes()
+
+
+class GlyphPacker:
+    """根据字幕文本生成 TYPE_GLYPHS 消息"""
+
+    def __init__(self, sources: List, font_size: int = 16):
+        self.font_size = font_size
+        self.bitmap_size = ((font_size + 7) // 8) * font_size
+        self.sources = [s for s in sources if s.font_size == font_size and s.bitmap_size == self.bitmap_size]
+        self.max_glyphs = (device_protocol.MAX_PAYLOAD - 1) // (self.bitmap_size + 2)
+        self.glyph = lru_cache(maxsize=8192)(self._glyph)
+
+    @classmethod
+    def from_config(cls, cfg: Dict) -> Optional["GlyphPacker"]:
+        """根据 config.glyph_pack_config 创建，未启用或没有可用字体时返回 None"""
+        if not cfg.get("enabled"):
+            return None
+        font_size = cfg.get("font_size", 16)
+        sources = []
+        if cfg.get("bmf_font"):
+            sources.append(BMFGlyphSource(cfg["bmf_font"]))
+        if cfg.get("ttf_font"):
+            sources.append(TTFGlyphSource(cfg["ttf_font"], font_size))
+        return cls(sources, font_size) if sources else None
+
+    def _glyph(self, code: int) -> Optional[bytes]:
+        for source in self.sources:
+            bitmap = source.get(code)
+            if bitmap is not None:
+                return bitmap
+        return None
+
+    def pack(self, text: str) -> Optional[bytes]:
+        """返回包含 text 中所有可显示字符点阵的消息，没有可用字形时返回 None"""
+        payload = bytearray([self.bitmap_size])
+        count = 0
+        for code in sorted({ord(c) for c in text if 16 <= ord(c) <= 0xFFFF}):
+            bitmap = self.glyph(code)
+            if bitmap is None:
+                continue
+            payload += struct.pack(">H", code)
+            payload += bitmap
+            count += 1
+            if count >= self.max_glyphs:
+                break
+        if not count:
+            return None
+        return device_protocol.encode(device_protocol.TYPE_GLYPHS, bytes(payload))
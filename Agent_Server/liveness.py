@@ -0,0 +1,116 @@
+"""
+链路心跳与停滞检测
+
+中转服务器对设备与云端两条连接分别定时发送 WebSocket ping:
+    - 记录 ping 到 pong 的往返时间 (RTT)，保留最近 window 个样本用于分位数
+    - timeout 秒内既没有收到 pong，也没有收到任何其他数据，视为链路停滞，调用 on_stall 主动断开，
+      不必等到下一次发送失败才发现
+设备端的 WebSocket 在接收循环中回应 ping，RTT 同时反映了设备接收循环的响应速度；
+中转服务器通过 TYPE_CONFIG (CFG_LINK_TIMEOUT) 告知设备心跳超时，设备在该时间内收不到任何数据时自行重连。
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from stats import percentile
+
+
+def drop(ws) -> None:
+    """不等待关闭握手，立即断开停滞的连接 (接收方随即得到 ConnectionClosed)"""
+    transport = getattr(ws, "transport", None)
+    if transport is not None:
+        transport.abort()
+
+
+class LinkMonitor:
+    def __init__(self, name: str, interval: float = 5.0, timeout: float = 15.0, window: int = 64):
+        """
+        Args:
+            name: 链路名称，用于日志 ("device" / "cloud")
+            interval: 心跳间隔 (秒)，0 表示不发送心跳
+            timeout: 停滞判定时间 (秒)
+            window: 用于分位数的 RTT 样本数
+        """
+        self.name = name
+        self.interval = interval
+        self.timeout = timeout
+        self.rtts: Deque[float] = deque(maxlen=window)
+        self.last_rtt: Optional[float] = None
+        self.last_seen = time.monotonic()
+        self.pings = 0
+        self.late = 0
+        self.stalls = 0
+        self.stalled = False
+
+    @classmethod
+    def from_config(cls, name: str, cfg: Dict[str, Any]) -> "LinkMonitor":
+        return cls(name, cfg.get(f"{name}_interval", 5.0), cfg.get(f"{name}_timeout", 15.0))
+
+    def seen(self) -> None:
+        """收到对端的任意数据"""
+        self.last_seen = time.monotonic()
+
+    async def run(self, ping: Callable[[], Awaitable[Awaitable]],
+                  on_stall: Callable[[], Awaitable[None]]) -> None:
+        """
+        定时发送心跳，直到连接关闭或判定停滞
+
+        Args:
+            ping: 发送一次 ping，返回在收到 pong 时完成的 awaitable (websockets 的 ws.ping)
+            on_stall: 判定停滞时调用一次
+        """
+        if not self.interval:
+            return
+        # 重连后重新开始监测
+        self.stalled = False
+        self.seen()
+        while True:
+            await asyncio.sleep(self.interval)
+            start = time.monotonic()
+            try:
+                waiter = await ping()
+            except Exception:
+                # 连接已关闭，由连接处理流程负责清理
+                return
+            self.pings += 1
+            # 发出 ping 之后，停滞判定以 timeout 为上限
+            deadline = max(self.last_seen, start) + self.timeout
+            try:
+                await asyncio.wait_for(waiter, max(deadline - time.monotonic(), 0.001))
+            except asyncio.TimeoutError:
+                self.late += 1
+                if time.monotonic() - self.last_seen >= self.timeout:
+                    self.stalled = True
+                    self.stalls += 1
+                    await on_stall()
+                    return
+                # 期间仍有数据到达 (例如下行音频很多，pong 排在后面)，继续观察
+                continue
+            except Exception:
+                return
+            self.last_rtt = (time.monotonic() - start) * 1000
+            self.rtts.append(self.last_rtt)
+            self.seen()
+
+    def snapshot(self) -> Dict[str, Any]:
+        rtts = list(self.rtts)
+        return {
+            "rtt_ms": round(self.last_rtt, 1) if self.last_rtt is not None else None,
+            "rtt_p50_ms": round(percentile(rtts, 0.5), 1) if rtts else None,
+            "rtt_p99_ms": round(percentile(rtts, 0.99), 1) if rtts else None,
+            "pings": self.pings,
+            "late": self.late,
+            "stalled": self.stalled,
+            "stalls": self.stalls,
+            "idle_s": round(time.monotonic() - self.last_seen, 1),
+        }
+
+    def summary(self) -> str:
+        """一行摘要，用于日志"""
+        s = self.snapshot()
+
+        def ms(value):
+            return "-" if value is None else f"{value}ms"
+        return (f"{self.name} rtt={ms(s['rtt_ms'])} p50={ms(s['rtt_p50_ms'])} p99={ms(s['rtt_p99_ms'])} "
+                f"pings={s['pings']} late={s['late']} stalls={s['stalls']}{' STALLED' if s['stalled'] else ''}")
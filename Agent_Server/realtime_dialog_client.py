@@ -1,31 +1,44 @@
         # StartConnection request
 import gzip
 import json
-from typing import Dict, Any
+import uuid
+from typing import Dict, Any, Optional
 
 import websockets
 
-import config
 import protocol
+from session_profile import SessionProfile
+from write_batch import BatchWriter
 
 
 class RealtimeDialogClient:
     def __init__(self, config: Dict[str, Any], session_id: str, output_audio_format: str = "pcm",
-                 mod: str = "audio", recv_timeout: int = 10) -> None:
+                 mod: str = "audio", recv_timeout: int = 10, profile: Optional[SessionProfile] = None,
+                 write_batch: Optional[Dict[str, Any]] = None) -> None:
         self.config = config
         self.logid = ""
         self.session_id = session_id
         self.output_audio_format = output_audio_format
         self.mod = mod
         self.recv_timeout = recv_timeout
+        # StartSession 参数，未指定时由 mod / recv_timeout / output_audio_format 生成
+        self.profile = profile or SessionProfile(input_mod=mod, recv_timeout=recv_timeout,
+                                                 output_audio_format=output_audio_format)
+        # 每个连接使用独立的 Connect-Id，便于在云端日志中区分并发会话
+        self.connect_id = str(uuid.uuid4())
+        # 会话建立后的请求是否合并写出 (见 write_batch.py)
+        self.write_batch = write_batch or {}
+        self.writer: Optional[BatchWriter] = None
         self.ws = None
 
     async def connect(self) -> None:
         """建立WebSocket连接"""
-        print(f"url: {self.config['base_url']}, headers: {self.config['headers']}")
+        headers = dict(self.config['headers'])
+        headers["X-Api-Connect-Id"] = self.connect_id
+        print(f"url: {self.config['base_url']}, headers: {headers}")
         self.ws = await websockets.connect(
             self.config['base_url'],
-            extra_headers=self.config['headers'],
+            extra_headers=headers,
             ping_interval=None
         )
         self.logid = self.ws.response_headers.get("X-Tt-Logid")
@@ -42,16 +55,8 @@ class RealtimeDialogClient:
         response = await self.ws.recv()
         print(f"StartConnection response: {protocol.parse_response(response)}")
 
-        # 扩大这个参数，可以在一段时间内保持静默，主要用于text模式，参数范围[10,120]
-        config.start_session_req["dialog"]["extra"]["recv_timeout"] = self.recv_timeout
-        # 这个参数，在text或者audio_file模式，可以在一段时间内保持静默
-        config.start_session_req["dialog"]["extra"]["input_mod"] = self.mod
-        # StartSession request
-        if self.output_audio_format == "pcm_s16le":
-            config.start_session_req["tts"]["audio_config"]["format"] = "pcm_s16le"
-        request_params = config.start_session_req
-        payload_bytes = str.encode(json.dumps(request_params))
-        payload_bytes = gzip.compress(payload_bytes)
+        # StartSession request，payload 按 profile 缓存
+        payload_bytes = self.profile.payload()
         start_session_request = bytearray(protocol.generate_header())
         start_session_request.extend(int(100).to_bytes(4, 'big'))
         start_session_request.extend((len(self.session_id)).to_bytes(4, 'big'))
@@ -61,6 +66,14 @@ class RealtimeDialogClient:
         await self.ws.send(start_session_request)
         response = await self.ws.recv()
         print(f"StartSession response: {protocol.parse_response(response)}")
+        self.writer = BatchWriter.from_config(self.ws, self.write_batch)
+
+    async def send(self, request: bytes, urgent: bool = True) -> None:
+        """发送请求；启用合并写出时，上一次写入尚未 drain 完的音频请求 (urgent=False) 排队合并写出"""
+        if self.writer:
+            await self.writer.send(request, urgent)
+        else:
+            await self.ws.send(request)
 
     async def say_hello(self) -> None:
         """发送Hello消息"""
@@ -75,7 +88,7 @@ class RealtimeDialogClient:
         hello_request.extend(str.encode(self.session_id))
         hello_request.extend((len(payload_bytes)).to_bytes(4, 'big'))
         hello_request.extend(payload_bytes)
-        await self.ws.send(hello_request)
+        await self.send(hello_request)
 
     async def chat_text_query(self, content: str) -> None:
         """发送Chat Text Query消息"""
@@ -90,7 +103,7 @@ class RealtimeDialogClient:
         chat_text_query_request.extend(str.encode(self.session_id))
         chat_text_query_request.extend((len(payload_bytes)).to_bytes(4, 'big'))
         chat_text_query_request.extend(payload_bytes)
-        await self.ws.send(chat_text_query_request)
+        await self.send(chat_text_query_request)
 
     async def chat_tts_text(self, is_user_querying: bool, start: bool, end: bool, content: str) -> None:
         if is_user_querying:
@@ -111,7 +124,7 @@ class RealtimeDialogClient:
         chat_tts_text_request.extend(str.encode(self.session_id))
         chat_tts_text_request.extend((len(payload_bytes)).to_bytes(4, 'big'))
         chat_tts_text_request.extend(payload_bytes)
-        await self.ws.send(chat_tts_text_request)
+        await self.send(chat_tts_text_request)
 
     async def chat_rag_text(self, is_user_querying: bool, external_rag: str) -> None:
         if is_user_querying:
@@ -130,7 +143,7 @@ class RealtimeDialogClient:
         chat_rag_text_request.extend(str.encode(self.session_id))
         chat_rag_text_request.extend((len(payload_bytes)).to_bytes(4, 'big'))
         chat_rag_text_request.extend(payload_bytes)
-        await self.ws.send(chat_rag_text_request)
+        await self.send(chat_rag_text_request)
 
     async def task_request(self, audio: bytes) -> None:
         task_request = bytearray(
@@ -142,7 +155,11 @@ class RealtimeDialogClient:
         payload_bytes = gzip.compress(audio)
         task_request.extend((len(payload_bytes)).to_bytes(4, 'big'))  # payload size(4 bytes)
         task_request.extend(payload_bytes)
-        await self.ws.send(task_request)
+        await self.send(task_request, urgent=False)
+
+    async def ping(self):
+        """发送 WebSocket ping，返回收到 pong 时完成的 awaitable"""
+        return await self.ws.ping()
 
     async def receive_server_response(self) -> Dict[str, Any]:
         try:
@@ -161,7 +178,7 @@ class RealtimeDialogClient:
         finish_session_request.extend(str.encode(self.session_id))
         finish_session_request.extend((len(payload_bytes)).to_bytes(4, 'big'))
         finish_session_request.extend(payload_bytes)
-        await self.ws.send(finish_session_request)
+        await self.send(finish_session_request)
 
     async def finish_connection(self):
         finish_connection_request = bytearray(protocol.generate_header())
@@ -171,7 +188,7 @@ class RealtimeDialogClient:
         finish_connection_request.extend((len(payload_bytes)).to_bytes(4, 'big'))
         finish_connection_request.extend(payload_bytes)
         try:
-            await self.ws.send(finish_connection_request)
+            await self.send(finish_connection_request)
         except Exception as e:
             print(f"FinishConnection send error: {e}")
 
@@ -179,4 +196,6 @@ class RealtimeDialogClient:
         """关闭WebSocket连接"""
         if self.ws:
             print(f"Closing WebSocket connection...")
+            if self.writer:
+                await self.writer.close()
             await self.ws.close()
@@ -0,0 +1,73 @@
+"""
+会话参数
+
+StartSession 请求参数 = 不可变的基础配置 (导入时 config.start_session_req 的快照) + 本会话的覆盖项。
+SessionProfile 不可变且可哈希，相同参数的会话共用同一份序列化并 gzip 压缩后的 payload，
+并发会话之间不再修改共享的 config.start_session_req，也不会重复 json.dumps / gzip。
+
+    profile = SessionProfile(input_mod="audio_file", output_audio_format="pcm_s16le")
+    profile = profile.override("asr.extra.end_smooth_window_ms", 800)
+    payload = profile.payload()
+"""
+import copy
+import gzip
+import json
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+
+import config
+
+# 基础配置快照 (JSON 文本，不可变)
+BASE_REQUEST = json.dumps(config.start_session_req)
+
+
+@dataclass(frozen=True)
+class SessionProfile:
+    """一类会话的 StartSession 参数"""
+    input_mod: str = "audio"
+    recv_timeout: int = 10
+    output_audio_format: str = "pcm"
+    # ((路径, JSON 文本), ...)，路径以 "." 分隔，如 "tts.speaker"
+    overrides: Tuple[Tuple[str, str], ...] = ()
+    base: str = BASE_REQUEST
+
+    def override(self, path: str, value: Any) -> "SessionProfile":
+        """返回增加一项覆盖后的新 profile，同一路径后设置的值生效"""
+        items = tuple(item for item in self.overrides if item[0] != path)
+        return replace(self, overrides=items + ((path, json.dumps(value, sort_keys=True)),))
+
+    def request(self) -> Dict[str, Any]:
+        """StartSession 请求参数 (新的 dict，可以随意修改)"""
+        return copy.deepcopy(_request(self))
+
+    def payload(self) -> bytes:
+        """序列化并 gzip 压缩后的 StartSession payload，相同 profile 只计算一次"""
+        return _payload(self)
+
+
+def _set_path(request: Dict[str, Any], path: str, value: Any) -> None:
+    keys = path.split(".")
+    node = request
+    for key in keys[:-1]:
+        node = node.setdefault(key, {})
+    node[keys[-1]] = value
+
+
+@lru_cache(maxsize=64)
+def _request(profile: SessionProfile) -> Dict[str, Any]:
+    request = json.loads(profile.base)
+    # 扩大这个参数，可以在一段时间内保持静默，主要用于text模式，参数范围[10,120]
+    _set_path(request, "dialog.extra.recv_timeout", profile.recv_timeout)
+    # 这个参数，在text或者audio_file模式，可以在一段时间内保持静默
+    _set_path(request, "dialog.extra.input_mod", profile.input_mod)
+    if profile.output_audio_format == "pcm_s16le":
+        _set_path(request, "tts.audio_config.format", "pcm_s16le")
+    for path, value in profile.overrides:
+        _set_path(request, path, json.loads(value))
+    return request
+
+
+@lru_cache(maxsize=64)
+def _payload(profile: SessionProfile) -> bytes:
+    return gzip.compress(json.dumps(_request(profile)).encode())
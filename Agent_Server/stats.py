@@ -0,0 +1,31 @@
+"""
+统计与基准的公共函数
+
+liveness (服务器运行时) 与 batch_eval / bench_loop (离线工具) 共用，不依赖其他模块。
+"""
+import argparse
+from typing import List, Optional
+
+
+def parse_pace(value: str) -> float:
+    """返回发送速度 (实时倍数)，0 表示不限速"""
+    if value == "realtime":
+        return 1.0
+    if value == "max":
+        return 0.0
+    if value.endswith("x"):
+        value = value[:-1]
+    try:
+        speed = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected realtime, max or Nx, got {value!r}")
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive")
+    return speed
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)]
@@ -0,0 +1,125 @@
+"""
+WebSocket 合并写出
+
+消息不额外等待: 连接上没有未完成的 drain 时立即写出；drain 期间 (对端或网络暂时跟不上) 到达的消息
+(设备上行的多帧音频、同一事件的打断 + 字形包 + 字幕) 先排队，drain 完成后合并为一次 transport.write:
+    - 链路空闲时与逐条发送相同，不增加延迟
+    - 链路拥塞时多条消息只产生一次系统调用与一次 drain
+    - urgent 消息 (打断、会话控制) 连同之前排队的消息立即写出，顺序不变
+    - 排队达到 max_bytes 时立即写出并等待 drain，保留原有的背压
+每条消息仍是一个独立的 WebSocket 帧，对端无需任何修改。帧由 websockets 自身的 Frame 序列化
+(websockets >= 10)，更早的版本逐条调用 send。
+"""
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    from websockets.frames import Frame, Opcode
+except ImportError:  # websockets < 10
+    Frame = Opcode = None
+
+
+class BatchWriter:
+    def __init__(self, ws, max_bytes: int = 32768):
+        """
+        Args:
+            ws: websockets 连接 (服务端或客户端)
+            max_bytes: 排队达到该字节数时立即写出并等待 drain
+        """
+        self.ws = ws
+        self.max_bytes = max_bytes
+        self._pending: List[Union[bytes, str]] = []
+        self._pending_bytes = 0
+        self._drain_task: Optional[asyncio.Future] = None
+        self._error: Optional[BaseException] = None
+        # 能否把多帧合并为一次 transport.write
+        self.batched = Frame is not None and hasattr(ws, "transport") and hasattr(ws, "drain")
+        self.started = time.monotonic()
+        self.messages = 0
+        self.writes = 0
+        self.bytes = 0
+        self.max_batch = 0
+        self.flushes = {"direct": 0, "drained": 0, "urgent": 0, "full": 0}
+
+    @classmethod
+    def from_config(cls, ws, cfg: Dict[str, Any]) -> Optional["BatchWriter"]:
+        """根据 config.write_batch_config 创建，未启用时返回 None"""
+        if not cfg.get("enabled"):
+            return None
+        return cls(ws, cfg.get("max_bytes", 32768))
+
+    async def send(self, message: Union[bytes, str], urgent: bool = False) -> None:
+        """链路空闲时立即写出，drain 期间排队；urgent 或排队已满时立即写出"""
+        if self._error is not None:
+            raise self._error
+        if not self.batched:
+            await self.ws.send(message)
+            self.messages += 1
+            self.writes += 1
+            self.bytes += len(message)
+            return
+        await self.ws.ensure_open()
+        self._pending.append(message)
+        self._pending_bytes += len(message)
+        if self._drain_task is None:
+            self._write("direct")
+            self._drain_task = asyncio.ensure_future(self._drain())
+        elif urgent:
+            self._write("urgent")
+        elif self._pending_bytes >= self.max_bytes:
+            self._write("full")
+            await asyncio.shield(self._drain_task)
+
+    def _write(self, reason: str) -> None:
+        batch, self._pending, self._pending_bytes = self._pending, [], 0
+        data = b"".join(self._serialize(message) for message in batch)
+        self.ws.transport.write(data)
+        self.flushes[reason] += 1
+        self.messages += len(batch)
+        self.max_batch = max(self.max_batch, len(batch))
+        self.writes += 1
+        self.bytes += len(data)
+
+    async def _drain(self) -> None:
+        """等待写出的数据发送完，期间排队的消息合并写出，直到没有新的消息"""
+        try:
+            while True:
+                await self.ws.drain()
+                if not self._pending:
+                    break
+                self._write("drained")
+        except Exception as e:
+            # 连接已断开，下一次 send 时抛出
+            self._error = e
+        finally:
+            self._drain_task = None
+
+    def _serialize(self, message: Union[bytes, str]) -> bytes:
+        if isinstance(message, str):
+            frame = Frame(opcode=Opcode.TEXT, data=message.encode("utf-8"), fin=True)
+        else:
+            frame = Frame(opcode=Opcode.BINARY, data=bytes(message), fin=True)
+        return frame.serialize(mask=self.ws.is_client, extensions=self.ws.extensions)
+
+    async def close(self) -> None:
+        """写出剩余消息，连接已断开时丢弃"""
+        try:
+            if self._pending:
+                self._write("urgent")
+            if self._drain_task is not None:
+                await self._drain_task
+        except Exception:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return {
+            "messages": self.messages,
+            "writes": self.writes,
+            "writes_per_s": round(self.writes / elapsed, 1),
+            "messages_per_write": round(self.messages / self.writes, 2) if self.writes else 0,
+            "max_batch": self.max_batch,
+            "bytes": self.bytes,
+            "flushes": dict(self.flushes),
+        }
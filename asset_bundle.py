@@ -0,0 +1,161 @@
+# 预编译屏幕资源包 (EasyDisplay Asset Bundle)
+#
+# 由 PC 端 tools/build_assets.py 把图片和固定的界面文字预先转换为可直接 blit 的
+# MONO_HLSB / RGB565 点阵，打包成一个文件。设备端只需打开一次文件，按名称查表后
+# seek + readinto 即可显示，不再解析图片格式或逐字渲染；常用资源可常驻内存。
+#
+# 文件格式 (大端):
+#   文件头 8 字节:   b"EDAB" | 版本 u8 | 保留 u8 | 资源数量 u16
+#   资源表 12 字节/项: 数据偏移 u32 | 宽 u16 | 高 u16 | 格式 u8 | 名称长度 u8 | 名称偏移 u16
+#   名称区:          UTF-8 名称依次排列，名称偏移相对于名称区开头
+#   数据区:          MONO_HLSB 每行 (宽 + 7) // 8 字节；RGB565 每像素 2 字节 (大端，与 dat 文件一致)
+from struct import unpack_from
+from framebuf import FrameBuffer, MONO_HLSB, RGB565
+
+MAGIC = b"EDAB"
+VERSION = 1
+HEADER_SIZE = 8
+ENTRY_SIZE = 12
+ENTRY_FORMAT = ">IHHBBH"
+
+FMT_MONO = 0  # MONO_HLSB
+FMT_RGB565 = 1
+
+FRAMEBUF_FORMATS = (MONO_HLSB, RGB565)
+
+
+def stride(fmt: int, width: int) -> int:
+    """每行字节数"""
+    return (width + 7) >> 3 if fmt == FMT_MONO else width * 2
+
+
+class AssetBundle:
+    BAND_SIZE = 1024  # 从文件显示时每次读取的最大字节数，按整行取整
+
+    def __init__(self, file, hot=()):
+        """
+        Args:
+            file: 资源包文件路径 (str) 或已打开的文件对象 (BytesIO)
+            hot: 常驻内存的资源名称
+        """
+        self.file = open(file, "rb") if isinstance(file, str) else file
+        f = self.file
+        f.seek(0)
+        head = f.read(HEADER_SIZE)
+        if head[0:4] != MAGIC:
+            raise TypeError("Unsupported File Type: not an asset bundle")
+        if head[4] != VERSION:
+            raise TypeError("Unsupported Version: {}".format(head[4]))
+        count = head[6] << 8 | head[7]
+        table = f.read(count * ENTRY_SIZE)
+        entries = []
+        names_size = 0
+        for i in range(count):
+            entry = unpack_from(ENTRY_FORMAT, table, i * ENTRY_SIZE)
+            entries.append(entry)
+            names_size = max(names_size, entry[5] + entry[4])
+        names = f.read(names_size)
+        self.index = {}  # 名称 -> 序号
+        for i, (offset, width, height, fmt, name_len, name_off) in enumerate(entries):
+            self.index[str(names[name_off:name_off + name_len], "utf-8")] = i
+        # 资源表只保留显示需要的字段: (数据偏移, 宽, 高, 格式)
+        self.entries = [entry[:4] for entry in entries]
+        self._ram = {}  # 序号 -> 常驻内存的点阵
+        self._band = None
+        for name in hot:
+            self.preload(name)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def names(self):
+        return list(self.index)
+
+    def _id(self, name) -> int:
+        if isinstance(name, int):
+            return name
+        try:
+            return self.index[name]
+        except KeyError:
+            raise KeyError("Asset not found: {}".format(name))
+
+    def info(self, name):
+        """
+        Returns:
+            (宽, 高, 格式)
+        """
+        offset, width, height, fmt = self.entries[self._id(name)]
+        return width, height, fmt
+
+    def size(self, name) -> int:
+        """点阵数据字节数"""
+        offset, width, height, fmt = self.entries[self._id(name)]
+        return stride(fmt, width) * height
+
+    def preload(self, name):
+        """把资源读入内存，之后显示时不再访问文件"""
+        i = self._id(name)
+        if i not in self._ram:
+            data = bytearray(self.size(i))
+            self.file.seek(self.entries[i][0])
+            self.file.readinto(data)
+            self._ram[i] = data
+
+    def unload(self, name=None):
+        """释放常驻内存的资源，name 为 None 时全部释放"""
+        if name is None:
+            self._ram.clear()
+        else:
+            self._ram.pop(self._id(name), None)
+
+    def memory(self) -> int:
+        """常驻内存的点阵占用的字节数"""
+        return sum(len(data) for data in self._ram.values()) + (len(self._band) if self._band else 0)
+
+    def framebuffer(self, name) -> FrameBuffer:
+        """返回整个资源的 FrameBuffer，不在内存中的资源会被读入一个新的缓冲区"""
+        i = self._id(name)
+        offset, width, height, fmt = self.entries[i]
+        data = self._ram.get(i)
+        if data is None:
+            data = bytearray(self.size(i))
+            self.file.seek(offset)
+            self.file.readinto(data)
+        return FrameBuffer(data, width, height, FRAMEBUF_FORMATS[fmt])
+
+    def bands(self, name):
+        """
+        按行分段读取资源点阵，缓冲区在各次调用之间复用
+
+        Yields:
+            (起始行, 行数, 数据 memoryview)
+        """
+        i = self._id(name)
+        offset, width, height, fmt = self.entries[i]
+        row_bytes = stride(fmt, width)
+        data = self._ram.get(i)
+        if data is not None:
+            yield 0, height, memoryview(data)
+            return
+        rows = max(self.BAND_SIZE // row_bytes, 1)
+        size = rows * row_bytes
+        if self._band is None or len(self._band) < size:
+            self._band = bytearray(size)
+        band = memoryview(self._band)
+        f = self.file
+        f.seek(offset)
+        row = 0
+        while row < height:
+            n = min(rows, height - row)
+            buf = band[:n * row_bytes]
+            f.readinto(buf)
+            yield row, n, buf
+            row += n
+
+    def close(self):
+        self._ram.clear()
+        self._band = None
+        self.file.close()
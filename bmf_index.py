@@ -0,0 +1,133 @@
+# BMF 字体码位索引
+#
+# .bmf 文件在 16 字节文件头之后、start_bitmap 之前存放升序排列的 16 位码位表 (大端)，
+# 字符在表中的位置即为其点阵在位图区的序号。三种查找方式:
+#   "ram":    一次性把码位表载入内存 array('H')，内存中二分查找，不再访问文件
+#   "bucket": 每 bucket_size 个码位取一个放入内存，先在内存中定位分桶，
+#             再一次 seek + read 读出该桶做二分，适合内存紧张的开发板
+#   "disk":   每次探测都 seek + read 2 字节 (原始实现)
+from array import array
+
+INDEX_RAM = "ram"
+INDEX_BUCKET = "bucket"
+INDEX_DISK = "disk"
+INDEX_MODES = (INDEX_RAM, INDEX_BUCKET, INDEX_DISK)
+
+_CHUNK = 256  # 载入码位表时每次读取的字节数
+
+
+def _bisect(codes, code, lo, hi):
+    """在 codes[lo:hi] 中查找 code，返回位置或 -1"""
+    while lo < hi:
+        mid = (lo + hi) >> 1
+        c = codes[mid]
+        if c == code:
+            return mid
+        if c < code:
+            lo = mid + 1
+        else:
+            hi = mid
+    return -1
+
+
+class BMFIndex:
+    def __init__(self, font, start_bitmap: int, mode: str = INDEX_RAM, bucket_size: int = 32):
+        """
+        Args:
+            font: 已打开的字体文件对象
+            start_bitmap: 位图开始字节
+            mode: "ram" / "bucket" / "disk"
+            bucket_size: bucket 模式下每个分桶的码位数量
+        """
+        if mode not in INDEX_MODES:
+            raise ValueError("Unsupported index mode: {}".format(mode))
+        self.font = font
+        self.start_bitmap = start_bitmap
+        self.mode = mode
+        self.count = (start_bitmap - 16) >> 1
+        self.bucket_size = bucket_size
+        self._codes = None
+        self._buf = None
+        if mode == INDEX_RAM:
+            self._codes = self._load(1)
+        elif mode == INDEX_BUCKET:
+            self._codes = self._load(bucket_size)
+            self._buf = bytearray(bucket_size * 2)
+
+    def _load(self, step: int):
+        """读取码位表，每 step 个取一个，转换为本机字节序的 array('H')"""
+        codes = array("H", range((self.count + step - 1) // step))
+        seek = self.font.seek
+        read = self.font.read
+        seek(16, 0)
+        i = 0
+        pos = 0
+        stride = step * 2
+        while pos < self.count * 2:
+            chunk = read(min(_CHUNK * stride, self.count * 2 - pos))
+            for j in range(0, len(chunk), stride):
+                codes[i] = chunk[j] << 8 | chunk[j + 1]
+                i += 1
+            pos += len(chunk)
+        return codes
+
+    def find(self, code: int) -> int:
+        """返回码位在表中的序号，不存在返回 -1"""
+        if self.mode == INDEX_RAM:
+            return _bisect(self._codes, code, 0, len(self._codes))
+        if self.mode == INDEX_BUCKET:
+            return self._find_bucket(code)
+        return self._find_disk(code)
+
+    def _find_bucket(self, code: int) -> int:
+        heads = self._codes
+        # 找到最后一个首码位 <= code 的分桶
+        lo, hi = 0, len(heads)
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if heads[mid] <= code:
+                lo = mid + 1
+            else:
+                hi = mid
+        bucket = lo - 1
+        if bucket < 0:
+            return -1
+        first = bucket * self.bucket_size
+        n = min(self.bucket_size, self.count - first)
+        buf = self._buf
+        self.font.seek(16 + first * 2, 0)
+        self.font.readinto(buf)
+        lo, hi = 0, n
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            c = buf[mid * 2] << 8 | buf[mid * 2 + 1]
+            if c == code:
+                return first + mid
+            if c < code:
+                lo = mid + 1
+            else:
+                hi = mid
+        return -1
+
+    def _find_disk(self, code: int) -> int:
+        seek = self.font.seek
+        read = self.font.read
+        start = 0x10
+        end = self.start_bitmap
+        while start <= end:
+            mid = ((start + end) // 4) * 2
+            seek(mid, 0)
+            b = read(2)
+            target_code = b[0] << 8 | b[1]
+            if code == target_code:
+                return (mid - 16) >> 1
+            elif code < target_code:
+                end = mid - 2
+            else:
+                start = mid + 2
+        return -1
+
+    def memory(self) -> int:
+        """索引占用的内存字节数"""
+        size = len(self._codes) * 2 if self._codes is not None else 0
+        return size + (len(self._buf) if self._buf is not None else 0)
@@ -0,0 +1,108 @@
+# ESP32 <-> 中转服务器 二进制消息格式 (MicroPython 端)
+# 与 Agent_Server/device_protocol.py 保持一致
+#
+# 每条消息占一个 WebSocket 二进制帧，4 字节头 + 负载:
+#   version(4 bits) + type(4 bits)
+#   flags(8 bits)
+#   payload length(16 bits, big endian)
+#   payload
+# 握手时通过 Sec-WebSocket-Protocol 协商，协商失败则回退到 JSON 文本帧
+import struct
+
+SUBPROTOCOL = "s2s.bin.v1"
+VERSION = 0b0001
+HEADER_SIZE = 4
+MAX_PAYLOAD = 0xFFFF
+
+# Message Type
+TYPE_AUDIO = 0x1   # PCM 音频 (双向)
+TYPE_STOP = 0x2    # 打断，立即停止播放 (服务器 -> 设备)
+TYPE_ASR = 0x3     # 用户语音识别文本 UTF-8 (服务器 -> 设备)
+TYPE_LLM = 0x4     # 大模型回复文本 UTF-8 (服务器 -> 设备)
+TYPE_STATS = 0x5   # 设备统计 key/value (设备 -> 服务器)
+TYPE_CONFIG = 0x6  # 运行时配置 key/value (服务器 -> 设备)
+TYPE_QUERY = 0x7   # 文本提问 UTF-8 (设备 -> 服务器)
+TYPE_GLYPHS = 0x8  # 字形包: 1 字节点阵大小 + N * (2 字节码位 + 点阵) (服务器 -> 设备)
+TYPE_VAD = 0x9     # 设备端 VAD 状态: 1 字节，1 进入语音 / 0 进入静音 (设备 -> 服务器)
+TYPE_BUSY = 0xA    # 服务器繁忙，4 字节建议重连等待时间 ms，随后关闭连接 (服务器 -> 设备)
+
+# Flags
+FLAG_PRIORITY = 0x01  # 控制消息，收到后立即处理
+
+# Stats Key (TYPE_STATS)
+STAT_FREE_HEAP = 0x01      # gc.mem_free(), bytes
+STAT_UP_BYTES = 0x02       # 累计上行音频字节
+STAT_DOWN_BYTES = 0x03     # 累计下行音频字节
+STAT_AUDIO_QUEUE = 0x04    # 播放队列长度
+STAT_STOP_LATENCY = 0x05   # 最近一次打断到静音耗时, us
+STAT_FREE_HEAP_MIN = 0x06  # 统计周期内最小空闲内存, bytes
+STAT_GC_COUNT = 0x07       # 统计周期内垃圾回收次数
+STAT_GC_TIME = 0x08        # 统计周期内主动垃圾回收耗时, us
+STAT_QUEUE_MAX = 0x09      # 统计周期内播放队列最大长度
+STAT_UNDERRUNS = 0x0A      # 累计播放欠载次数
+STAT_RSSI = 0x0B           # Wi-Fi 信号强度, dBm
+STAT_UP_RATE = 0x0C        # 统计周期内上行速率, bytes/s
+STAT_DOWN_RATE = 0x0D      # 统计周期内下行速率, bytes/s
+STAT_LOOP_LAG_MAX = 0x0E   # 统计周期内事件循环最大延迟, us
+STAT_LOOP_LAG_AVG = 0x0F   # 统计周期内事件循环平均延迟, us
+STAT_UPTIME = 0x10         # 运行时间, s
+STAT_INTERVAL = 0x11       # 统计周期, ms
+STAT_MIC_LOST = 0x12       # 累计丢失的麦克风采样数
+STAT_UP_BACKLOG_MAX = 0x13 # 统计周期内上行发送积压的最大帧数
+STAT_VAD_SKIPPED = 0x14    # 累计因静音未发送的麦克风字节
+STAT_MAX = 0x14
+
+# Config Key (TYPE_CONFIG)
+CFG_VAD_ENABLED = 0x01     # 0 / 1
+CFG_VAD_THRESHOLD = 0x02   # 语音帧的最小平均幅度
+CFG_VAD_ZCR_MAX = 0x03     # 语音帧每帧最大过零次数，0 表示不限制
+CFG_VAD_HANGOVER = 0x04    # 语音结束后继续发送的时长, ms
+CFG_VAD_PREROLL = 0x05     # 语音开始前补发的时长, ms
+CFG_VAD_START = 0x06       # 连续多少帧语音才进入语音状态
+CFG_LINK_TIMEOUT = 0x07    # 超过该时间 (ms) 未收到服务器任何数据则断开重连，0 表示不检测
+
+# key/value 负载: 每项 1 字节 key + 4 字节有符号整数
+KV_FORMAT = ">Bi"
+KV_SIZE = 5
+
+
+def encode(msg_type, payload=b"", flags=0):
+    n = len(payload)
+    if n > MAX_PAYLOAD:
+        raise ValueError("payload too large")
+    buf = bytearray(HEADER_SIZE + n)
+    struct.pack_into(">BBH", buf, 0, (VERSION << 4) | msg_type, flags, n)
+    buf[HEADER_SIZE:] = payload
+    return buf
+
+
+def decode(data):
+    """
+    解析一帧消息，返回 (type, flags, payload)
+    payload 为 memoryview，不复制数据
+    """
+    if len(data) < HEADER_SIZE:
+        raise ValueError("short frame")
+    b0, flags, n = struct.unpack_from(">BBH", data, 0)
+    if b0 >> 4 != VERSION:
+        raise ValueError("bad version")
+    return b0 & 0x0F, flags, memoryview(data)[HEADER_SIZE:HEADER_SIZE + n]
+
+
+def encode_kv(msg_type, items):
+    """items: 可迭代的 (key, value) 整数对"""
+    items = list(items)
+    payload = bytearray(len(items) * KV_SIZE)
+    offset = 0
+    for key, value in items:
+        struct.pack_into(KV_FORMAT, payload, offset, key, value)
+        offset += KV_SIZE
+    return encode(msg_type, payload)
+
+
+def decode_kv(payload):
+    items = {}
+    for offset in range(0, len(payload) - KV_SIZE + 1, KV_SIZE):
+        key, value = struct.unpack_from(KV_FORMAT, payload, offset)
+        items[key] = value
+    return items
@@ -0,0 +1,166 @@
+# 屏幕刷新调度
+#
+# 字幕更新不再在收到消息时立即渲染并同步刷新整屏，而是由独立的协程按帧处理:
+#   1. 合并: 两帧之间收到的多条字幕只渲染最后一条 (屏幕上只看得到最后一条)
+#   2. 限帧: 两帧之间至少间隔 1000 / max_fps 毫秒
+#   3. 分块发送: 变化的页按传输预算分成若干块调用 show(pages=...)，块与块之间让出 CPU，
+#      I2C 传输单次阻塞事件循环的时间不超过 budget_ms (至少发送一页)，播放协程可以及时写入 I2S
+# 渲染与传输耗时记录在 stats() 中。
+import time
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+KIND_TEXT = "text"  # 静态显示 (TextLayout.show_text)
+KIND_TICKER = "ticker"  # 滚动字幕 (SubtitleTicker.start)
+
+
+class DisplayScheduler:
+    def __init__(self, layout, ticker=None, progress=None, max_fps=20, budget_ms=5, idle_ms=50):
+        """
+        Args:
+            layout: TextLayout 实例
+            ticker: SubtitleTicker 实例
+            progress: 返回当前播放进度 (毫秒) 的函数，滚动字幕跟随该进度
+            max_fps: 最大帧率
+            budget_ms: 每次传输阻塞事件循环的时间预算
+            idle_ms: 没有待处理内容时的轮询间隔
+        """
+        self.layout = layout
+        self.ticker = ticker
+        self.progress = progress
+        self.interval_ms = 1000 // max_fps
+        self.budget_us = budget_ms * 1000
+        self.idle_ms = idle_ms
+        self.running = False
+        self._pending = None
+        self._ticker_start = 0
+        self._partial = True
+        # 单页传输耗时的滑动平均，用于估算每块能发送的页数
+        self.page_us = 0
+        self.frames = 0
+        self.coalesced = 0
+        self.render_us = 0
+        self.render_max_us = 0
+        self.transfer_us = 0
+        self.transfer_max_us = 0
+        self.slice_max_us = 0
+
+    def submit(self, kind, text):
+        """提交一次字幕更新，下一帧之前再次提交会覆盖本次"""
+        if self._pending is not None:
+            self.coalesced += 1
+        self._pending = (kind, text)
+
+    def clear(self):
+        """丢弃待显示的字幕并停止滚动 (打断时调用)"""
+        self._pending = None
+        if self.ticker:
+            self.ticker.stop()
+
+    def _busy(self):
+        return self._pending is not None or (self.ticker and self.ticker.active) or self.layout._dirty
+
+    def _render(self):
+        pending = self._pending
+        self._pending = None
+        ticker = self.ticker
+        if pending is not None:
+            kind, text = pending
+            if kind == KIND_TICKER and ticker:
+                ticker.start(text)
+                self._ticker_start = self.progress() if self.progress else 0
+            else:
+                if ticker:
+                    ticker.stop()
+                self.layout.show_text(text)
+        elif ticker and ticker.active:
+            elapsed = self.progress() - self._ticker_start if self.progress else 0
+            ticker.update(elapsed)
+
+    def _show(self, pages):
+        display = self.layout.display
+        if self._partial:
+            try:
+                display.show(pages=pages)
+                return
+            except TypeError:
+                # 驱动不支持局部刷新
+                self._partial = False
+        display.show()
+
+    async def _transfer(self, pages):
+        total = 0
+        i = 0
+        while i < len(pages):
+            n = max(self.budget_us // self.page_us, 1) if self.page_us else 1
+            chunk = pages[i:i + n] if self._partial else None
+            t0 = time.ticks_us()
+            self._show(chunk)
+            dt = time.ticks_diff(time.ticks_us(), t0)
+            total += dt
+            if dt > self.slice_max_us:
+                self.slice_max_us = dt
+            if chunk is None:
+                break
+            per_page = dt // len(chunk)
+            self.page_us = (self.page_us * 3 + per_page) >> 2 if self.page_us else per_page
+            i += n
+            # 让出 CPU，播放与接收协程在两块之间运行
+            await asyncio.sleep(0)
+        self.transfer_us = total
+        if total > self.transfer_max_us:
+            self.transfer_max_us = total
+
+    async def run(self, running=None):
+        """
+        刷新循环，运行期间 TextLayout 只记录变化的页，由本循环发送
+
+        Args:
+            running: 返回 False 时退出循环的函数，None 表示一直运行
+        """
+        layout = self.layout
+        layout.deferred = True
+        self.running = True
+        last = time.ticks_ms() - self.interval_ms
+        try:
+            while running is None or running():
+                if not self._busy():
+                    await asyncio.sleep(self.idle_ms / 1000)
+                    continue
+                wait = self.interval_ms - time.ticks_diff(time.ticks_ms(), last)
+                if wait > 0:
+                    await asyncio.sleep(wait / 1000)
+                    continue
+                last = time.ticks_ms()
+                t0 = time.ticks_us()
+                self._render()
+                dt = time.ticks_diff(time.ticks_us(), t0)
+                self.render_us = dt
+                if dt > self.render_max_us:
+                    self.render_max_us = dt
+                pages = layout.take_dirty()
+                if pages:
+                    self.frames += 1
+                    await self._transfer(pages)
+                else:
+                    # 渲染可能耗时较长，没有需要发送的页时也让出一次
+                    await asyncio.sleep(0)
+        finally:
+            self.running = False
+            layout.deferred = False
+
+    def stats(self):
+        """渲染与传输耗时 (微秒)"""
+        return {
+            "frames": self.frames,
+            "coalesced": self.coalesced,
+            "render_us": self.render_us,
+            "render_max_us": self.render_max_us,
+            "transfer_us": self.transfer_us,
+            "transfer_max_us": self.transfer_max_us,
+            "slice_max_us": self.slice_max_us,
+            "page_us": self.page_us,
+        }
@@ -16,10 +16,15 @@
 from io import BytesIO
 from struct import unpack
 from framebuf import FrameBuffer, MONO_HLSB, RGB565
+from bmf_index import BMFIndex, INDEX_RAM
+from glyph_scale import scale_hlsb
+from row_convert import rgb888_to_rgb565, rgb888_to_mono, ORDER_RGB, ORDER_BGR
+from asset_bundle import AssetBundle, FMT_MONO, FMT_RGB565, FRAMEBUF_FORMATS
 
 
 class EasyDisplay:
     READ_SIZE = 32  # Limit the picture read size to prevent memory errors in low-performance development boards
+    SCALED_CACHE_SIZE = 64  # Maximum number of scaled glyphs kept in memory
 
     def __init__(self, display,
                  color_type,
@@ -34,6 +39,7 @@ class EasyDisplay:
                  auto_wrap: bool = False,
                  half_char: bool = True,
                  line_spacing: int = 0,
+                 index_mode: str = INDEX_RAM,
                  *args, **kwargs):
         """
         初始化 EasyDisplay
@@ -67,6 +73,8 @@ class EasyDisplay:
                 半宽显示 ASCII 字符
             line_spacing: Line spacing for text
                 文本行间距
+            index_mode: Font code point index mode, "ram", "bucket" or "disk" (see bmf_index.py)
+                字体码位索引方式，"ram"、"bucket" 或 "disk"（见 bmf_index.py）
         """
         self.display = display
         self._buffer = hasattr(display, 'buffer')  # buffer: 驱动是否使用了帧缓冲区，False（SPI 直接驱动） / True（Framebuffer）
@@ -82,6 +90,9 @@ class EasyDisplay:
         self.auto_wrap = auto_wrap
         self.half_char = half_char
         self.line_spacing = line_spacing
+        self.index_mode = index_mode
+        self.font_index = None
+        self._scaled_cache = {}  # (char, size) -> scaled glyph data
         self.font_size = None
         self.font_bmf_info = None
         self.font_version = None
@@ -89,6 +100,7 @@ class EasyDisplay:
         self.font_map_mode = None
         self.font_start_bitmap = None
         self.font_bitmap_size = None
+        self.bundle = None
         if font:
             self.load_font(font)
 
@@ -162,22 +174,7 @@ class EasyDisplay:
         Args:
             word: Character 字符
         """
-        word_code = ord(word)
-        start = 0x10
-        end = self.font_start_bitmap
-        _seek = self._font.seek
-        _font_read = self._font.read
-        while start <= end:
-            mid = ((start + end) // 4) * 2
-            _seek(mid, 0)
-            target_code = unpack(">H", _font_read(2))[0]
-            if word_code == target_code:
-                return (mid - 16) >> 1
-            elif word_code < target_code:
-                end = mid - 2
-            else:
-                start = mid + 2
-        return -1
+        return self.font_index.find(ord(word))
 
     # @timeit
     @staticmethod
@@ -193,19 +190,27 @@ class EasyDisplay:
         Returns:
             Scaled character data 缩放后的数据
         """
-        r = range(new_size)  # Preload functions to avoid repeated execution and improve efficiency
         if old_size == new_size:
             return bytearray_data
-        _t = bytearray(new_size * ((new_size >> 3) + 1))
-        _new_index = -1
-        for _col in r:
-            for _row in r:
-                if _row % 8 == 0:
-                    _new_index += 1
-                _old_index = int(_col / (new_size / old_size)) * old_size + int(_row / (new_size / old_size))
-                _t[_new_index] = _t[_new_index] | (
-                        (bytearray_data[_old_index >> 3] >> (7 - _old_index % 8) & 1) << (7 - _row % 8))
-        return _t
+        # Integer lookup tables are built once per size pair, see glyph_scale.py
+        return scale_hlsb(bytearray_data, old_size, new_size)
+
+    def _scaled_bitmap(self, word: str, size: int) -> bytearray:
+        """
+        Get Scaled Dot Matrix Image 获取缩放后的点阵图（带缓存）
+
+        Args:
+            word: Single character 单个字符
+            size: Font size 字号
+        """
+        key = (word, size)
+        data = self._scaled_cache.get(key)
+        if data is None:
+            if len(self._scaled_cache) >= self.SCALED_CACHE_SIZE:
+                self._scaled_cache.clear()
+            data = self._hlsb_font_size(bytearray(self.get_bitmap(word)), size, self.font_size)
+            self._scaled_cache[key] = data
+        return data
 
     def get_bitmap(self, word: str) -> bytes:
         """
@@ -259,6 +264,9 @@ class EasyDisplay:
             self.size = int(self.font_size)
         # 点阵所占字节，用来定位字体数据位置
         self.font_bitmap_size = self.font_bmf_info[8]
+        # 码位索引
+        self.font_index = BMFIndex(self._font, self.font_start_bitmap, self.index_mode)
+        self._scaled_cache = {}
 
     def text(self, s: str, x: int, y: int,
              color: int = None, bg_color: int = None, size: int = None,
@@ -367,13 +375,11 @@ class EasyDisplay:
             if x > dp.width or y > dp.height:
                 continue
 
-            # 获取字体的点阵数据
-            byte_data = self.get_bitmap(char)
-
-            # 准备并缩放字符数据
-            byte_data = bytearray(byte_data)
+            # 获取字体的点阵数据，缩放结果会被缓存
             if font_size != self.font_size:
-                byte_data = self._hlsb_font_size(byte_data, font_size, self.font_size)
+                byte_data = self._scaled_bitmap(char, font_size)
+            else:
+                byte_data = bytearray(self.get_bitmap(char))
 
             # 显示字符
             fbuf = FrameBuffer(byte_data, font_size, font_size, MONO_HLSB)
@@ -516,68 +522,93 @@ class EasyDisplay:
 
             elif file_format == b"P6\n":  # P6 像素图 二进制
                 max_pixel_value = f.readline()  # 获取最大像素值
-                r_height = range(_height)
-                r_width = range(_width)
-                color_bytearray = bytearray(3)  # 为变量预分配内存
+                row = bytearray(_width * 3)  # 整行读取，缓冲区复用
                 f_rinto = f.readinto
-                try:
-                    dp_color = dp.color
-                except AttributeError:
-                    dp_color = self.rgb565_color
-                dp_pixel = dp.pixel
-                if self._buffer:  # Framebuffer 模式
-                    if color_type == "RGB565":
-                        buffer = bytearray(_width * 2)
-                    for _y in r_height:  # 逐行显示图片
-                        for _x in r_width:
-                            f_rinto(color_bytearray)
-                            r, g, b = color_bytearray[0], color_bytearray[1], color_bytearray[2]
-                            if invert:
-                                r = 255 - r
-                                g = 255 - g
-                                b = 255 - b
-                            if color_type == "RGB565":
-                                buffer[_x * 2: (_x + 1) * 2] = dp_color(r, g, b).to_bytes(2, 'big')  # 通过索引赋值
-                            elif color_type == "MONO":
-                                _color = int((r + g + b) / 3) >= 127
-                                if _color:
-                                    _color = color
-                                else:
-                                    _color = bg_color
-                                if _color != key:  # 不显示指定颜色
-                                    dp_pixel(_x + x, _y + y, _color)
-                        if color_type == "RGB565":
-                            fbuf = FrameBuffer(buffer, _width, 1, RGB565)
-                            dp.blit(fbuf, x, y + _y, key)
-                else:  # 直接驱动
-                    dp.set_window(x, y, x + _width - 1, y + _height - 1)  # 设置窗口
-                    buffer = bytearray(_width * 2)
-                    for _y in r_height:  # 逐行显示图片
-                        for _x in r_width:
-                            color_bytearray = f_read(3)
-                            r, g, b = color_bytearray[0], color_bytearray[1], color_bytearray[2]
-                            if invert:
-                                r = 255 - r
-                                g = 255 - g
-                                b = 255 - b
-                            if color_type == "RGB565":
-                                buffer[_x * 2: (_x + 1) * 2] = dp_color(
-                                    r, g, b).to_bytes(2, 'big')  # 通过索引赋值
-                            elif color_type == "MONO":
-                                _color = int((r + g + b) / 3) >= 127
-                                if _color:
-                                    _color = color
-                                else:
-                                    _color = bg_color
-                                if _color != key:  # 不显示指定颜色
-                                    dp_pixel(_x + x, _y + y, _color)
-                        if color_type == "RGB565":
-                            dp.write_data(buffer)
+                draw_row = self._row_drawer(_width, _height, x, y, ORDER_RGB, invert, key, color, bg_color)
+                for _y in range(_height):  # 逐行显示图片
+                    f_rinto(row)
+                    draw_row(row, _y)
             else:
                 raise TypeError("Unsupported File Format Type.")
 
             self.show() if show else 0  # 立即显示
 
+    def _row_drawer(self, width, height, x, y, order, invert, key, color, bg_color):
+        """
+        Create a function that converts one row of 24-bit pixels and draws it at once
+        创建整行转换并显示 24 位像素的函数
+
+        Args:
+            width: Row width in pixels 行宽
+            height: Number of rows 行数
+            x: X-coordinate X 坐标
+            y: Y-coordinate of the first row 首行 Y 坐标
+            order: ORDER_RGB (PPM) or ORDER_BGR (BMP) 通道顺序
+            invert: Invert colors 反转颜色
+            key: Transparent color 透明色
+            color: Main color in MONO mode MONO 模式前景色
+            bg_color: Background color in MONO mode MONO 模式背景色
+
+        Returns:
+            draw_row(row, row_index)
+        """
+        dp = self.display
+        color_type = self.color_type
+        if color_type == "RGB565":
+            buffer = bytearray(width * 2)
+            if hasattr(dp, 'color'):  # The driver has its own color conversion, convert pixel by pixel
+                dp_color = dp.color
+                r_off = 2 if order == ORDER_BGR else 0
+                b_off = 0 if order == ORDER_BGR else 2
+
+                def convert(row):
+                    for _x in range(width):
+                        r, g, b = row[_x * 3 + r_off], row[_x * 3 + 1], row[_x * 3 + b_off]
+                        if invert:
+                            r, g, b = 255 - r, 255 - g, 255 - b
+                        buffer[_x * 2: (_x + 1) * 2] = dp_color(r, g, b).to_bytes(2, 'big')
+            else:
+                def convert(row):
+                    rgb888_to_rgb565(row, buffer, width, order, invert)
+            if self._buffer:  # Framebuffer 模式
+                fbuf = FrameBuffer(buffer, width, 1, RGB565)
+                dp_blit = dp.blit
+
+                def draw_row(row, _y):
+                    convert(row)
+                    dp_blit(fbuf, x, y + _y, key)
+            else:  # 直接驱动
+                dp.set_window(x, y, x + width - 1, y + height - 1)
+                dp_write = dp.write_data
+
+                def draw_row(row, _y):
+                    convert(row)
+                    dp_write(buffer)
+        elif color_type == "MONO":
+            buffer = bytearray((width + 7) >> 3)
+            if self._buffer:  # Framebuffer 模式，按调色板一次 blit 整行
+                fbuf = FrameBuffer(buffer, width, 1, MONO_HLSB)
+                palette = FrameBuffer(bytearray(1), 2, 1, MONO_HLSB)
+                palette.pixel(1, 0, color)
+                palette.pixel(0, 0, bg_color)
+                dp_blit = dp.blit
+
+                def draw_row(row, _y):
+                    rgb888_to_mono(row, buffer, width, invert)
+                    dp_blit(fbuf, x, y + _y, key, palette)
+            else:
+                dp_pixel = dp.pixel
+
+                def draw_row(row, _y):
+                    rgb888_to_mono(row, buffer, width, invert)
+                    for _x in range(width):
+                        _color = color if buffer[_x >> 3] & (0x80 >> (_x & 7)) else bg_color
+                        if _color != key:  # 不显示指定颜色
+                            dp_pixel(_x + x, _y + y, _color)
+        else:
+            raise ValueError("Unsupported color_type: {}".format(color_type))
+        return draw_row
+
     def bmp(self, file, x, y, key: int = None, show: bool = None, clear: bool = None, invert: bool = False,
             color: int = None, bg_color: int = None):
         """
@@ -620,7 +651,6 @@ class EasyDisplay:
             clear = self._clear
         if invert is None:
             invert = self.invert
-        color_type = self.color_type
         if color is None:
             color = self.color
         if bg_color is None:
@@ -633,13 +663,7 @@ class EasyDisplay:
             f_read = f.read
             f_rinto = f.readinto
             f_seek = f.seek
-            f_tell = f.tell()
             dp = self.display
-            try:
-                dp_color = dp.color
-            except AttributeError:
-                dp_color = self.rgb565_color
-            dp_pixel = dp.pixel
             if f_read(2) == b'BM':  # 检查文件头
                 dummy = f_read(8)  # 文件大小占四个字节，文件作者占四个字节，file size(4), creator bytes(4)
                 int_fb = int.from_bytes
@@ -661,60 +685,18 @@ class EasyDisplay:
                             _width = dp.width
                         if _height > dp.height:
                             _height = dp.height
-                        _color_bytearray = bytearray(3)  # 像素的二进制颜色
                         if clear:  # 清屏
                             self.clear()
-                        buffer = bytearray(_width * 2)
-                        self_buf = self._buffer
-                        if not self_buf:
-                            dp.set_window(x, y, x + _width - 1, y + _height - 1)  # 设置窗口
-                        r_width = range(_width)
-                        r_height = range(_height)
-                        for _y in r_height:
+                        row = bytearray(_width * 3)  # 整行读取，缓冲区复用
+                        draw_row = self._row_drawer(_width, _height, x, y, ORDER_BGR, invert, key, color, bg_color)
+                        for _y in range(_height):
                             if flip:
                                 pos = offset + (_height - 1 - _y) * row_size
                             else:
                                 pos = offset + _y * row_size
-                            if f_tell != pos:
-                                f_seek(pos)  # 调整指针位置
-                            for _x in r_width:
-                                f_rinto(_color_bytearray)
-                                r, g, b = _color_bytearray[2], _color_bytearray[1], _color_bytearray[0]
-                                if invert:  # 颜色反转
-                                    r = 255 - r
-                                    g = 255 - g
-                                    b = 255 - b
-                                if self_buf:  # Framebuffer 模式
-                                    if color_type == "RGB565":
-                                        buffer[_x * 2: (_x + 1) * 2] = dp_color(
-                                            r, g, b).to_bytes(2, 'big')  # 通过索引赋值
-                                    elif color_type == "MONO":
-                                        _color = int((r + g + b) / 3) >= 127
-                                        if _color:
-                                            _color = color
-                                        else:
-                                            _color = bg_color
-                                        if _color != key:  # 不显示指定颜色
-                                            dp_pixel(_x + x, _y + y, _color)
-                                else:
-                                    if color_type == "RGB565":
-                                        buffer[_x * 2: (_x + 1) * 2] = dp_color(
-                                            r, g, b).to_bytes(2, 'big')  # 通过索引赋值
-                                    elif color_type == "MONO":
-                                        _color = int((r + g + b) / 3) >= 127
-                                        if _color:
-                                            _color = color
-                                        else:
-                                            _color = bg_color
-                                        if _color != key:  # 不显示指定颜色
-                                            dp_pixel(_x + x, _y + y, _color)
-
-                            if color_type == "RGB565":
-                                if self_buf:
-                                    fbuf = FrameBuffer(buffer, _width, 1, RGB565)
-                                    dp.blit(fbuf, x, y + _y, key)
-                                else:
-                                    dp.write_data(buffer)
+                            f_seek(pos)  # 调整指针位置
+                            f_rinto(row)
+                            draw_row(row, _y)
 
                         self.show() if show else 0  # 立即显示
                     else:
@@ -776,3 +758,91 @@ class EasyDisplay:
                     raise TypeError("Unsupported File Type: {}".format(file_head))
                 except:
                     raise TypeError("Unsupported File Type!")
+
+    def load_bundle(self, file, hot=()):
+        """
+        Load a precompiled asset bundle (see asset_bundle.py and tools/build_assets.py)
+        加载预编译资源包（见 asset_bundle.py 与 tools/build_assets.py）
+
+        Args:
+            file: Bundle file  资源包文件
+                File path (str)  文件路径
+                Raw data (BytesIO)  原始数据
+            hot: Names of assets kept in RAM  常驻内存的资源名称
+
+        Returns:
+            AssetBundle
+        """
+        if self.bundle is not None:
+            self.bundle.close()
+        self.bundle = AssetBundle(file, hot)
+        return self.bundle
+
+    def asset(self, name, x, y, key: int = None, show: bool = None, clear: bool = None,
+              color: int = None, bg_color: int = None, bundle=None):
+        """
+        Display an asset from the bundle, the bitmap is blitted directly without decoding
+        显示资源包中的资源，点阵直接 blit，无需解码
+
+        Args:
+            name: Asset name or index  资源名称或序号
+            x: X-coordinate  X 坐标
+            y: Y-coordinate  Y 坐标
+            key: Specified color to be treated as transparent (only applicable in Framebuffer mode)
+                指定的颜色将被视为透明（仅适用于 Framebuffer 模式）
+            show: Show immediately (only applicable in Framebuffer mode)
+                立即显示（仅适用于 Framebuffer 模式）
+            clear: Clear screen
+                清理屏幕
+            color: Main color of MONO assets  MONO 资源的前景色
+            bg_color: Background color of MONO assets  MONO 资源的背景色
+            bundle: Bundle to use, defaults to the one loaded by load_bundle
+                使用的资源包，默认为 load_bundle 加载的资源包
+        """
+        if key is None:
+            key = self._key
+        if show is None:
+            show = self._show
+        if clear is None:
+            clear = self._clear
+        if color is None:
+            color = self.color
+        if bg_color is None:
+            bg_color = self.bg_color
+        bundle = bundle or self.bundle
+        if bundle is None:
+            raise ValueError("No asset bundle loaded")
+        width, height, fmt = bundle.info(name)
+        if fmt == FMT_RGB565 and self.color_type != "RGB565":
+            raise TypeError("RGB565 assets can not be displayed on a MONO screen")
+        dp = self.display
+        if clear:  # 清屏
+            self.clear()
+        if self._buffer:  # Framebuffer 模式
+            fb_fmt = FRAMEBUF_FORMATS[fmt]
+            dp_blit = dp.blit
+            if fmt == FMT_MONO:
+                palette = FrameBuffer(bytearray(4), 2, 1, RGB565)  # RGB565 调色板可同时用于 MONO 屏幕
+                palette.pixel(1, 0, color)
+                palette.pixel(0, 0, bg_color)
+                for row, rows, data in bundle.bands(name):
+                    dp_blit(FrameBuffer(data, width, rows, fb_fmt), x, y + row, key, palette)
+            else:
+                for row, rows, data in bundle.bands(name):
+                    dp_blit(FrameBuffer(data, width, rows, fb_fmt), x, y + row, key)
+        elif fmt == FMT_RGB565:  # 直接驱动，数据与屏幕格式一致，直接写入
+            dp.set_window(x, y, x + width - 1, y + height - 1)
+            dp_write = dp.write_data
+            for row, rows, data in bundle.bands(name):
+                dp_write(data)
+        else:  # 直接驱动显示 MONO 资源，逐点绘制
+            dp_pixel = dp.pixel
+            row_bytes = (width + 7) >> 3
+            for row, rows, data in bundle.bands(name):
+                for _y in range(rows):
+                    base = _y * row_bytes
+                    for _x in range(width):
+                        _color = color if data[base + (_x >> 3)] & (0x80 >> (_x & 7)) else bg_color
+                        if _color != key:  # 不显示指定颜色
+                            dp_pixel(_x + x, _y + row + y, _color)
+        self.show() if show else 0  # 立即显示
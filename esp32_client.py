@@ -10,6 +10,122 @@ import urandom as random
 import ustruct as struct
 import ufont
 import ssd1306
+import text_layout
+import display_scheduler
+import device_protocol as proto
+from array import array
+
+
+# 播放采样率 24kHz 16bit 单声道，每毫秒字节数
+PLAY_BYTES_PER_MS = 48
+
+# 屏幕刷新: 最大帧率与每次 I2C 传输阻塞事件循环的时间预算
+DISPLAY_MAX_FPS = 20
+DISPLAY_BUDGET_MS = 5
+
+# 遥测: 统计上报周期与采样周期
+TELEMETRY_INTERVAL_S = 10
+TELEMETRY_SAMPLE_MS = 100
+# 播放缓冲耗尽后在该时间内又收到音频，视为一次欠载 (更长的间隔是新的一轮回复)
+UNDERRUN_WINDOW_MS = 1000
+
+# 上行采集: 16kHz 16bit 单声道，每帧 1024 字节 (32ms)
+MIC_BYTES_PER_MS = 32
+MIC_IBUF = 4096
+CAPTURE_FRAME_BYTES = 1024
+# 预分配的帧缓冲数量 (至少 2 个，采集一帧的同时发送另一帧)，多出的部分作为发送积压
+CAPTURE_BUFFERS = 4
+# 发送积压已满时的处理方式: 丢弃最旧的一帧 / 丢弃新采集的一帧
+DROP_OLDEST = 0
+DROP_NEWEST = 1
+CAPTURE_OVERFLOW = DROP_OLDEST
+
+# 设备端 VAD (可由服务器通过 TYPE_CONFIG 修改): 静音时不发送音频，语音前后各补发一段
+VAD_ENABLED = False
+VAD_THRESHOLD = 400       # 语音帧的最小平均幅度 (16bit)
+VAD_ZCR_MAX = 0           # 语音帧每帧最大过零次数，0 表示不限制
+VAD_HANGOVER_MS = 640     # 语音结束后继续发送的时长
+VAD_PREROLL_MS = 320      # 语音开始前补发的时长
+VAD_PREROLL_MAX_MS = 640  # 预分配的补发缓冲时长上限
+VAD_START_FRAMES = 2      # 连续多少帧语音才进入语音状态
+# 上行帧队列中的 VAD 控制标记 (帧序号均为非负数)
+CTRL_SILENCE = -1
+CTRL_SPEECH = -2
+
+# 重连: 指数退避 (带随机抖动)；服务器繁忙时按其建议的等待时间，同样加抖动，避免设备同时重连
+RECONNECT_BASE_MS = 1000
+RECONNECT_MAX_MS = 30000
+# 服务器失联检测的检查间隔；超时时间由服务器通过 CFG_LINK_TIMEOUT 下发
+LINK_CHECK_MS = 1000
+
+# 打断控制帧：单字节二进制帧 (奇数长度，不会与 16bit PCM 混淆)
+STOP_FRAME = b"\x01"
+
+
+def _mask_py(src, dst, n, mask):
+    for i in range(n):
+        dst[i] = src[i] ^ mask[i & 3]
+
+
+_mask = _mask_py
+try:
+    import micropython
+
+    @micropython.viper
+    def _mask_viper(src: ptr8, dst: ptr8, n: int, mask: ptr8):
+        for i in range(n):
+            dst[i] = src[i] ^ mask[i & 3]
+
+    _mask = _mask_viper
+except (ImportError, AttributeError, NameError, SyntaxError):
+    pass
+
+
+def _frame_energy_py(buf, n, out):
+    total = 0
+    crossings = 0
+    neg = 0
+    for i in range(n):
+        v = buf[i * 2] | buf[i * 2 + 1] << 8
+        if v & 0x8000:
+            total += 0x10000 - v
+            if not neg:
+                crossings += 1
+                neg = 1
+        else:
+            total += v
+            if neg:
+                crossings += 1
+                neg = 0
+    out[0] = total
+    out[1] = crossings
+
+
+_frame_energy = _frame_energy_py
+try:
+    @micropython.viper
+    def _frame_energy_viper(buf: ptr16, n: int, out: ptr32):
+        total = 0
+        crossings = 0
+        neg = 0
+        for i in range(n):
+            v = int(buf[i])
+            if v & 0x8000:
+                total += 0x10000 - v
+                if not neg:
+                    crossings += 1
+                    neg = 1
+            else:
+                total += v
+                if neg:
+                    crossings += 1
+                    neg = 0
+        out[0] = total
+        out[1] = crossings
+
+    _frame_energy = _frame_energy_viper
+except (ImportError, AttributeError, NameError, SyntaxError):
+    pass
 
 
 def log(msg):
@@ -18,36 +134,48 @@ def log(msg):
 
 
 class WebSocket:
-    def __init__(self, reader, writer):
+    def __init__(self, reader, writer, subprotocol=None):
         self.reader = reader
         self.writer = writer
+        self.subprotocol = subprotocol
         self.closed = False
+        # 最近一次收到任何帧 (包括服务器的 ping) 的时刻
+        self.last_rx = time.ticks_ms()
+        # 帧头与掩码后的负载使用复用的缓冲区，发送时不再分配内存
+        self._header = bytearray(14)
+        self._header_mv = memoryview(self._header)
+        self._masked = bytearray(CAPTURE_FRAME_BYTES + proto.HEADER_SIZE)
 
     async def send_bytes(self, data):
         await self._send_frame(0x2, data)
 
+    async def send_text(self, text):
+        await self._send_frame(0x1, text.encode())
+
     async def _send_frame(self, opcode, data):
         if self.closed: return
         try:
-            header = bytearray()
-            header.append(0x80 | opcode)
+            header = self._header
+            header[0] = 0x80 | opcode
             payload_len = len(data)
             if payload_len <= 125:
-                header.append(0x80 | payload_len)
+                header[1] = 0x80 | payload_len
+                n = 2
             elif payload_len <= 65535:
-                header.append(0x80 | 126)
-                header.extend(struct.pack("!H", payload_len))
+                header[1] = 0x80 | 126
+                struct.pack_into("!H", header, 2, payload_len)
+                n = 4
             else:
-                header.append(0x80 | 127)
-                header.extend(struct.pack("!Q", payload_len))
-            
-            mask = bytes(random.getrandbits(8) for _ in range(4))
-            header.extend(mask)
-            self.writer.write(header)
-            masked_data = bytearray(payload_len)
-            for i in range(payload_len):
-                masked_data[i] = data[i] ^ mask[i % 4]
-            self.writer.write(masked_data)
+                header[1] = 0x80 | 127
+                struct.pack_into("!Q", header, 2, payload_len)
+                n = 10
+            struct.pack_into("!I", header, n, random.getrandbits(32))
+            if len(self._masked) < payload_len:
+                self._masked = bytearray(payload_len)
+            _mask(data, self._masked, payload_len, self._header_mv[n:n + 4])
+            # write 会复制尚未发出的数据，缓冲区可以立即复用
+            self.writer.write(self._header_mv[:n + 4])
+            self.writer.write(memoryview(self._masked)[:payload_len])
             await self.writer.drain()
         except Exception as e:
             log(f"[WS] Send error: {e}")
@@ -70,6 +198,7 @@ class WebSocket:
             try:
                 res = await self.reader.read(2)
                 if not res or len(res) < 2: break
+                self.last_rx = time.ticks_ms()
                 opcode = res[0] & 0x0F
                 has_mask = res[1] & 0x80
                 length = res[1] & 0x7F
@@ -114,7 +243,7 @@ class WebSocket:
                 await self.writer.wait_closed()
             except: pass
 
-async def connect_ws(url):
+async def connect_ws(url, subprotocol=None):
     log(f"[WS] Connecting to {url}...")
     proto, _, host_port_path = url.split("/", 2)
     if "/" in host_port_path:
@@ -131,8 +260,10 @@ async def connect_ws(url):
     log(f"[WS] Opening connection to {host}:{port}...")
     reader, writer = await asyncio.open_connection(host, port)
     key = binascii.b2a_base64(bytes(random.getrandbits(8) for _ in range(16)))[:-1].decode()
-    header = "GET %s HTTP/1.1\r\nHost: %s\r\nUpgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Key: %s\r\nSec-WebSocket-Version: 13\r\n\r\n" % (path, host, key)
-    writer.write(header.encode())
+    header = "GET %s HTTP/1.1\r\nHost: %s\r\nUpgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Key: %s\r\nSec-WebSocket-Version: 13\r\n" % (path, host, key)
+    if subprotocol:
+        header += "Sec-WebSocket-Protocol: %s\r\n" % subprotocol
+    writer.write((header + "\r\n").encode())
     await writer.drain()
     
     log("[WS] Waiting for handshake response...")
@@ -140,11 +271,290 @@ async def connect_ws(url):
     if not line.startswith(b"HTTP/1.1 101"):
         raise Exception("Handshake failed: " + line.decode())
     
+    accepted = None
     while True:
         line = await reader.readline()
         if line == b"\r\n" or not line: break
-    log("[WS] Handshake successful.")
-    return WebSocket(reader, writer)
+        if line.lower().startswith(b"sec-websocket-protocol:"):
+            accepted = line.split(b":", 1)[1].strip().decode()
+    log(f"[WS] Handshake successful, protocol={accepted or 'json'}.")
+    return WebSocket(reader, writer, accepted)
+
+class CaptureRing:
+    """
+    预分配的上行音频帧：采集协程写入空闲帧，发送协程按顺序取出就绪的帧，
+    两者互不阻塞。每帧头部预留消息头，发送时直接使用帧的 memoryview。
+    """
+    def __init__(self, count=CAPTURE_BUFFERS, frame_bytes=CAPTURE_FRAME_BYTES, offset=0,
+                 overflow=CAPTURE_OVERFLOW):
+        self.offset = offset
+        self.frame_bytes = frame_bytes
+        self.overflow = overflow
+        self.bufs = [bytearray(offset + frame_bytes) for _ in range(count)]
+        self.frames = [memoryview(b) for b in self.bufs]
+        self.payloads = [mv[offset:] for mv in self.frames]
+        self.lens = [0] * count
+        self.free = list(range(count))
+        self.ready = []
+        # DROP_NEWEST 时新采集的数据读入这里后丢弃
+        self.scratch = memoryview(bytearray(frame_bytes))
+        self.event = asyncio.Event()
+        # VAD 静音期间暂存的帧，进入语音时作为开头补发
+        self.held = []
+        self.dropped_frames = 0
+        self.dropped_bytes = 0
+        self.skipped_bytes = 0
+
+    def acquire(self):
+        """取一个空闲帧，积压已满时按策略丢弃，返回帧序号或 None (本帧丢弃)"""
+        if self.free:
+            return self.free.pop()
+        if self.overflow == DROP_NEWEST:
+            return None
+        # 丢弃最旧的音频帧，控制标记保留
+        for k in range(len(self.ready)):
+            i = self.ready[k]
+            if i >= 0:
+                del self.ready[k]
+                self.dropped_frames += 1
+                self.dropped_bytes += self.lens[i]
+                return i
+        return None
+
+    def _fill(self, i, n):
+        self.lens[i] = n
+        if self.offset:
+            struct.pack_into(">BBH", self.bufs[i], 0, (proto.VERSION << 4) | proto.TYPE_AUDIO, 0, n)
+
+    def commit(self, i, n):
+        self._fill(i, n)
+        self.ready.append(i)
+        self.event.set()
+
+    def hold(self, i, n, limit):
+        """静音帧暂存，最多保留 limit 帧，更早的帧不再发送"""
+        self._fill(i, n)
+        self.held.append(i)
+        while len(self.held) > limit:
+            j = self.held.pop(0)
+            self.skipped_bytes += self.lens[j]
+            self.free.append(j)
+
+    def publish_held(self):
+        self.ready.extend(self.held)
+        self.held = []
+        self.event.set()
+
+    def drop_held(self):
+        for j in self.held:
+            self.skipped_bytes += self.lens[j]
+            self.free.append(j)
+        self.held = []
+
+    def control(self, code):
+        """在帧序列中插入控制标记 (CTRL_*)，与音频按顺序发送"""
+        self.ready.append(code)
+        self.event.set()
+
+    def discard(self, n):
+        self.dropped_frames += 1
+        self.dropped_bytes += n
+
+    def frame(self, i):
+        """整帧直接返回预先创建的 memoryview，读取不足一帧时才切片"""
+        n = self.lens[i]
+        if n == self.frame_bytes:
+            return self.frames[i]
+        return self.frames[i][:self.offset + n]
+
+    def release(self, i):
+        self.free.append(i)
+
+
+class EnergyVad:
+    """
+    帧能量 VAD：每帧计算平均幅度与过零次数 (viper)，连续若干帧超过阈值进入语音，
+    语音结束后保持 hangover 时长再进入静音
+    """
+    FRAME_MS = CAPTURE_FRAME_BYTES // MIC_BYTES_PER_MS
+
+    def __init__(self):
+        self.enabled = VAD_ENABLED
+        self.threshold = VAD_THRESHOLD
+        self.zcr_max = VAD_ZCR_MAX
+        self.hangover_frames = VAD_HANGOVER_MS // self.FRAME_MS
+        self.preroll_frames = VAD_PREROLL_MS // self.FRAME_MS
+        self.start_frames = VAD_START_FRAMES
+        self.stats = array("i", [0, 0])
+        self.energy = 0
+        self.crossings = 0
+        self.speaking = False
+        self._run = 0
+        self._hang = 0
+
+    def configure(self, items):
+        """应用 TYPE_CONFIG 中的 CFG_VAD_* 项"""
+        if proto.CFG_VAD_ENABLED in items:
+            self.enabled = bool(items[proto.CFG_VAD_ENABLED])
+        if proto.CFG_VAD_THRESHOLD in items:
+            self.threshold = items[proto.CFG_VAD_THRESHOLD]
+        if proto.CFG_VAD_ZCR_MAX in items:
+            self.zcr_max = items[proto.CFG_VAD_ZCR_MAX]
+        if proto.CFG_VAD_HANGOVER in items:
+            self.hangover_frames = items[proto.CFG_VAD_HANGOVER] // self.FRAME_MS
+        if proto.CFG_VAD_PREROLL in items:
+            preroll = min(items[proto.CFG_VAD_PREROLL], VAD_PREROLL_MAX_MS)
+            self.preroll_frames = preroll // self.FRAME_MS
+        if proto.CFG_VAD_START in items:
+            self.start_frames = max(items[proto.CFG_VAD_START], 1)
+
+    def update(self, buf, n):
+        """
+        处理一帧 16bit PCM
+
+        Returns:
+            本帧是否需要发送 (语音或 hangover 期间)
+        """
+        samples = n >> 1
+        if not samples:
+            return self.speaking
+        _frame_energy(buf, samples, self.stats)
+        self.energy = self.stats[0] // samples
+        self.crossings = self.stats[1]
+        voiced = self.energy >= self.threshold and (not self.zcr_max or self.crossings <= self.zcr_max)
+        if self.speaking:
+            if voiced:
+                self._hang = self.hangover_frames
+            else:
+                self._hang -= 1
+                if self._hang < 0:
+                    self.speaking = False
+                    self._run = 0
+        else:
+            self._run = self._run + 1 if voiced else 0
+            if self._run >= self.start_frames:
+                self.speaking = True
+                self._hang = self.hangover_frames
+        return self.speaking
+
+
+class Telemetry:
+    """
+    设备遥测：周期采样，聚合为定长计数器，每 interval_s 秒通过 TYPE_STATS 发送一条消息
+    计数器按 proto.STAT_* 编号存放在 array 中，上报后清零周期内的统计
+    """
+    def __init__(self, client, interval_s=TELEMETRY_INTERVAL_S, sample_ms=TELEMETRY_SAMPLE_MS):
+        self.client = client
+        self.interval_ms = interval_s * 1000
+        self.sample_ms = sample_ms
+        self.values = array("i", [0] * (proto.STAT_MAX + 1))
+        self.boot = time.ticks_ms()
+        self.reports = 0
+        self._reset()
+
+    def _reset(self):
+        self.heap_min = gc.mem_free()
+        self.queue_max = 0
+        self.backlog_max = 0
+        self.lag_max = 0
+        self.lag_sum = 0
+        self.samples = 0
+        self.gc_count = 0
+        self.gc_time = 0
+        self.last_alloc = gc.mem_alloc()
+        self.last_up = self.client.up_bytes
+        self.last_down = self.client.down_bytes
+        self.last_report = time.ticks_ms()
+
+    def collect(self):
+        """计时的 gc.collect()"""
+        t0 = time.ticks_us()
+        gc.collect()
+        self.gc_time += time.ticks_diff(time.ticks_us(), t0)
+        self.gc_count += 1
+        self.last_alloc = gc.mem_alloc()
+
+    def sample(self, lag_us):
+        free = gc.mem_free()
+        if free < self.heap_min:
+            self.heap_min = free
+        # 已分配内存减少说明期间发生过自动回收
+        alloc = gc.mem_alloc()
+        if alloc < self.last_alloc:
+            self.gc_count += 1
+        self.last_alloc = alloc
+        queue = len(self.client.audio_queue)
+        if queue > self.queue_max:
+            self.queue_max = queue
+        capture = self.client.capture
+        if capture and len(capture.ready) > self.backlog_max:
+            self.backlog_max = len(capture.ready)
+        if lag_us > self.lag_max:
+            self.lag_max = lag_us
+        self.lag_sum += lag_us
+        self.samples += 1
+
+    def rssi(self):
+        try:
+            return network.WLAN(network.STA_IF).status("rssi")
+        except Exception:
+            return 0
+
+    def snapshot(self):
+        """生成本周期的统计并清零"""
+        client = self.client
+        elapsed = max(time.ticks_diff(time.ticks_ms(), self.last_report), 1)
+        capture = client.capture
+        v = self.values
+        v[proto.STAT_FREE_HEAP] = gc.mem_free()
+        v[proto.STAT_UP_BYTES] = client.up_bytes
+        v[proto.STAT_DOWN_BYTES] = client.down_bytes
+        v[proto.STAT_AUDIO_QUEUE] = len(client.audio_queue)
+        v[proto.STAT_STOP_LATENCY] = client.stop_latency_last
+        v[proto.STAT_FREE_HEAP_MIN] = self.heap_min
+        v[proto.STAT_GC_COUNT] = self.gc_count
+        v[proto.STAT_GC_TIME] = self.gc_time
+        v[proto.STAT_QUEUE_MAX] = self.queue_max
+        v[proto.STAT_UNDERRUNS] = client.underruns
+        v[proto.STAT_RSSI] = self.rssi()
+        v[proto.STAT_UP_RATE] = (client.up_bytes - self.last_up) * 1000 // elapsed
+        v[proto.STAT_DOWN_RATE] = (client.down_bytes - self.last_down) * 1000 // elapsed
+        v[proto.STAT_LOOP_LAG_MAX] = self.lag_max
+        v[proto.STAT_LOOP_LAG_AVG] = self.lag_sum // self.samples if self.samples else 0
+        v[proto.STAT_UPTIME] = time.ticks_diff(time.ticks_ms(), self.boot) // 1000
+        v[proto.STAT_INTERVAL] = elapsed
+        v[proto.STAT_MIC_LOST] = client.mic_lost_samples
+        v[proto.STAT_UP_BACKLOG_MAX] = self.backlog_max
+        v[proto.STAT_VAD_SKIPPED] = client.vad_skipped_bytes + (capture.skipped_bytes if capture else 0)
+        self._reset()
+        return v
+
+    async def send(self):
+        ws = self.client.ws
+        v = self.snapshot()
+        if self.client.binary:
+            await ws.send_bytes(proto.encode_kv(proto.TYPE_STATS, ((k, v[k]) for k in range(1, len(v)))))
+        else:
+            await ws.send_text(json.dumps({"type": "stats", "items": {k: v[k] for k in range(1, len(v))}}))
+        self.reports += 1
+
+    async def run(self):
+        """采样事件循环延迟，并按周期上报"""
+        self._reset()
+        sleep_ms = self.sample_ms
+        while self.client.is_running:
+            t0 = time.ticks_us()
+            await asyncio.sleep_ms(sleep_ms)
+            # 实际睡眠时间超出预期的部分即为事件循环延迟
+            lag = time.ticks_diff(time.ticks_us(), t0) - sleep_ms * 1000
+            self.sample(lag if lag > 0 else 0)
+            if time.ticks_diff(time.ticks_ms(), self.last_report) >= self.interval_ms:
+                try:
+                    await self.send()
+                except Exception as e:
+                    log(f"[Telemetry] Send error: {e}")
+                    return
+
 
 class ESP32RealtimeClient:
     """
@@ -156,32 +566,54 @@ class ESP32RealtimeClient:
         self.I2S_SCK_O, self.I2S_WS_O, self.I2S_SD_O = Pin(12), Pin(11), Pin(13)
         self.WIFI_SSID, self.WIFI_PASSWORD = "xxx", "xxx"
         self.SERVER_URL = "ws://192.168.1.15:8765"
+        # 优先协商二进制消息格式，服务器不支持时回退到 JSON 文本帧
+        self.USE_BINARY_PROTOCOL = True
 
         self.is_running = False
         self.ws = None
+        self.binary = False
+        self.remote_config = {}
         self.audio_queue = []
-        self.text_queue = []
         self.display = None
         self.font = None
-        self.display_log_lines = []
-        self.display_log_max_lines = 4
+        self.layout = None
+        self.ticker = None
+        self.scheduler = None
+        # 已写入 I2S 的播放字节数，用于字幕滚动跟随播放进度
+        self.played_bytes = 0
+        # 累计上行 / 下行音频字节与播放欠载次数
+        self.up_bytes = 0
+        self.down_bytes = 0
+        self.underruns = 0
+        # 上行采集帧与累计丢失的麦克风采样数 (发送积压丢弃 + 采集停顿导致 I2S 接收缓冲溢出)
+        self.capture = None
+        self.mic_lost_samples = 0
+        self.vad = EnergyVad()
+        # 之前各连接中因静音未发送的字节 (当前连接的计数在 capture 中)
+        self.vad_skipped_bytes = 0
+        # 估算的播放缓冲耗尽时刻 (ticks_ms)
+        self.play_end = None
+        # 服务器建议的重连等待时间 (ms) 与连续重连失败次数
+        self.retry_after_ms = 0
+        self.reconnect_failures = 0
+        # 服务器心跳超时 (ms)，0 表示服务器不发送心跳、不检测
+        self.link_timeout_ms = 0
+        # 打断统计：收到 stop 到扬声器静音的耗时 (us)
+        self.stop_count = 0
+        self.stop_latency_last = 0
+        self.stop_latency_max = 0
+
+        self.telemetry = Telemetry(self)
 
         self.init_wifi()
         self.init_i2s()
         self.init_display()
 
     def display_log(self, text):
-        if self.display and self.font:
+        if self.layout:
             try:
-                self.display_log_lines.append(text)
-                if len(self.display_log_lines) > self.display_log_max_lines:
-                    self.display_log_lines.pop(0)
-                self.display.fill(0)
-                y = 0
-                for line in self.display_log_lines:
-                    self.font.text(self.display, line, 0, y, show=False, clear=False, auto_wrap=False, line_spacing=0)
-                    y += 16
-                self.display.show()
+                # 只重绘变化的行，只发送变化的页
+                self.layout.log(text)
             except Exception as e:
                 log(f"[Display] Log error: {e}")
 
@@ -190,10 +622,19 @@ class ESP32RealtimeClient:
             i2c = I2C(scl=Pin(1), sda=Pin(2))
             self.display = ssd1306.SSD1306_I2C(128, 64, i2c)
             self.font = ufont.BMFont("text_lite_16px_2312.v3.bmf")
+            self.layout = text_layout.TextLayout(self.display, self.font)
+            self.ticker = text_layout.SubtitleTicker(self.layout)
+            # 滚动进度跟随播放进度
+            self.scheduler = display_scheduler.DisplayScheduler(
+                self.layout, self.ticker, progress=lambda: self.played_bytes // PLAY_BYTES_PER_MS,
+                max_fps=DISPLAY_MAX_FPS, budget_ms=DISPLAY_BUDGET_MS)
         except Exception as e:
             log(f"[Display] Init error: {e}")
             self.display = None
             self.font = None
+            self.layout = None
+            self.ticker = None
+            self.scheduler = None
 
     def init_wifi(self):
         try:
@@ -219,35 +660,142 @@ class ESP32RealtimeClient:
             machine.reset()
 
     def init_i2s(self):
+        self.init_mic()
+        self.init_speaker()
+        log("I2S HW Buffer: 64KB")
+
+    def init_mic(self):
         # 录音 I2S
         self.audio_in = I2S(0, sck=self.I2S_SCK_I, ws=self.I2S_WS_I, sd=self.I2S_SD_I,
-            mode=I2S.RX, bits=16, format=I2S.MONO, rate=16000, ibuf=4096)
+            mode=I2S.RX, bits=16, format=I2S.MONO, rate=16000, ibuf=MIC_IBUF)
+
+    def init_speaker(self):
         # 播放 I2S：申请最大的硬件缓冲区 (64KB)，这相当于在 DMA 层面直接缓冲
         # 这比任何软件 Python 缓冲都要稳定，因为它不受协程调度干扰
         self.audio_out = I2S(1, sck=self.I2S_SCK_O, ws=self.I2S_WS_O, sd=self.I2S_SD_O,
             mode=I2S.TX, bits=16, format=I2S.MONO, rate=24000, ibuf=16384)
-        log("I2S HW Buffer: 64KB")
+
+    def flush_playback(self):
+        """打断：丢弃待播音频并清空 TX DMA 缓冲，录音 I2S 不受影响"""
+        t0 = time.ticks_us()
+        self.audio_queue.clear()
+        if self.scheduler:
+            self.scheduler.clear()
+        # 只重建 TX 外设，DMA 里残留的音频随之丢弃，麦克风采集不中断
+        self.audio_out.deinit()
+        self.init_speaker()
+        self.play_end = None
+        latency = time.ticks_diff(time.ticks_us(), t0)
+        self.stop_count += 1
+        self.stop_latency_last = latency
+        if latency > self.stop_latency_max:
+            self.stop_latency_max = latency
+        log(f"[Play] Flushed in {latency / 1000:.2f} ms (max={self.stop_latency_max / 1000:.2f} ms, n={self.stop_count})")
 
     async def record_task(self):
-        read_buf = bytearray(1024)
+        """采集协程：以 I2S 的节奏把麦克风数据读入空闲帧，不等待网络发送"""
+        # 二进制协议下在帧头部预留消息头，采集数据直接写在头后面，免去拼接
+        # 额外预留 VAD 补发所需的帧
+        ring = self.capture = CaptureRing(count=CAPTURE_BUFFERS + VAD_PREROLL_MAX_MS // EnergyVad.FRAME_MS,
+                                          offset=proto.HEADER_SIZE if self.binary else 0)
+        vad = self.vad
+        vad.speaking = False
+        # 已通知服务器进入静音
+        silent = False
+        sreader = asyncio.StreamReader(self.audio_in)
+        # I2S 接收缓冲能容纳的时长，采集间隔超过它时缓冲已溢出
+        ibuf_ms = MIC_IBUF // MIC_BYTES_PER_MS
+        last = None
+        log("[Record] Task started.")
+        try:
+            while self.is_running:
+                i = ring.acquire()
+                n = await sreader.readinto(ring.payloads[i] if i is not None else ring.scratch)
+                now = time.ticks_ms()
+                if last is not None:
+                    gap = time.ticks_diff(now, last) - ibuf_ms
+                    if gap > 0:
+                        self.mic_lost_samples += gap * MIC_BYTES_PER_MS // 2
+                last = now
+                if not n:
+                    if i is not None:
+                        ring.release(i)
+                    continue
+                if i is None:
+                    ring.discard(n)
+                    self.mic_lost_samples += n // 2
+                    continue
+                before = ring.dropped_bytes
+                if vad.enabled:
+                    if vad.update(ring.payloads[i], n):
+                        if silent:
+                            # 先通知服务器，再补发语音开始前的帧
+                            ring.control(CTRL_SPEECH)
+                            ring.publish_held()
+                            silent = False
+                        ring.commit(i, n)
+                    else:
+                        if not silent:
+                            ring.control(CTRL_SILENCE)
+                            silent = True
+                        ring.hold(i, n, vad.preroll_frames)
+                else:
+                    if silent:
+                        # VAD 被关闭，恢复连续发送
+                        ring.drop_held()
+                        ring.control(CTRL_SPEECH)
+                        silent = False
+                    ring.commit(i, n)
+                if ring.dropped_bytes != before:
+                    self.mic_lost_samples += (ring.dropped_bytes - before) // 2
+        except Exception as e:
+            free_kb = gc.mem_free() // 1024
+            log(f"[Record] Error: {e}, free={free_kb} KB")
+            self.is_running = False
+        finally:
+            # 唤醒发送协程以便退出
+            ring.event.set()
+
+    async def send_vad(self, speech):
+        log(f"[VAD] {'Speech' if speech else 'Silence'}, energy={self.vad.energy}")
+        if self.binary:
+            await self.ws.send_bytes(proto.encode(proto.TYPE_VAD, b"\x01" if speech else b"\x00",
+                                                  proto.FLAG_PRIORITY))
+        else:
+            await self.ws.send_text(json.dumps({"type": "vad", "speech": speech}))
+
+    async def upstream_task(self):
+        """发送协程：按采集顺序发送就绪的帧，发送阻塞时采集继续进行，积压受 CAPTURE_BUFFERS 限制"""
+        while self.capture is None:
+            await asyncio.sleep_ms(10)
+        ring = self.capture
         total_sent = 0
         last_log_sent = 0
-        log("[Record] Task started.")
+        log("[Upstream] Task started.")
         while self.is_running:
             try:
-                n = self.audio_in.readinto(read_buf)
-                if n > 0: 
-                    await self.ws.send_bytes(read_buf[:n])
-                    total_sent += n
-                    # Log every 10KB
-                    if total_sent - last_log_sent >= 10240:
-                        free_kb = gc.mem_free() // 1024
-                        log(f"[Record] Sent {total_sent // 1024} KB, free={free_kb} KB")
-                        last_log_sent = total_sent
-                await asyncio.sleep(0)
+                if not ring.ready:
+                    ring.event.clear()
+                    await ring.event.wait()
+                    continue
+                i = ring.ready.pop(0)
+                if i < 0:
+                    await self.send_vad(i == CTRL_SPEECH)
+                    continue
+                n = ring.lens[i]
+                await self.ws.send_bytes(ring.frame(i))
+                ring.release(i)
+                total_sent += n
+                self.up_bytes += n
+                # Log every 10KB
+                if total_sent - last_log_sent >= 10240:
+                    free_kb = gc.mem_free() // 1024
+                    log(f"[Upstream] Sent {total_sent // 1024} KB, free={free_kb} KB, "
+                        f"dropped={ring.dropped_frames}, mic_lost={self.mic_lost_samples}")
+                    last_log_sent = total_sent
             except Exception as e:
                 free_kb = gc.mem_free() // 1024
-                log(f"[Record] Error: {e}, free={free_kb} KB")
+                log(f"[Upstream] Error: {e}, free={free_kb} KB")
                 self.is_running = False
                 break
 
@@ -258,45 +806,20 @@ class ESP32RealtimeClient:
             async for msg in self.ws:
                 if not self.is_running: break
                 
-                if msg.type == 0x2: # BINARY AUDIO
-                    # 将音频放入队列，不阻塞接收循环
-                    self.audio_queue.append(msg.data)
-                    # 限制队列长度防止内存溢出 (约 2s 的音频)
-                    if len(self.audio_queue) > 40:
-                        self.audio_queue.pop(0)
+                if msg.type == 0x2: # BINARY
+                    if self.binary:
+                        self.handle_binary(msg.data)
+                    # 16bit PCM 帧长度必为偶数，奇数长度的二进制帧是控制帧，无需解析 JSON
+                    elif len(msg.data) & 1:
+                        if msg.data == STOP_FRAME:
+                            log("[Play] Stop frame received!")
+                            self.flush_playback()
+                        continue
+                    else:
+                        self.queue_audio(msg.data)
                 
-                elif msg.type == 0x1: # TEXT
-                    print(f"[WS Text Raw] {msg.data}") # 必须打印！
-                    try:
-                        data = json.loads(msg.data)
-                        # 处理结构化消息
-                        if isinstance(data, dict):
-                            msg_type = data.get("type")
-                            if msg_type == "asr":
-                                print(f"\n[User] {data.get('text')}")
-                                if data.get("text"):
-                                    self.text_queue.append(("asr", data.get("text")))
-                            elif msg_type == "llm":
-                                print(f"\n[Doubao] {data.get('text')}")
-                                if data.get("text"):
-                                    self.text_queue.append(("llm", data.get("text")))
-                            
-                            # 处理打断指令 (兼容合并后的消息)
-                            if data.get("command") == "stop":
-                                log("[Play] Stop command received!")
-                                self.audio_queue.clear()
-                                self.text_queue.clear()
-                                self.audio_out.deinit()
-                                self.init_i2s()
-                        else:
-                            log(f"[Msg JSON] {data}")
-                    except Exception as e:
-                        log(f"[Msg Parse Error] {e}: {msg.data}")
-                        if "stop" in msg.data:
-                            self.audio_queue.clear()
-                            self.text_queue.clear()
-                            self.audio_out.deinit()
-                            self.init_i2s()
+                elif msg.type == 0x1: # TEXT (JSON 回退格式)
+                    self.handle_json(msg.data)
                 else:
                     log(f"[WS Recv Other] Type: {msg.type}")
                 
@@ -312,6 +835,118 @@ class ESP32RealtimeClient:
             log(f"[Recv] Task finished, ws.closed={self.ws.closed if self.ws else None}")
             self.is_running = False
 
+    def queue_audio(self, data):
+        # 将音频放入队列，不阻塞接收循环
+        self.down_bytes += len(data)
+        self.audio_queue.append(data)
+        # 限制队列长度防止内存溢出 (约 2s 的音频)
+        if len(self.audio_queue) > 40:
+            self.audio_queue.pop(0)
+
+    def queue_text(self, text_type, text):
+        # 由刷新协程合并后渲染，不在接收循环中操作屏幕
+        if text and self.scheduler:
+            if text_type == "asr":
+                self.scheduler.submit(display_scheduler.KIND_TEXT, "U:" + text)
+            else:
+                # 长回复滚动显示
+                self.scheduler.submit(display_scheduler.KIND_TICKER, "D:" + text)
+
+    def handle_binary(self, data):
+        """处理二进制协议消息"""
+        try:
+            msg_type, flags, payload = proto.decode(data)
+        except ValueError as e:
+            log(f"[Msg Decode Error] {e}")
+            return
+        if msg_type == proto.TYPE_AUDIO:
+            self.queue_audio(payload)
+        elif msg_type == proto.TYPE_STOP:
+            log("[Play] Stop frame received!")
+            self.flush_playback()
+        elif msg_type == proto.TYPE_ASR:
+            self.queue_text("asr", str(payload, "utf-8"))
+        elif msg_type == proto.TYPE_LLM:
+            self.queue_text("llm", str(payload, "utf-8"))
+        elif msg_type == proto.TYPE_CONFIG:
+            self.apply_config(proto.decode_kv(payload))
+        elif msg_type == proto.TYPE_GLYPHS:
+            if self.font:
+                self.font.load_glyph_pack(payload)
+        elif msg_type == proto.TYPE_BUSY:
+            self.on_busy(struct.unpack_from(">I", payload)[0])
+        else:
+            log(f"[Msg] Unknown type: {msg_type}")
+
+    def handle_json(self, text):
+        """处理 JSON 文本消息 (未协商二进制协议时的回退格式)"""
+        print(f"[WS Text Raw] {text}") # 必须打印！
+        try:
+            data = json.loads(text)
+            # 处理结构化消息
+            if isinstance(data, dict):
+                msg_type = data.get("type")
+                if msg_type == "asr":
+                    print(f"\n[User] {data.get('text')}")
+                    self.queue_text("asr", data.get("text"))
+                elif msg_type == "llm":
+                    print(f"\n[Doubao] {data.get('text')}")
+                    self.queue_text("llm", data.get("text"))
+                elif msg_type == "config":
+                    self.apply_config({int(k): v for k, v in data.get("items", {}).items()})
+                elif msg_type == "busy":
+                    self.on_busy(int(data.get("retry_after_ms", 0)))
+                
+                # 处理打断指令 (兼容合并后的消息)
+                if data.get("command") == "stop":
+                    log("[Play] Stop command received!")
+                    self.flush_playback()
+            else:
+                log(f"[Msg JSON] {data}")
+        except Exception as e:
+            log(f"[Msg Parse Error] {e}: {text}")
+            if "stop" in text:
+                self.flush_playback()
+
+    def on_busy(self, retry_after_ms):
+        """服务器繁忙，连接将被关闭，按建议时间后重连"""
+        log(f"[System] Server busy, retry after {retry_after_ms} ms")
+        self.display_log("Server busy")
+        self.retry_after_ms = retry_after_ms
+        self.is_running = False
+
+    def reconnect_delay_ms(self):
+        """下次重连前的等待时间"""
+        if self.retry_after_ms:
+            base = self.retry_after_ms
+            self.retry_after_ms = 0
+            # 建议时间 + 0~50% 抖动
+            return base + random.getrandbits(16) * (base // 2) // 65536
+        backoff = min(RECONNECT_BASE_MS << min(self.reconnect_failures, 5), RECONNECT_MAX_MS)
+        self.reconnect_failures += 1
+        # backoff 的 50%~100%
+        return backoff // 2 + random.getrandbits(16) * (backoff // 2) // 65536
+
+    def apply_config(self, items):
+        """服务器下发的运行时配置 {key: int}"""
+        # 服务器准入并建立云端会话后才会下发配置，重连退避从头开始
+        self.reconnect_failures = 0
+        self.remote_config.update(items)
+        self.vad.configure(items)
+        if proto.CFG_LINK_TIMEOUT in items:
+            self.link_timeout_ms = max(items[proto.CFG_LINK_TIMEOUT], 0)
+        log(f"[Config] {items}")
+
+    def track_underrun(self, n):
+        """根据已写入的音频估算播放缓冲耗尽时刻，缓冲耗尽后不久又有音频到达即为一次欠载"""
+        now = time.ticks_ms()
+        end = self.play_end
+        if end is None or time.ticks_diff(now, end) > 0:
+            if end is not None and time.ticks_diff(now, end) < UNDERRUN_WINDOW_MS:
+                self.underruns += 1
+            end = now
+        self.play_end = time.ticks_add(end, n // PLAY_BYTES_PER_MS)
+
     async def play_task(self):
         """仅负责从队列取数据并喂给 I2S 硬件"""
         log("[Play] Task started.")
@@ -321,11 +956,13 @@ class ESP32RealtimeClient:
             try:
                 if self.audio_queue:
                     data = self.audio_queue.pop(0)
+                    self.track_underrun(len(data))
                     # write 会在硬件缓冲区满时自动阻塞
                     # 注意：在 MicroPython 中，如果 write 阻塞，它会阻塞整个 asyncio 循环
                     # 所以我们需要确保在写入前后都有 yield 机会
                     self.audio_out.write(data)
                     total_played += len(data)
+                    self.played_bytes += len(data)
                     
                     if total_played - last_log_played >= 24000:
                         free_kb = gc.mem_free() // 1024
@@ -339,19 +976,32 @@ class ESP32RealtimeClient:
                 log(f"[Play] Error: {e}, free={free_kb} KB")
                 break
 
+    async def link_task(self):
+        """服务器失联检测：超过 link_timeout_ms 未收到任何数据 (服务器每隔几秒发送 ping) 则断开重连"""
+        while self.is_running:
+            await asyncio.sleep_ms(LINK_CHECK_MS)
+            ws = self.ws
+            if not self.link_timeout_ms or ws is None:
+                continue
+            idle = time.ticks_diff(time.ticks_ms(), ws.last_rx)
+            if idle > self.link_timeout_ms:
+                log(f"[System] No data from server for {idle} ms, reconnecting")
+                self.display_log("Link lost")
+                self.is_running = False
+                # 结束 gather，由 start 关闭连接，阻塞在读取上的接收协程随之退出
+                raise OSError("link timeout")
+
     async def display_task(self):
         log("[Display] Task started.")
+        if not self.scheduler:
+            return
         while self.is_running:
             try:
-                if self.display and self.font and self.text_queue:
-                    text_type, text = self.text_queue.pop(0)
-                    prefix = "U:" if text_type == "asr" else "D:"
-                    content = prefix + text
-                    self.font.text(self.display, content, 0, 0, show=True, clear=True, auto_wrap=True, line_spacing=8)
-                await asyncio.sleep(0.1)
+                await self.scheduler.run(lambda: self.is_running)
             except Exception as e:
                 log(f"[Display] Error: {e}")
                 await asyncio.sleep(0.5)
+        log(f"[Display] Timing: {self.scheduler.stats()}")
 
     async def start(self):
         while True:
@@ -359,29 +1009,40 @@ class ESP32RealtimeClient:
             try:
                 self.init_wifi()
                 self.display_log("Connecting server...")
-                ws = await connect_ws(self.SERVER_URL)
+                ws = await connect_ws(self.SERVER_URL, proto.SUBPROTOCOL if self.USE_BINARY_PROTOCOL else None)
                 log("[System] Connected to server.")
                 self.display_log("Server connected")
                 self.ws = ws
+                self.binary = ws.subprotocol == proto.SUBPROTOCOL
                 self.is_running = True
+                self.link_timeout_ms = 0
                 self.audio_queue.clear()
-                self.text_queue.clear()
-                # 运行三个核心任务：录音、接收、播放
+                if self.scheduler:
+                    self.scheduler.clear()
+                # 上一连接的静音计数并入累计值，STAT_VAD_SKIPPED 在重连后保持累计
+                if self.capture:
+                    self.vad_skipped_bytes += self.capture.skipped_bytes
+                self.capture = None
+                # 运行核心任务：录音、上行发送、接收、播放、显示、遥测、失联检测
                 await asyncio.gather(
-                    self.record_task(), 
+                    self.record_task(),
+                    self.upstream_task(),
                     self.recv_task(),
                     self.play_task(),
-                    self.display_task()
+                    self.display_task(),
+                    self.telemetry.run(),
+                    self.link_task()
                 )
             except Exception as e:
                 log(f"[System] Connection error: {e}")
-                self.is_running = False
-                if self.ws:
-                    await self.ws.close()
-                    self.ws = None
-                log("[System] Retrying in 3 seconds...")
-                await asyncio.sleep(3)
-                gc.collect()
+            self.is_running = False
+            if self.ws:
+                await self.ws.close()
+                self.ws = None
+            delay = self.reconnect_delay_ms()
+            log(f"[System] Retrying in {delay} ms...")
+            await asyncio.sleep_ms(delay)
+            self.telemetry.collect()
 
 if __name__ == "__main__":
     asyncio.run(ESP32RealtimeClient().start())
@@ -0,0 +1,124 @@
+# 字形缩放 (MONO_HLSB，最近邻)
+#
+# 每对 (原字号, 新字号) 只计算一次整数查找表: 新坐标 i -> 原坐标 i * old // new，
+# 并预先拆成 原字节下标 / 位掩码，缩放时不再做浮点除法。
+# 放大时相邻的目标行常常来自同一源行，直接复制上一行。
+# MicroPython 上优先使用 viper 实现，PC 端或不支持 viper 的固件回退到纯 Python 实现。
+
+_tables = {}
+
+
+def scale_table(old_size: int, new_size: int):
+    """
+    获取查找表
+
+    Returns:
+        (rows, col_byte, col_mask)
+        rows: 每个目标行对应的源行
+        col_byte: 每个目标列在源行内的字节下标
+        col_mask: 每个目标列在源字节内的位掩码
+    """
+    key = (old_size, new_size)
+    table = _tables.get(key)
+    if table is None:
+        rows = bytearray(new_size)
+        col_byte = bytearray(new_size)
+        col_mask = bytearray(new_size)
+        for i in range(new_size):
+            src = i * old_size // new_size
+            rows[i] = src
+            col_byte[i] = src >> 3
+            col_mask[i] = 0x80 >> (src & 7)
+        table = (rows, col_byte, col_mask)
+        _tables[key] = table
+    return table
+
+
+def _scale_py(src, dst, rows, col_byte, col_mask, new_size, src_stride, dst_stride):
+    prev = -1
+    for r in range(new_size):
+        sr = rows[r]
+        d = r * dst_stride
+        if sr == prev:
+            dst[d:d + dst_stride] = dst[d - dst_stride:d]
+            continue
+        prev = sr
+        s = sr * src_stride
+        byte = 0
+        for c in range(new_size):
+            if src[s + col_byte[c]] & col_mask[c]:
+                byte |= 0x80 >> (c & 7)
+            if c & 7 == 7:
+                dst[d] = byte
+                d += 1
+                byte = 0
+        if new_size & 7:
+            dst[d] = byte
+
+
+_scale = _scale_py
+try:
+    import micropython
+
+    @micropython.viper
+    def _scale_viper(src: ptr8, dst: ptr8, rows: ptr8, col_byte: ptr8, col_mask: ptr8,
+                     new_size: int, src_stride: int, dst_stride: int):
+        prev = -1
+        for r in range(new_size):
+            sr = int(rows[r])
+            d = r * dst_stride
+            if sr == prev:
+                for i in range(dst_stride):
+                    dst[d + i] = dst[d - dst_stride + i]
+                continue
+            prev = sr
+            s = sr * src_stride
+            for c in range(new_size):
+                if int(src[s + int(col_byte[c])]) & int(col_mask[c]):
+                    i = d + (c >> 3)
+                    dst[i] = int(dst[i]) | (0x80 >> (c & 7))
+
+    _scale = _scale_viper
+except (ImportError, AttributeError, NameError, SyntaxError):
+    pass
+
+
+def scale_hlsb(data, old_size: int, new_size: int) -> bytearray:
+    """
+    缩放方形 MONO_HLSB 字形
+
+    Args:
+        data: 源点阵，old_size * old_size，按行排列
+        old_size: 原字号
+        new_size: 新字号
+
+    Returns:
+        新点阵，每行 (new_size + 7) // 8 字节
+    """
+    dst_stride = (new_size + 7) >> 3
+    dst = bytearray(dst_stride * new_size)
+    rows, col_byte, col_mask = scale_table(old_size, new_size)
+    _scale(data, dst, rows, col_byte, col_mask, new_size, (old_size + 7) >> 3, dst_stride)
+    return dst
+
+
+def hlsb_to_rgb565(data, size: int, palette) -> bytearray:
+    """
+    将方形 MONO_HLSB 点阵展开为 RGB565 像素
+
+    Args:
+        data: 点阵，每行 (size + 7) // 8 字节
+        size: 边长
+        palette: [[背景色低字节, 高字节], [前景色低字节, 高字节]]
+    """
+    bg = bytes(palette[0])
+    fg = bytes(palette[1])
+    stride = (size + 7) >> 3
+    out = bytearray(size * size * 2)
+    i = 0
+    for r in range(size):
+        s = r * stride
+        for c in range(size):
+            out[i:i + 2] = fg if data[s + (c >> 3)] & (0x80 >> (c & 7)) else bg
+            i += 2
+    return out
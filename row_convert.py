@@ -0,0 +1,118 @@
+# 图像行转换
+#
+# 一次读入一整行 24 位像素，单遍转换为 RGB565 (大端，与 EasyDisplay 原逐像素写法一致)
+# 或 MONO_HLSB 阈值位图，然后整行 blit / 写屏。
+# MicroPython 上使用 viper 实现，PC 端或不支持 viper 的固件回退到纯 Python 实现。
+
+ORDER_RGB = 0  # PPM (P6)
+ORDER_BGR = 1  # BMP
+
+# 灰度阈值：int((r + g + b) / 3) >= 127 等价于 r + g + b >= 381
+MONO_THRESHOLD = 381
+
+
+def _rgb565_row_py(src, dst, width, order, invert):
+    ri = 2 if order else 0
+    bi = 0 if order else 2
+    j = 0
+    for s in range(0, width * 3, 3):
+        r = src[s + ri]
+        g = src[s + 1]
+        b = src[s + bi]
+        if invert:
+            r = 255 - r
+            g = 255 - g
+            b = 255 - b
+        dst[j] = (r & 0xf8) | (g >> 5)
+        dst[j + 1] = ((g & 0x1c) << 3) | (b >> 3)
+        j += 2
+
+
+def _mono_row_py(src, dst, width, invert):
+    # 整行批量处理: 按通道步进切片逐像素求和得到 0/1 字节串，再把 8 个位平面当作大整数移位合并
+    n = (width + 7) >> 3
+    row = bytes(src[:width * 3])
+    channels = zip(row[0::3], row[1::3], row[2::3])
+    if invert:
+        # 765 - v >= MONO_THRESHOLD 等价于 v <= 765 - MONO_THRESHOLD
+        bits = bytes([r + g + b <= 765 - MONO_THRESHOLD for r, g, b in channels])
+    else:
+        bits = bytes([r + g + b >= MONO_THRESHOLD for r, g, b in channels])
+    bits += bytes(n * 8 - width)
+    packed = 0
+    for k in range(8):
+        packed |= int.from_bytes(bits[k::8], 'big') << (7 - k)
+    dst[:n] = packed.to_bytes(n, 'big')
+
+
+_rgb565_row = _rgb565_row_py
+_mono_row = _mono_row_py
+try:
+    import micropython
+
+    @micropython.viper
+    def _rgb565_row_viper(src: ptr8, dst: ptr8, width: int, order: int, invert: int):
+        ri = 0
+        bi = 2
+        if order:
+            ri = 2
+            bi = 0
+        j = 0
+        s = 0
+        for _ in range(width):
+            r = int(src[s + ri])
+            g = int(src[s + 1])
+            b = int(src[s + bi])
+            if invert:
+                r = 255 - r
+                g = 255 - g
+                b = 255 - b
+            dst[j] = (r & 0xf8) | (g >> 5)
+            dst[j + 1] = ((g & 0x1c) << 3) | (b >> 3)
+            j += 2
+            s += 3
+
+    @micropython.viper
+    def _mono_row_viper(src: ptr8, dst: ptr8, width: int, invert: int):
+        for i in range((width + 7) >> 3):
+            dst[i] = 0
+        s = 0
+        for i in range(width):
+            v = int(src[s]) + int(src[s + 1]) + int(src[s + 2])
+            if invert:
+                v = 765 - v
+            if v >= 381:
+                dst[i >> 3] = int(dst[i >> 3]) | (0x80 >> (i & 7))
+            s += 3
+
+    _rgb565_row = _rgb565_row_viper
+    _mono_row = _mono_row_viper
+except (ImportError, AttributeError, NameError, SyntaxError):
+    pass
+
+
+def rgb888_to_rgb565(src, dst, width: int, order: int = ORDER_RGB, invert: bool = False):
+    """
+    转换一行像素为 RGB565 (大端)
+
+    Args:
+        src: 源行，width * 3 字节
+        dst: 目标行，width * 2 字节
+        width: 像素数
+        order: ORDER_RGB / ORDER_BGR
+        invert: 颜色反转
+    """
+    _rgb565_row(src, dst, width, order, 1 if invert else 0)
+
+
+def rgb888_to_mono(src, dst, width: int, invert: bool = False):
+    """
+    按灰度阈值转换一行像素为 MONO_HLSB 位图，亮像素为 1
+
+    Args:
+        src: 源行，width * 3 字节 (RGB 或 BGR 均可，灰度与通道顺序无关)
+        dst: 目标行，(width + 7) // 8 字节
+        width: 像素数
+        invert: 颜色反转
+    """
+    _mono_row(src, dst, width, 1 if invert else 0)
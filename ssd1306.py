@@ -92,7 +92,8 @@ class SSD1306(framebuf.FrameBuffer):
         self.write_cmd(SET_COM_OUT_DIR | ((rotate & 1) << 3))
         self.write_cmd(SET_SEG_REMAP | (rotate & 1))
 
-    def show(self):
+    def show(self, pages=None):
+        # pages: only send these page rows (8 pixels each); None sends the whole buffer
         x0 = 0
         x1 = self.width - 1
         if self.width != 128:
@@ -100,13 +101,33 @@ class SSD1306(framebuf.FrameBuffer):
             col_offset = (128 - self.width) // 2
             x0 += col_offset
             x1 += col_offset
+        if pages is None:
+            self._show_pages(x0, x1, 0, self.pages - 1)
+            return
+        # group sorted pages into contiguous runs, one address window per run
+        start = prev = None
+        for page in sorted(pages):
+            if start is None:
+                start = prev = page
+            elif page == prev + 1:
+                prev = page
+            elif page != prev:
+                self._show_pages(x0, x1, start, prev)
+                start = prev = page
+        if start is not None:
+            self._show_pages(x0, x1, start, prev)
+
+    def _show_pages(self, x0, x1, p0, p1):
         self.write_cmd(SET_COL_ADDR)
         self.write_cmd(x0)
         self.write_cmd(x1)
         self.write_cmd(SET_PAGE_ADDR)
-        self.write_cmd(0)
-        self.write_cmd(self.pages - 1)
-        self.write_data(self.buffer)
+        self.write_cmd(p0)
+        self.write_cmd(p1)
+        if p0 == 0 and p1 == self.pages - 1:
+            self.write_data(self.buffer)
+        else:
+            self.write_data(memoryview(self.buffer)[p0 * self.width:(p1 + 1) * self.width])
 
     def clear(self):
         self.fill(0)
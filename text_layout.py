@@ -0,0 +1,271 @@
+# 行式文本排版与增量刷新
+#
+# 文本只在内容变化时按宽度折行一次 (中文逐字断行，英文尽量按单词断行)，
+# 屏幕按行记录当前显示内容，更新时只重绘内容变化的行，
+# 并只把这些行所在的 SSD1306 页 (8 像素高) 通过 show(pages=...) 发送出去。
+import framebuf
+
+
+def char_width(char, font_size, half_char=True):
+    if ord(char) < 128 and half_char:
+        return font_size // 2
+    return font_size
+
+
+def wrap(text, width, font_size, half_char=True):
+    """
+    按像素宽度折行
+
+    Args:
+        text: 文本，'\\n' 强制换行
+        width: 行宽 (像素)
+        font_size: 字号
+        half_char: 半宽显示 ASCII 字符
+
+    Returns:
+        行列表
+    """
+    lines = []
+    for para in text.split("\n"):
+        line = ""
+        line_w = 0
+        # 最近一个可断行位置 (空格或中文字符之后) 在 line 中的下标
+        brk = -1
+        for char in para:
+            if ord(char) < 16:
+                continue
+            w = char_width(char, font_size, half_char)
+            if line_w + w > width and line:
+                if ord(char) < 128 and char != " " and brk > 0:
+                    # 英文单词不拆开，把断行点之后的部分移到下一行
+                    lines.append(line[:brk].rstrip(" "))
+                    line = line[brk:]
+                    line_w = sum(char_width(c, font_size, half_char) for c in line)
+                    if line_w + w > width:
+                        lines.append(line)
+                        line = ""
+                        line_w = 0
+                else:
+                    lines.append(line.rstrip(" "))
+                    line = ""
+                    line_w = 0
+                brk = -1
+                if char == " " and not line:
+                    continue
+            line += char
+            line_w += w
+            if char == " " or ord(char) >= 128:
+                brk = len(line)
+        lines.append(line)
+    return lines
+
+
+class TextLayout:
+    def __init__(self, display, font, font_size=None, line_spacing=0, half_char=True, prefixes=("U:", "D:")):
+        """
+        Args:
+            display: 显示对象 (SSD1306)
+            font: ufont.BMFont 实例
+            font_size: 字号，默认使用字体文件字号
+            line_spacing: 行间距
+            half_char: 半宽显示 ASCII 字符
+            prefixes: 常用的行首前缀，使用缓存的字幕条显示
+        """
+        self.display = display
+        self.font = font
+        self.font_size = font_size or font.font_size
+        self.line_height = self.font_size + line_spacing
+        self.half_char = half_char
+        self.prefixes = prefixes
+        self.rows = max(display.height // self.line_height, 1)
+        # 每一行当前显示的内容
+        self.screen = [""] * self.rows
+        self.history = []
+        self._dirty = set()
+        self._partial = True
+        # True 时 flush 只记录变化的页，由 DisplayScheduler 分块发送
+        self.deferred = False
+
+    def set_lines(self, lines, cache=False):
+        """
+        显示若干行，只重绘内容变化的行
+
+        Args:
+            lines: 行列表
+            cache: 整行使用文本缓存 (适合反复出现的状态提示)
+        """
+        dp = self.display
+        for row in range(self.rows):
+            line = lines[row] if row < len(lines) else ""
+            if line == self.screen[row]:
+                continue
+            y = row * self.line_height
+            dp.fill_rect(0, y, dp.width, self.line_height, 0)
+            if line:
+                self._draw_line(line, y, cache)
+            self.screen[row] = line
+            for page in range(y >> 3, min((y + self.line_height - 1) >> 3, (dp.height >> 3) - 1) + 1):
+                self._dirty.add(page)
+
+    def _draw_line(self, line, y, cache):
+        font = self.font
+        if cache:
+            font.blit_text(self.display, line, 0, y, self.font_size, self.half_char)
+            return
+        x = 0
+        for prefix in self.prefixes:
+            if line.startswith(prefix):
+                font.blit_text(self.display, prefix, 0, y, self.font_size, self.half_char)
+                x = sum(char_width(c, self.font_size, self.half_char) for c in prefix)
+                line = line[len(prefix):]
+                break
+        if line:
+            font.text(self.display, line, x, y, font_size=self.font_size, half_char=self.half_char,
+                      show=False, clear=False, auto_wrap=False)
+
+    def show_text(self, text):
+        """折行后从第一行开始显示，超出屏幕的行被丢弃"""
+        self.set_lines(wrap(text, self.display.width, self.font_size, self.half_char))
+        self.flush()
+
+    def log(self, text):
+        """滚动日志：追加一行，只保留最近的若干行"""
+        self.history.append(text)
+        if len(self.history) > self.rows:
+            self.history.pop(0)
+        self.set_lines(self.history, cache=True)
+        self.flush()
+
+    def invalidate(self):
+        """屏幕被其他代码改写后调用，下次更新时全部重绘"""
+        self.screen = [None] * self.rows
+
+    def mark_pages(self, pages):
+        """记录被其他代码改写的页"""
+        for page in pages:
+            self._dirty.add(page)
+
+    def take_dirty(self):
+        """取出并清空变化的页"""
+        pages = sorted(self._dirty)
+        self._dirty = set()
+        return pages
+
+    def flush(self):
+        """把变化的页发送到屏幕"""
+        if self.deferred or not self._dirty:
+            return
+        self.show_pages(self.take_dirty())
+
+    def show_pages(self, pages):
+        if self._partial:
+            try:
+                self.display.show(pages=pages)
+                return
+            except TypeError:
+                # 驱动不支持局部刷新
+                self._partial = False
+        self.display.show()
+
+
+class _Strip(framebuf.FrameBuffer):
+    """离屏字幕条，供 BMFont.text 绘制"""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.buffer = bytearray(((height + 7) >> 3) * width)
+        super().__init__(self.buffer, width, height, framebuf.MONO_VLSB)
+
+
+class SubtitleTicker:
+    def __init__(self, layout, top_row=0, ms_per_char=220, max_step=2, max_lines=24):
+        """
+        长字幕滚动显示：整段回复预先渲染到离屏字幕条，滚动时只把字幕条对应区域 blit 到屏幕，
+        不再逐字重新渲染，并只发送滚动区域所在的页。滚动位置跟随 TTS 播放进度。
+
+        Args:
+            layout: TextLayout 实例
+            top_row: 滚动区域起始行，上方的行保持不变
+            ms_per_char: 估算的 TTS 每个字的播放时长 (毫秒)
+            max_step: 每帧最多滚动的像素数
+            max_lines: 字幕条最多保留的行数，限制内存占用
+        """
+        self.layout = layout
+        self.ms_per_char = ms_per_char
+        self.max_step = max_step
+        self.max_lines = max_lines
+        dp = layout.display
+        self.top = top_row * layout.line_height
+        # 滚动区域必须按页对齐，才能直接使用显示缓冲区的切片作为 FrameBuffer
+        self.top -= self.top & 7
+        self.height = dp.height - self.top
+        self.pages = list(range(self.top >> 3, dp.height >> 3))
+        self.view = framebuf.FrameBuffer(memoryview(dp.buffer)[(self.top >> 3) * dp.width:], dp.width,
+                                         self.height, framebuf.MONO_VLSB)
+        self.strip = None
+        self.offset = 0
+        self.duration = 0
+        self.active = False
+
+    def start(self, text):
+        """
+        开始显示一段字幕，能一屏显示完时直接静态显示
+
+        Returns:
+            True 表示需要滚动，随后应周期调用 update()
+        """
+        layout = self.layout
+        dp = layout.display
+        lines = wrap(text, dp.width, layout.font_size, layout.half_char)[:self.max_lines]
+        self.strip = None
+        self.active = False
+        if len(lines) * layout.line_height <= self.height:
+            layout.show_text(text)
+            return False
+        strip = _Strip(dp.width, len(lines) * layout.line_height)
+        y = 0
+        for line in lines:
+            if line:
+                layout.font.text(strip, line, 0, y, font_size=layout.font_size, half_char=layout.half_char,
+                                 show=False, clear=False, auto_wrap=False)
+            y += layout.line_height
+        self.strip = strip
+        self.offset = 0
+        self.duration = len(text) * self.ms_per_char
+        self.active = True
+        # 屏幕内容由字幕条接管，之后 TextLayout 需要全部重绘
+        layout.invalidate()
+        self._draw()
+        return True
+
+    def update(self, elapsed_ms):
+        """
+        按播放进度滚动
+
+        Args:
+            elapsed_ms: 本段字幕对应的音频已播放时长
+
+        Returns:
+            是否仍在滚动
+        """
+        if not self.active:
+            return False
+        span = self.strip.height - self.height
+        target = span * min(elapsed_ms, self.duration) // max(self.duration, 1)
+        if target > self.offset:
+            self.offset = min(target, self.offset + self.max_step)
+            self._draw()
+        if self.offset >= span:
+            self.active = False
+        return self.active
+
+    def stop(self):
+        self.active = False
+        self.strip = None
+
+    def _draw(self):
+        # 字幕条总是覆盖整个滚动区域，blit 即可覆盖旧内容
+        self.view.blit(self.strip, 0, -self.offset)
+        self.layout.mark_pages(self.pages)
+        self.layout.flush()
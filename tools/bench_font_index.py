@@ -0,0 +1,51 @@
+"""
+BMF 码位索引基准测试 (PC 端)
+
+比较 ram / bucket / disk 三种索引方式的每秒查找次数和内存占用，并校验结果一致。
+
+    python tools/bench_font_index.py [--font text_lite_16px_2312.v3.bmf] [--lookups 20000] [--bucket 32]
+"""
+import argparse
+import os
+import random
+import struct
+import time
+
+import host_shim
+from bmf_index import BMFIndex, INDEX_MODES
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BMF code point index benchmark")
+    parser.add_argument("--font", default=os.path.join(host_shim.ROOT, "text_lite_16px_2312.v3.bmf"))
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--bucket", type=int, default=32, help="bucket size for bucket mode")
+    args = parser.parse_args()
+
+    with open(args.font, "rb") as f:
+        head = f.read(16)
+        start_bitmap = struct.unpack(">I", b"\x00" + head[4:7])[0]
+        table = f.read(start_bitmap - 16)
+    codes = struct.unpack(">%dH" % (len(table) // 2), table)
+    # 大部分查找命中字库，少量为字库外字符
+    rng = random.Random(0)
+    queries = [rng.choice(codes) if rng.random() < 0.9 else rng.randrange(0x10000) for _ in range(args.lookups)]
+
+    expected = None
+    for mode in INDEX_MODES:
+        with open(args.font, "rb") as f:
+            t = time.perf_counter()
+            index = BMFIndex(f, start_bitmap, mode, args.bucket)
+            load_ms = (time.perf_counter() - t) * 1000
+            t = time.perf_counter()
+            results = [index.find(q) for q in queries]
+            elapsed = time.perf_counter() - t
+        if expected is None:
+            expected = results
+        status = "ok" if results == expected else "MISMATCH"
+        print(f"{mode:6s}: {len(queries) / elapsed:10.0f} lookups/s  load={load_ms:6.2f} ms  "
+              f"ram={index.memory():5d} B  {status}")
+
+
+if __name__ == "__main__":
+    main()
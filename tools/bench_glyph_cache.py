@@ -0,0 +1,51 @@
+"""
+字形缓存基准测试 (PC 端)
+
+模拟字幕重绘：反复获取最近几条中文字幕的点阵，比较关闭/开启字形缓存的耗时与命中率。
+
+    python tools/bench_glyph_cache.py [--font text_lite_16px_2312.v3.bmf] [--rounds 200] [--cache 4096]
+"""
+import argparse
+import time
+
+import host_shim
+import ufont
+
+SUBTITLES = [
+    "U:你好，豆包",
+    "D:你好呀！今天过得怎么样？有什么我可以帮你的吗？",
+    "U:北京今天天气怎么样",
+    "D:今天北京整体以晴到多云为主，午后可能会有分散性雷阵雨，出门记得带伞哦。",
+]
+
+
+def run(font_file, rounds, cache_size):
+    font = ufont.BMFont(font_file, cache_size=cache_size)
+    chars = 0
+    t = time.perf_counter()
+    for _ in range(rounds):
+        for line in SUBTITLES:
+            for char in line:
+                font.get_bitmap(char)
+            chars += len(line)
+    elapsed = time.perf_counter() - t
+    return elapsed / chars * 1e6, font.cache_info()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BMFont glyph cache benchmark")
+    parser.add_argument("--font", default=host_shim.os.path.join(host_shim.ROOT, "text_lite_16px_2312.v3.bmf"))
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--cache", type=int, default=4096, help="cache budget in bytes")
+    args = parser.parse_args()
+
+    base, _ = run(args.font, args.rounds, 0)
+    cached, info = run(args.font, args.rounds, args.cache)
+    hit_rate = info["hits"] / max(info["hits"] + info["misses"], 1)
+    print(f"no cache : {base:8.2f} us/char")
+    print(f"cache    : {cached:8.2f} us/char  ({base / cached:.1f}x)")
+    print(f"hit rate : {hit_rate:.1%}  glyphs={info['glyphs']}  bytes={info['bytes']}/{info['budget']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+字形缩放基准测试 (PC 端)
+
+比较原始逐像素浮点缩放与查找表缩放 (glyph_scale.scale_hlsb) 的耗时，并校验输出一致。
+PC 端没有 viper，测得的是纯 Python 回退实现的加速比。
+
+    python tools/bench_glyph_scale.py [--font text_lite_16px_2312.v3.bmf] [--rounds 20]
+"""
+import argparse
+import os
+import time
+
+import host_shim
+import ufont
+from glyph_scale import scale_hlsb
+
+TEXT = "今天北京整体以晴到多云为主，Hello 123"
+
+
+def reference(byte_data, new_size, old_size):
+    """原 BMFont._HLSB_font_size 实现"""
+    _temp = bytearray(new_size * ((new_size >> 3) + 1))
+    _new_index = -1
+    for _col in range(new_size):
+        for _row in range(new_size):
+            if (_row % 8) == 0:
+                _new_index += 1
+            _old_index = int(_col / (new_size / old_size)) * old_size + int(_row / (new_size / old_size))
+            _temp[_new_index] = _temp[_new_index] | (
+                    (byte_data[_old_index >> 3] >> (7 - _old_index % 8) & 1) << (7 - _row % 8))
+    return _temp
+
+
+def main():
+    parser = argparse.ArgumentParser(description="glyph scaling benchmark")
+    parser.add_argument("--font", default=os.path.join(host_shim.ROOT, "text_lite_16px_2312.v3.bmf"))
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    font = ufont.BMFont(args.font, cache_size=0)
+    glyphs = [font.get_bitmap(c) for c in TEXT]
+    old = font.font_size
+    for new in (24, 32):
+        stride = (new + 7) >> 3
+        ok = all(reference(g, new, old)[:stride * new] == scale_hlsb(g, old, new) for g in glyphs)
+        t = time.perf_counter()
+        for _ in range(args.rounds):
+            for g in glyphs:
+                reference(g, new, old)
+        ref = (time.perf_counter() - t) / (args.rounds * len(glyphs)) * 1e6
+        t = time.perf_counter()
+        for _ in range(args.rounds):
+            for g in glyphs:
+                scale_hlsb(g, old, new)
+        fast = (time.perf_counter() - t) / (args.rounds * len(glyphs)) * 1e6
+        # 带缓存的重复绘制
+        font.cache_size = 16384
+        t = time.perf_counter()
+        for _ in range(args.rounds):
+            for c in TEXT:
+                font.get_scaled_bitmap(c, new)
+        cached = (time.perf_counter() - t) / (args.rounds * len(TEXT)) * 1e6
+        font.cache_size = 0
+        font.cache_clear()
+        print(f"{old}->{new}px: float {ref:8.1f} us  table {fast:7.1f} us ({ref / fast:.1f}x)  "
+              f"cached {cached:5.2f} us  {'ok' if ok else 'MISMATCH'}")
+
+
+if __name__ == "__main__":
+    main()
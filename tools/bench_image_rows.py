@@ -0,0 +1,147 @@
+"""
+图片行转换基准测试 (PC 端)
+
+生成一张 24 位 BMP 与 P6 PPM，比较原逐像素实现与整行转换实现 (EasyDisplay.bmp / pbm) 的耗时，
+并校验两者绘制结果一致。PC 端没有 viper，测得的是纯 Python 回退实现。
+host_shim 的 FrameBuffer.blit 也是纯 Python 逐像素实现 (设备上为 C)，整行路径的绘制开销在 PC 端被放大，
+因此另外单独比较不含绘制的颜色转换 (convert 列)。
+
+    python tools/bench_image_rows.py [--size 128x64]
+"""
+import argparse
+import struct
+import time
+from io import BytesIO
+
+import host_shim
+import framebuf
+from easydisplay import EasyDisplay
+from row_convert import ORDER_BGR, rgb888_to_mono, rgb888_to_rgb565
+
+
+class Display(framebuf.FrameBuffer):
+    def __init__(self, width, height, fmt):
+        self.width = width
+        self.height = height
+        size = width * height * 2 if fmt == framebuf.RGB565 else ((height + 7) // 8) * width
+        self.buffer = bytearray(size)
+        super().__init__(self.buffer, width, height, fmt)
+
+    def show(self, pages=None):
+        pass
+
+
+def make_pixels(width, height):
+    return bytes((x * 7 + y * 3 + c * 50) & 0xFF for y in range(height) for x in range(width) for c in range(3))
+
+
+def make_bmp(width, height, rgb):
+    row_size = (width * 3 + 3) & ~3
+    rows = b""
+    for y in range(height - 1, -1, -1):  # 自下而上
+        line = bytearray()
+        for x in range(width):
+            r, g, b = rgb[(y * width + x) * 3:(y * width + x) * 3 + 3]
+            line += bytes((b, g, r))
+        rows += bytes(line) + b"\x00" * (row_size - width * 3)
+    header = b"BM" + struct.pack("<IHHI", 54 + len(rows), 0, 0, 54)
+    dib = struct.pack("<IiiHHIIiiII", 40, width, height, 1, 24, 0, len(rows), 2835, 2835, 0, 0)
+    return header + dib + rows
+
+
+def make_ppm(width, height, rgb):
+    return b"P6\n%d %d\n255\n" % (width, height) + rgb
+
+
+def reference_bmp(ed, data, invert):
+    """原 EasyDisplay.bmp 逐像素实现 (Framebuffer 模式)"""
+    dp = ed.display
+    f = BytesIO(data)
+    f.read(10)
+    offset = int.from_bytes(f.read(4), "little")
+    f.read(4)
+    width = int.from_bytes(f.read(4), "little")
+    height = int.from_bytes(f.read(4), "little")
+    row_size = (width * 3 + 3) & ~3
+    buffer = bytearray(width * 2)
+    c = bytearray(3)
+    for _y in range(height):
+        f.seek(offset + (height - 1 - _y) * row_size)
+        for _x in range(width):
+            f.readinto(c)
+            r, g, b = c[2], c[1], c[0]
+            if invert:
+                r, g, b = 255 - r, 255 - g, 255 - b
+            if ed.color_type == "RGB565":
+                buffer[_x * 2:(_x + 1) * 2] = ed.rgb565_color(r, g, b).to_bytes(2, "big")
+            else:
+                _color = ed.color if int((r + g + b) / 3) >= 127 else ed.bg_color
+                if _color != ed._key:
+                    dp.pixel(_x, _y, _color)
+        if ed.color_type == "RGB565":
+            dp.blit(framebuf.FrameBuffer(buffer, width, 1, framebuf.RGB565), 0, _y, ed._key)
+
+
+def reference_convert(ed, rows, width, invert):
+    """原逐像素实现中的颜色计算部分 (不含绘制)"""
+    buffer = bytearray(width * 2)
+    for row in rows:
+        for _x in range(width):
+            r, g, b = row[_x * 3 + 2], row[_x * 3 + 1], row[_x * 3]
+            if invert:
+                r, g, b = 255 - r, 255 - g, 255 - b
+            if ed.color_type == "RGB565":
+                buffer[_x * 2:(_x + 1) * 2] = ed.rgb565_color(r, g, b).to_bytes(2, "big")
+            else:
+                buffer[_x] = ed.color if int((r + g + b) / 3) >= 127 else ed.bg_color
+
+
+def row_convert(ed, rows, width, invert):
+    """整行转换 (不含绘制)"""
+    if ed.color_type == "RGB565":
+        buffer = bytearray(width * 2)
+        for row in rows:
+            rgb888_to_rgb565(row, buffer, width, ORDER_BGR, invert)
+    else:
+        buffer = bytearray((width + 7) >> 3)
+        for row in rows:
+            rgb888_to_mono(row, buffer, width, invert)
+
+
+def timed(func, rounds):
+    t = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - t) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="image row conversion benchmark")
+    parser.add_argument("--size", default="128x64")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.split("x"))
+    rgb = make_pixels(width, height)
+    bmp = make_bmp(width, height, rgb)
+    ppm = make_ppm(width, height, rgb)
+    row_size = (width * 3 + 3) & ~3
+    rows = [bmp[54 + i * row_size:54 + i * row_size + width * 3] for i in range(height)]
+
+    for color_type, fmt, color in (("RGB565", framebuf.RGB565, 0xFFFF), ("MONO", framebuf.MONO_VLSB, 1)):
+        for invert in (False, True):
+            ref = EasyDisplay(Display(width, height, fmt), color_type, color=color)
+            new = EasyDisplay(Display(width, height, fmt), color_type, color=color)
+            ppm_dp = EasyDisplay(Display(width, height, fmt), color_type, color=color)
+            t_ref = timed(lambda: reference_bmp(ref, bmp, invert), args.rounds)
+            t_new = timed(lambda: new.bmp(BytesIO(bmp), 0, 0, invert=invert), args.rounds)
+            t_ppm = timed(lambda: ppm_dp.pbm(BytesIO(ppm), 0, 0, invert=invert), args.rounds)
+            c_ref = timed(lambda: reference_convert(ref, rows, width, invert), args.rounds)
+            c_new = timed(lambda: row_convert(new, rows, width, invert), args.rounds)
+            same = ref.display.buffer == new.display.buffer == ppm_dp.display.buffer
+            print(f"{color_type:6s} invert={invert!s:5s}: per-pixel {t_ref:7.1f} ms  row bmp {t_new:7.1f} ms "
+                  f"({t_ref / t_new:.1f}x)  row ppm {t_ppm:7.1f} ms  "
+                  f"convert {c_ref:6.2f} -> {c_new:6.2f} ms ({c_ref / c_new:.1f}x)  {'ok' if same else 'MISMATCH'}")
+
+
+if __name__ == "__main__":
+    main()
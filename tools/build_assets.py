@@ -0,0 +1,218 @@
+"""
+屏幕资源包编译工具 (PC 端)
+
+把 PNG / BMP 等图片和固定的界面文字预先转换为 MONO_HLSB 或 RGB565 点阵，
+打包为一个资源包文件 (格式见 asset_bundle.py)，设备端使用 EasyDisplay.load_bundle / asset 显示。
+
+图片转换使用 Pillow (pip install pillow)，未安装时只支持 24 位 BMP 与 P6 PPM；文字使用设备端同一个 .bmf 字库和 ufont 渲染，
+显示效果与设备端逐字渲染完全一致。
+
+    python tools/build_assets.py -o ui.edab \\
+        --image logo=logo.png --image wifi=wifi.bmp \\
+        --text listening=聆听中... --text thinking=思考中... \\
+        [--format mono|rgb565] [--font text_lite_16px_2312.v3.bmf] [--size 16] [--list]
+
+    # 设备端
+    ed = EasyDisplay(oled, "MONO")
+    ed.load_bundle("ui.edab", hot=("listening", "thinking"))
+    ed.asset("logo", 0, 0, show=True)
+"""
+import argparse
+import os
+import struct
+
+import host_shim
+import asset_bundle
+from asset_bundle import FMT_MONO, FMT_RGB565, stride
+from row_convert import MONO_THRESHOLD
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 为可选依赖
+    Image = None
+
+FORMATS = {"mono": FMT_MONO, "rgb565": FMT_RGB565}
+
+
+def _read_bmp(data):
+    """解析 24 位无压缩 BMP，返回 (宽, 高, RGB 像素)"""
+    offset, = struct.unpack_from("<I", data, 10)
+    width, height, planes, depth, compression = struct.unpack_from("<iiHHI", data, 18)
+    if data[0:2] != b"BM" or planes != 1 or depth != 24 or compression != 0:
+        raise TypeError("only 24-bit uncompressed BMP images are supported without Pillow")
+    row_size = (width * 3 + 3) & ~3
+    pixels = bytearray()
+    for y in range(abs(height)):
+        src = height - 1 - y if height > 0 else y  # 正高度为自下而上存储
+        row = data[offset + src * row_size:offset + src * row_size + width * 3]
+        for x in range(0, width * 3, 3):
+            pixels += bytes((row[x + 2], row[x + 1], row[x]))
+    return width, abs(height), bytes(pixels)
+
+
+def _read_ppm(data):
+    """解析 P6 PPM (maxval 255)，返回 (宽, 高, RGB 像素)"""
+    fields = []
+    pos = 2
+    while len(fields) < 3:
+        while data[pos:pos + 1].isspace():
+            pos += 1
+        if data[pos:pos + 1] == b"#":
+            pos = data.index(b"\n", pos) + 1
+            continue
+        end = pos
+        while not data[end:end + 1].isspace():
+            end += 1
+        fields.append(int(data[pos:end]))
+        pos = end
+    width, height, maxval = fields
+    if maxval != 255:
+        raise TypeError("only 8-bit PPM images are supported without Pillow")
+    pos += 1
+    return width, height, data[pos:pos + width * height * 3]
+
+
+def load_rgb(path, max_size=None):
+    """
+    读取图片为 RGB 像素，透明部分按黑色处理
+
+    Returns:
+        (宽, 高, RGB 像素)
+    """
+    if Image is None:
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[0:2] == b"BM":
+            width, height, pixels = _read_bmp(data)
+        elif data[0:2] == b"P6":
+            width, height, pixels = _read_ppm(data)
+        else:
+            raise ImportError("Only 24-bit BMP and P6 PPM are supported without Pillow: pip install pillow")
+        if max_size and (width > max_size[0] or height > max_size[1]):
+            raise ImportError("Resizing images requires Pillow: pip install pillow")
+        return width, height, pixels
+    with Image.open(path) as img:
+        img = img.convert("RGBA")
+        if max_size and (img.width > max_size[0] or img.height > max_size[1]):
+            img.thumbnail(max_size)
+        background = Image.new("RGBA", img.size, (0, 0, 0, 255))
+        rgb = Image.alpha_composite(background, img).convert("RGB")
+    return rgb.width, rgb.height, rgb.tobytes()
+
+
+def image_asset(path, fmt, invert=False, max_size=None):
+    """
+    读取图片并转换为点阵
+
+    Returns:
+        (宽, 高, 点阵数据)
+    """
+    width, height, pixels = load_rgb(path, max_size)
+    data = bytearray(stride(fmt, width) * height)
+    for y in range(height):
+        for x in range(width):
+            i = (y * width + x) * 3
+            r, g, b = pixels[i], pixels[i + 1], pixels[i + 2]
+            if invert:
+                r, g, b = 255 - r, 255 - g, 255 - b
+            if fmt == FMT_MONO:
+                # 与 EasyDisplay.bmp / pbm 相同的灰度阈值
+                if r + g + b >= MONO_THRESHOLD:
+                    data[y * stride(fmt, width) + (x >> 3)] |= 0x80 >> (x & 7)
+            else:
+                color = (r & 0xf8) << 8 | (g & 0xfc) << 3 | b >> 3
+                data[(y * width + x) * 2:(y * width + x + 1) * 2] = color.to_bytes(2, "big")
+    return width, height, bytes(data)
+
+
+def text_asset(font, text, fmt, size=None, half_char=True):
+    """
+    使用设备端字库渲染单行文字
+
+    Returns:
+        (宽, 高, 点阵数据)
+    """
+    if fmt != FMT_MONO:
+        raise ValueError("Text assets are stored as MONO bitmaps, use color / bg_color on the device")
+    strip = font.render_text(text, size, half_char)
+    return strip.width, strip.height, bytes(strip.buffer)
+
+
+def build(assets):
+    """
+    打包资源
+
+    Args:
+        assets: [(名称, 格式, 宽, 高, 点阵数据), ...]
+
+    Returns:
+        资源包文件内容
+    """
+    if len(assets) > 0xFFFF:
+        raise ValueError("Too many assets")
+    names = bytearray()
+    name_offsets = []
+    for name, *_ in assets:
+        encoded = name.encode("utf-8")
+        if len(encoded) > 0xFF:
+            raise ValueError(f"Asset name too long: {name}")
+        name_offsets.append((len(names), len(encoded)))
+        names += encoded
+    if len(names) > 0xFFFF:
+        raise ValueError("Asset names too long")
+    offset = asset_bundle.HEADER_SIZE + asset_bundle.ENTRY_SIZE * len(assets) + len(names)
+    header = struct.pack(">4sBBH", asset_bundle.MAGIC, asset_bundle.VERSION, 0, len(assets))
+    table = bytearray()
+    body = bytearray()
+    for (name, fmt, width, height, data), (name_off, name_len) in zip(assets, name_offsets):
+        if len(data) != stride(fmt, width) * height:
+            raise ValueError(f"Bitmap size mismatch: {name}")
+        table += struct.pack(asset_bundle.ENTRY_FORMAT, offset + len(body), width, height, fmt, name_len, name_off)
+        body += data
+    return header + bytes(table) + bytes(names) + bytes(body)
+
+
+def parse_pair(value):
+    name, sep, arg = value.partition("=")
+    if not sep or not name:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got {value!r}")
+    return name, arg
+
+
+def main():
+    parser = argparse.ArgumentParser(description="build an EasyDisplay asset bundle")
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--image", action="append", default=[], type=parse_pair, metavar="NAME=PATH")
+    parser.add_argument("--text", action="append", default=[], type=parse_pair, metavar="NAME=TEXT")
+    parser.add_argument("--format", choices=FORMATS, default="mono", help="image bitmap format")
+    parser.add_argument("--invert", action="store_true", help="invert image colors")
+    parser.add_argument("--max-size", default=None, help="shrink images to fit WxH, e.g. 128x64")
+    parser.add_argument("--font", default=os.path.join(host_shim.ROOT, "text_lite_16px_2312.v3.bmf"))
+    parser.add_argument("--size", type=int, default=None, help="text font size")
+    parser.add_argument("--list", action="store_true", help="print the assets after building")
+    args = parser.parse_args()
+
+    fmt = FORMATS[args.format]
+    max_size = tuple(int(v) for v in args.max_size.split("x")) if args.max_size else None
+    assets = []
+    for name, path in args.image:
+        assets.append((name, fmt) + image_asset(path, fmt, args.invert, max_size))
+    if args.text:
+        import ufont
+        font = ufont.BMFont(args.font)
+        for name, text in args.text:
+            assets.append((name, FMT_MONO) + text_asset(font, text, FMT_MONO, args.size))
+    if len({name for name, *_ in assets}) != len(assets):
+        parser.error("duplicate asset name")
+
+    data = build(assets)
+    with open(args.output, "wb") as f:
+        f.write(data)
+    print(f"{args.output}: {len(assets)} assets, {len(data)} bytes")
+    if args.list:
+        for name, fmt, width, height, bitmap in assets:
+            print(f"  {name:20s} {'mono' if fmt == FMT_MONO else 'rgb565':6s} {width}x{height} {len(bitmap)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+在 PC 端 (CPython) 运行设备端模块所需的最小 MicroPython 兼容层，仅供 tools/ 下的基准测试使用。
+
+提供:
+    framebuf: 纯 Python 实现的 FrameBuffer (MONO_VLSB / MONO_HLSB / RGB565)
+    micropython: const (不提供 native / viper，设备端模块会自动回退到纯 Python 实现)
+    time.ticks_us / ticks_ms / ticks_diff
+
+用法:
+    import host_shim  # 必须在导入 ufont / easydisplay 等模块之前
+"""
+import os
+import sys
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+MONO_VLSB = 0
+RGB565 = 1
+MONO_HLSB = 3
+
+
+class FrameBuffer:
+    def __init__(self, buffer, width, height, fmt, stride=None):
+        self.buffer = buffer
+        self.width = width
+        self.height = height
+        self.format = fmt
+        self.stride = stride or width
+
+    def __buffer__(self, flags):
+        return memoryview(self.buffer)
+
+    def _get(self, x, y):
+        buf = self.buffer
+        if self.format == MONO_HLSB:
+            i = (y * self.stride + x) >> 3
+            return (buf[i] >> (7 - (x & 7))) & 1
+        if self.format == MONO_VLSB:
+            return (buf[(y >> 3) * self.stride + x] >> (y & 7)) & 1
+        i = (y * self.stride + x) * 2
+        return buf[i] | (buf[i + 1] << 8)
+
+    def _set(self, x, y, c):
+        buf = self.buffer
+        if self.format == MONO_HLSB:
+            i = (y * self.stride + x) >> 3
+            bit = 0x80 >> (x & 7)
+            buf[i] = (buf[i] | bit) if c else (buf[i] & ~bit)
+        elif self.format == MONO_VLSB:
+            i = (y >> 3) * self.stride + x
+            bit = 1 << (y & 7)
+            buf[i] = (buf[i] | bit) if c else (buf[i] & ~bit)
+        else:
+            i = (y * self.stride + x) * 2
+            buf[i] = c & 0xFF
+            buf[i + 1] = (c >> 8) & 0xFF
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        if c is None:
+            return self._get(x, y)
+        self._set(x, y, c)
+
+    def fill(self, c):
+        self.fill_rect(0, 0, self.width, self.height, c)
+
+    def fill_rect(self, x, y, w, h, c):
+        for yy in range(max(y, 0), min(y + h, self.height)):
+            for xx in range(max(x, 0), min(x + w, self.width)):
+                self._set(xx, yy, c)
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self.fill_rect(x, y, w, h, c)
+            return
+        self.hline(x, y, w, c)
+        self.hline(x, y + h - 1, w, c)
+        self.vline(x, y, h, c)
+        self.vline(x + w - 1, y, h, c)
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        for sy in range(fbuf.height):
+            dy = y + sy
+            if not 0 <= dy < self.height:
+                continue
+            for sx in range(fbuf.width):
+                dx = x + sx
+                if not 0 <= dx < self.width:
+                    continue
+                c = fbuf._get(sx, sy)
+                if palette is not None:
+                    c = palette._get(c, 0)
+                if c != key:
+                    self._set(dx, dy, c)
+
+    def scroll(self, xstep, ystep):
+        w, h = self.width, self.height
+        xs = range(w - 1, -1, -1) if xstep > 0 else range(w)
+        ys = range(h - 1, -1, -1) if ystep > 0 else range(h)
+        for yy in ys:
+            for xx in xs:
+                sx, sy = xx - xstep, yy - ystep
+                if 0 <= sx < w and 0 <= sy < h:
+                    self._set(xx, yy, self._get(sx, sy))
+
+
+def _install():
+    if "framebuf" not in sys.modules:
+        mod = types.ModuleType("framebuf")
+        mod.FrameBuffer = FrameBuffer
+        mod.MONO_VLSB = MONO_VLSB
+        mod.MONO_HLSB = MONO_HLSB
+        mod.RGB565 = RGB565
+        sys.modules["framebuf"] = mod
+    if "micropython" not in sys.modules:
+        mod = types.ModuleType("micropython")
+        mod.const = lambda x: x
+        sys.modules["micropython"] = mod
+    if not hasattr(time, "ticks_us"):
+        time.ticks_us = lambda: time.perf_counter_ns() // 1000
+        time.ticks_ms = lambda: time.perf_counter_ns() // 1000000
+        time.ticks_diff = lambda a, b: a - b
+
+
+_install()
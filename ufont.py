@@ -11,6 +11,14 @@ import struct
 
 import framebuf
 
+from bmf_index import BMFIndex, INDEX_RAM
+from glyph_scale import scale_hlsb, hlsb_to_rgb565
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ucollections import OrderedDict
+
 DEBUG = False
 
 
@@ -109,8 +117,11 @@ class BMFont:
             if x > display.width or y > display.height:
                 continue
 
-            # 获取字体的点阵数据
-            byte_data = list(self.get_bitmap(string[char]))
+            # 获取字体的点阵数据 (需要缩放时直接取缓存的缩放结果)
+            if font_size == self.font_size:
+                byte_data = list(self.get_bitmap(string[char]))
+            else:
+                byte_data = list(self.get_scaled_bitmap(string[char], font_size))
 
             # 分四种情况逐个优化
             #   1. 黑白屏幕/无放缩
@@ -124,14 +135,13 @@ class BMFont:
                                  x, y,
                                  alpha_color)
                 else:
-                    display.blit(
-                        framebuf.FrameBuffer(self._HLSB_font_size(byte_data, font_size, self.font_size), font_size,
-                                             font_size, framebuf.MONO_HLSB), x, y, alpha_color)
+                    display.blit(framebuf.FrameBuffer(bytearray(byte_data), font_size, font_size, framebuf.MONO_HLSB),
+                                 x, y, alpha_color)
             elif color_type == 1 and font_size == self.font_size:
                 display.blit(framebuf.FrameBuffer(self._flatten_byte_data(byte_data, palette), font_size, font_size,
                                                   framebuf.RGB565), x, y, alpha_color)
             elif color_type == 1 and font_size != self.font_size:
-                display.blit(framebuf.FrameBuffer(self._RGB565_font_size(byte_data, font_size, palette, self.font_size),
+                display.blit(framebuf.FrameBuffer(hlsb_to_rgb565(byte_data, font_size, palette),
                                                   font_size, font_size, framebuf.RGB565), x, y, alpha_color)
             # 英文字符半格显示
             if ord(string[char]) < 128 and half_char:
@@ -141,6 +151,49 @@ class BMFont:
 
         display.show() if show else 0
 
+    def render_text(self, string: str, font_size: int = None, half_char: bool = True):
+        """
+        将单行文本渲染为 MONO_HLSB 字幕条并缓存，重复出现的字符串 (状态提示、前缀) 无需逐字渲染
+
+        Args:
+            string: 单行文本，不处理控制字符与换行
+            font_size: 字号
+            half_char: 半宽显示 ASCII 字符
+
+        Returns:
+            framebuf.FrameBuffer，宽度为文本像素宽度，高度为字号
+        """
+        font_size = font_size or self.font_size
+        key = (string, font_size, half_char)
+        cache = self._text_cache
+        entry = cache.pop(key, None)
+        if entry is not None:
+            self.text_cache_hits += 1
+            cache[key] = entry
+            return entry[0]
+        self.text_cache_misses += 1
+        width = 0
+        for char in string:
+            width += font_size // 2 if ord(char) < 128 and half_char else font_size
+        size = ((width + 7) >> 3) * font_size
+        strip = framebuf.FrameBuffer(bytearray(size), width, font_size, framebuf.MONO_HLSB)
+        x = 0
+        for char in string:
+            byte_data = self.get_scaled_bitmap(char, font_size)
+            # 透明色为 0，半宽字符与后一个字符重叠的空白部分不会覆盖
+            strip.blit(framebuf.FrameBuffer(bytearray(byte_data), font_size, font_size, framebuf.MONO_HLSB), x, 0, 0)
+            x += font_size // 2 if ord(char) < 128 and half_char else font_size
+        if size <= self.text_cache_size:
+            cache[key] = (strip, size)
+            self._text_cache_bytes += size
+            while self._text_cache_bytes > self.text_cache_size:
+                self._text_cache_bytes -= cache.pop(next(iter(cache)))[1]
+        return strip
+
+    def blit_text(self, display, string: str, x: int, y: int, font_size: int = None, half_char: bool = True):
+        """使用缓存的字幕条显示单行文本，只需一次 blit"""
+        display.blit(self.render_text(string, font_size, half_char), x, y, 0)
+
     @timeit
     def _get_index(self, word: str) -> int:
         """
@@ -149,50 +202,17 @@ class BMFont:
             word: 字符
 
         Returns:
-        ESP32-C3: Function _get_index Time =  2.670ms
+        ESP32-C3: Function _get_index Time =  2.670ms (disk 模式)
         """
-        word_code = ord(word)
-        start = 0x10
-        end = self.start_bitmap
-
-        while start <= end:
-            mid = ((start + end) // 4) * 2
-            self.font.seek(mid, 0)
-            target_code = struct.unpack(">H", self.font.read(2))[0]
-            if word_code == target_code:
-                return (mid - 16) >> 1
-            elif word_code < target_code:
-                end = mid - 2
-            else:
-                start = mid + 2
-        return -1
+        return self.index.find(ord(word))
 
     @timeit
     def _HLSB_font_size(self, byte_data: bytearray, new_size: int, old_size: int) -> bytearray:
-        old_size = old_size
-        _temp = bytearray(new_size * ((new_size >> 3) + 1))
-        _new_index = -1
-        for _col in range(new_size):
-            for _row in range(new_size):
-                if (_row % 8) == 0:
-                    _new_index += 1
-                _old_index = int(_col / (new_size / old_size)) * old_size + int(_row / (new_size / old_size))
-                _temp[_new_index] = _temp[_new_index] | (
-                        (byte_data[_old_index >> 3] >> (7 - _old_index % 8) & 1) << (7 - _row % 8))
-        return _temp
+        return scale_hlsb(byte_data, old_size, new_size)
 
     @timeit
     def _RGB565_font_size(self, byte_data: bytearray, new_size: int, palette: list, old_size: int) -> bytearray:
-        old_size = old_size
-        _temp = []
-        _new_index = -1
-        for _col in range(new_size):
-            for _row in range(new_size):
-                if (_row % 8) == 0:
-                    _new_index += 1
-                _old_index = int(_col / (new_size / old_size)) * old_size + int(_row / (new_size / old_size))
-                _temp.extend(palette[byte_data[_old_index // 8] >> (7 - _old_index % 8) & 1])
-        return bytearray(_temp)
+        return hlsb_to_rgb565(scale_hlsb(byte_data, old_size, new_size), new_size, palette)
 
     @timeit
     def _flatten_byte_data(self, _byte_data: bytearray, palette: list) -> bytearray:
@@ -219,7 +239,7 @@ class BMFont:
 
     @timeit
     def get_bitmap(self, word: str) -> bytes:
-        """获取点阵图
+        """获取点阵图，优先从字形缓存读取
 
         Args:
             word: 字符
@@ -227,6 +247,94 @@ class BMFont:
         Returns:
             bytes 字符点阵
         """
+        code = ord(word)
+        # 第一级：服务器下发的字形包
+        bitmap = self.glyph_pack.get(code)
+        if bitmap is not None:
+            return bitmap
+        bitmap = self._cache_get(code)
+        if bitmap is None:
+            bitmap = self._read_bitmap(word)
+            self._cache_put(code, bitmap)
+        return bitmap
+
+    def get_scaled_bitmap(self, word: str, font_size: int) -> bytes:
+        """获取缩放后的点阵图，缩放结果与原始字形共用缓存
+
+        Args:
+            word: 字符
+            font_size: 字号
+
+        Returns:
+            bytes 字符点阵，每行 (font_size + 7) // 8 字节
+        """
+        if font_size == self.font_size:
+            return self.get_bitmap(word)
+        key = (ord(word), font_size)
+        bitmap = self._cache_get(key)
+        if bitmap is None:
+            bitmap = scale_hlsb(self.get_bitmap(word), self.font_size, font_size)
+            self._cache_put(key, bitmap)
+        return bitmap
+
+    def _cache_get(self, key):
+        cache = self._cache
+        # 命中后重新插入，移动到最近使用的位置
+        bitmap = cache.pop(key, None)
+        if bitmap is not None:
+            self.cache_hits += 1
+            cache[key] = bitmap
+            return bitmap
+        self.cache_misses += 1
+        return None
+
+    def _cache_put(self, key, bitmap):
+        if len(bitmap) > self.cache_size:
+            return
+        cache = self._cache
+        cache[key] = bitmap
+        self._cache_bytes += len(bitmap)
+        # 超出预算时淘汰最久未使用的字形
+        while self._cache_bytes > self.cache_size:
+            self._cache_bytes -= len(cache.pop(next(iter(cache))))
+
+    def cache_info(self) -> dict:
+        """字形缓存统计"""
+        return {"hits": self.cache_hits, "misses": self.cache_misses, "glyphs": len(self._cache),
+                "bytes": self._cache_bytes, "budget": self.cache_size,
+                "text_hits": self.text_cache_hits, "text_misses": self.text_cache_misses,
+                "text_strings": len(self._text_cache), "text_bytes": self._text_cache_bytes,
+                "text_budget": self.text_cache_size}
+
+    def load_glyph_pack(self, payload):
+        """
+        载入服务器下发的字形包，作为第一级字形来源
+        Args:
+            payload: 1 字节点阵大小 + N * (2 字节码位 + 点阵)
+        """
+        size = payload[0]
+        if size != self.bitmap_size:
+            return 0
+        # 单个字形包也不超过上限，多出的字形仍从字体文件读取
+        count = min((len(payload) - 1) // (size + 2), self.glyph_pack_limit)
+        # 超出上限时整体丢弃旧字形包
+        if len(self.glyph_pack) + count > self.glyph_pack_limit:
+            self.glyph_pack = {}
+        pack = self.glyph_pack
+        offset = 1
+        for _ in range(count):
+            pack[payload[offset] << 8 | payload[offset + 1]] = bytes(payload[offset + 2:offset + 2 + size])
+            offset += size + 2
+        return count
+
+    def cache_clear(self):
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._text_cache = OrderedDict()
+        self._text_cache_bytes = 0
+
+    def _read_bitmap(self, word: str) -> bytes:
+        """从字体文件读取点阵图"""
         index = self._get_index(word)
         if index == -1:
             return b'\xff\xff\xff\xff\xff\xff\xff\xff\xf0\x0f\xcf\xf3\xcf\xf3\xff\xf3\xff\xcf\xff?\xff?\xff\xff\xff' \
@@ -236,12 +344,33 @@ class BMFont:
         return self.font.read(self.bitmap_size)
 
     @timeit
-    def __init__(self, font_file):
+    def __init__(self, font_file, cache_size: int = 4096, index_mode: str = INDEX_RAM, bucket_size: int = 32,
+                 glyph_pack_limit: int = 256, text_cache_size: int = 2048):
         """
         Args:
             font_file: 字体文件路径
+            cache_size: 字形缓存字节预算，0 为不缓存
+            glyph_pack_limit: 服务器字形包最多保留的字形数量
+            text_cache_size: 文本字幕条缓存字节预算，0 为不缓存
+            index_mode: 码位索引方式 "ram" / "bucket" / "disk"，见 bmf_index.py
+            bucket_size: bucket 模式下每个分桶的码位数量
         """
         self.font_file = font_file
+        # 字形缓存：code point -> 点阵，按 LRU 淘汰
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # 服务器下发的字形包：code point -> 点阵
+        self.glyph_pack = {}
+        self.glyph_pack_limit = glyph_pack_limit
+        # 文本缓存：(字符串, 字号, 半宽) -> (已渲染的 MONO_HLSB 字幕条, 字节数)，按 LRU 淘汰
+        self.text_cache_size = text_cache_size
+        self._text_cache = OrderedDict()
+        self._text_cache_bytes = 0
+        self.text_cache_hits = 0
+        self.text_cache_misses = 0
         # 载入字体文件
         self.font = open(font_file, "rb")
         # 获取字体文件信息
@@ -276,3 +405,5 @@ class BMFont:
         # 点阵所占字节
         #   用来定位字体数据位置
         self.bitmap_size = self.bmf_info[8]
+        # 码位索引
+        self.index = BMFIndex(self.font, self.start_bitmap, index_mode, bucket_size)